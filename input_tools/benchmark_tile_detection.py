@@ -0,0 +1,77 @@
+import glob
+import os
+import re
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.object_detection import detect_army_tiles_projection, detect_first_army_tile
+from utils.settings import logger
+from utils.vision_utils import VisionUtils
+
+""" --------------------------- Constants --------------------------------- """
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Army bar screenshots recorded by army_placement (debug overlays are skipped)
+DEFAULT_DIRS = [
+    os.path.join(ROOT_DIR, 'data', 'screenshots', 'army_placement_phase_1'),
+    os.path.join(ROOT_DIR, 'data', 'screenshots', 'army_placement_phase_2'),
+]
+RAW_SCREENSHOT_PATTERN = re.compile(r'_\d{8}_\d{6}(_\d+)?\.png$')
+REPEATS = 5
+
+
+def collect_images(dirs):
+    images = []
+    for d in dirs:
+        for path in sorted(glob.glob(os.path.join(d, '*.png'))):
+            if RAW_SCREENSHOT_PATTERN.search(path):
+                images.append(path)
+    return images
+
+
+def time_detector(detector, image_path, img_cv):
+    result = None
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = detector(image_path, img_cv)
+    return result, (time.perf_counter() - start) / REPEATS
+
+
+def main():
+    dirs = sys.argv[1:] if len(sys.argv) > 1 else DEFAULT_DIRS
+    images = collect_images(dirs)
+    if not images:
+        logger.error(f"No recorded army bar screenshots found in: {dirs}")
+        return
+
+    logger.info(f"Benchmarking tile detectors on {len(images)} recorded bars ({REPEATS} runs each)...")
+    totals = {'contour': 0.0, 'projection': 0.0}
+    agree = 0
+    for image_path in images:
+        img_cv = VisionUtils.load_image(image_path)
+        contour, t_contour = time_detector(detect_first_army_tile, image_path, img_cv)
+        projection, t_projection = time_detector(detect_army_tiles_projection, image_path, img_cv)
+        totals['contour'] += t_contour
+        totals['projection'] += t_projection
+
+        if contour and projection:
+            dx = projection[0] - contour[0]
+            dy = projection[1] - contour[1]
+            matched = abs(dx) <= contour[2][2] // 4 and abs(dy) <= contour[2][3] // 4
+            agree += int(matched)
+            summary = f"anchor delta ({dx:+d}, {dy:+d}) | tiles contour={len(contour[3])} projection={len(projection[3])}"
+        else:
+            summary = f"contour={'found' if contour else 'none'} projection={'found' if projection else 'none'}"
+
+        logger.info(f"{os.path.basename(image_path)}: contour {t_contour * 1000:.1f}ms | projection {t_projection * 1000:.1f}ms | {summary}")
+
+    n = len(images)
+    logger.info(f"\n[RESULT] Mean contour: {totals['contour'] / n * 1000:.1f}ms | Mean projection: {totals['projection'] / n * 1000:.1f}ms")
+    logger.info(f"[RESULT] Leftmost anchors agree on {agree}/{n} bars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.input_journal import FLAG_REPLAY, load_journal, load_sites, read_header
+from utils.settings import logger
+
+""" --------------------------- Constants --------------------------------- """
+
+WINDOW_TITLE = "Clash of Clans"
+MESSAGE_NAMES = {0x0200: 'MOVE', 0x0201: 'LDOWN', 0x0202: 'LUP', 0x020A: 'WHEEL'}
+
+
+def select_slice(records, start, end, since, until):
+    """Selects records by index range and/or seconds since the journal started."""
+    records = records[start:end]
+    if len(records) and (since is not None or until is not None):
+        t = records['t'] - records['t'][0]
+        mask = (t >= (since or 0)) & (t <= (until if until is not None else float('inf')))
+        records = records[mask]
+    return records
+
+
+def summarize(path, records, sites):
+    header = read_header(path)
+    logger.info(f"{path}: {len(records)} events | started {time.ctime(header['wall_start'])}")
+    if not len(records):
+        return
+    duration = records['t'][-1] - records['t'][0]
+    logger.info(f"Span: {duration:.2f}s | replayed events: {int((records['flags'] & FLAG_REPLAY).astype(bool).sum())}")
+    kinds = Counter(MESSAGE_NAMES.get(int(m), hex(int(m))) for m in records['msg'])
+    logger.info(f"Messages: {dict(kinds)}")
+    per_site = Counter(int(s) for s in records['site'])
+    for site, count in per_site.most_common(15):
+        name = sites[site] if site < len(sites) else f"site {site}"
+        logger.info(f"  {count:6d}  {name}")
+
+
+def replay(records, speed):
+    """Re-posts the records to the current game window, keeping the original spacing divided by speed."""
+    from utils.game_window_controller import GameWindowController
+
+    wc = GameWindowController(WINDOW_TITLE, logger)
+    target_hwnd = wc.child_hwnd if wc.child_hwnd else wc.hwnd
+    logger.info(f"Replaying {len(records)} events at {speed}x to window {target_hwnd}...")
+
+    t0 = records['t'][0]
+    start = time.perf_counter()
+    for rec in records:
+        wait = start + (rec['t'] - t0) / speed - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        lparam = ((int(rec['y']) & 0xFFFF) << 16) | (int(rec['x']) & 0xFFFF)
+        # Journaled handles belong to the recording session; always target the current input window
+        wc._post(target_hwnd, int(rec['msg']), int(rec['wparam']), lparam, journal_flags=FLAG_REPLAY)
+    logger.info(f"Replay finished in {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or replay an input journal (data/journal/*.bin).")
+    parser.add_argument("journal", help="Path to the journal .bin file")
+    parser.add_argument("--start", type=int, default=None, help="First record index")
+    parser.add_argument("--end", type=int, default=None, help="Record index to stop before")
+    parser.add_argument("--since", type=float, default=None, help="Seconds after the first selected record")
+    parser.add_argument("--until", type=float, default=None, help="Seconds after the first selected record")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier (2 = twice as fast)")
+    parser.add_argument("--replay", action="store_true", help="Send the selected events to the game window")
+    args = parser.parse_args()
+
+    records = load_journal(args.journal)
+    sites = load_sites(args.journal)
+    selected = select_slice(records, args.start, args.end, args.since, args.until)
+    summarize(args.journal, selected, sites)
+
+    if args.replay:
+        if not len(selected):
+            logger.error("Nothing to replay.")
+            return
+        if args.speed <= 0:
+            logger.error("--speed must be positive.")
+            return
+        replay(selected, args.speed)
+
+
+if __name__ == "__main__":
+    main()
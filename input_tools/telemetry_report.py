@@ -0,0 +1,68 @@
+import argparse
+import os
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.settings import config, logger
+from utils.telemetry import connect, loot_per_hour, outcomes, searches_per_attack, storage_fill, time_breakdown
+
+""" --------------------------- Constants --------------------------------- """
+
+DEFAULT_PATH = config.get("Telemetry", {}).get("path", os.path.join('data', 'telemetry.sqlite'))
+
+
+def fmt(value, digits=0):
+    if value is None:
+        return "-"
+    return f"{value:,.{digits}f}"
+
+
+def table(title, header, rows):
+    logger.info(f"\n{title}")
+    if not rows:
+        logger.info("  (no data)")
+        return
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(header)]
+    logger.info("  " + "  ".join(str(h).ljust(w) for h, w in zip(header, widths)))
+    for row in rows:
+        logger.info("  " + "  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
+
+
+def report(conn, since, account=None):
+    def keep(rows):
+        return [r for r in rows if account is None or r[0] == account]
+
+    table("Loot per hour (offered loot / attack time)", ["account", "attacks", "gold/h", "elixir/h", "dark/h"],
+          [(a, n, fmt(g), fmt(e), fmt(d)) for a, n, g, e, d in keep(loot_per_hour(conn, since))])
+    table("Searches per attack", ["account", "bases/attack", "search s", "worst"],
+          [(a, fmt(b, 1), fmt(s, 1), w) for a, b, s, w in keep(searches_per_attack(conn, since))])
+    table("Time breakdown per attack (s)", ["account", "base", "search", "placement", "battle", "other"],
+          [(a, b, fmt(s, 1), fmt(p, 1), fmt(t, 1), fmt(o, 1)) for a, b, s, p, t, o in keep(time_breakdown(conn, since))])
+    table("Battle outcomes", ["account", "outcome", "count"], keep(outcomes(conn, since)))
+    table("Attack loops", ["account", "base", "loops", "attacks/loop", "minutes/loop", "filled"],
+          [(a, b, n, fmt(k, 1), fmt(s / 60 if s is not None else None, 1), f) for a, b, n, k, s, f in keep(storage_fill(conn, since))])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report attack throughput from the telemetry database.")
+    parser.add_argument("--db", default=DEFAULT_PATH, help=f"Telemetry database (default {DEFAULT_PATH})")
+    parser.add_argument("--hours", type=float, default=24.0, help="Only include the last N hours (0 = everything)")
+    parser.add_argument("--account", default=None, help="Only report this account")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        logger.error(f"No telemetry database at {args.db}")
+        return
+    since = time.time() - args.hours * 3600 if args.hours > 0 else 0
+    conn = connect(args.db)
+    try:
+        report(conn, since, args.account)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
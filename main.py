@@ -7,11 +7,15 @@ import cv2
 import numpy as np
 
 from utils import settings
+from utils.account_scheduler import TASKS, AccountScheduler
 from utils.clash_base import ClashBase
+from utils.config_watcher import ConfigWatcher
+from utils.frame_predicates import base_loaded
 from utils.game_program_controller import GameProgramController
 from utils.game_window_controller import GameWindowController
 from utils.object_detection import detect_play_store_update_screen
 from utils.settings import logger
+from utils.wait import wait_until
 
 # Setup Logging
 
@@ -22,6 +26,11 @@ GP_PROCESS_DIR = settings.config["Filesystem"]["GooglePlayGamesBetaProcessDirect
 COC_FILEPATH = settings.config["Filesystem"]["ClashOfClansShortcutFilepath"]
 switch_account_positions = settings.config["General"]["switch_account"]
 update_button_position = settings.config["General"].get("update_button")
+frame_wait_config = settings.config.get("FrameWait", {})
+ACCOUNT_SWITCH_TIMEOUT = frame_wait_config.get("account_switch_timeout", 20)
+UPDATE_TIMEOUT = frame_wait_config.get("update_timeout", 180)
+POLL_INTERVAL = frame_wait_config.get("poll_interval", 0.25)
+WINDOW_TIMEOUT = settings.config.get("Wait", {}).get("window_timeout", 600)
 
 
 
@@ -41,6 +50,244 @@ def check_for_update(window_controller):
         return True
     return False
 
+def click_and_await_base(window_controller, positions, timeout, label):
+    """
+    Clicks positions and waits until a base has finished loading (or timeout), instead of a fixed sleep.
+    """
+    window_controller.act_and_await(
+        lambda: window_controller.execute_clicks(positions),
+        base_loaded(),
+        timeout,
+        poll=POLL_INTERVAL,
+        label=label,
+    )
+
+def switch_to_account(window_controller, k, label=None):
+    """
+    Opens the account switch menu, picks the k-th account (1-based, in menu order) and waits for its base to load.
+    :return: The position that was clicked for the account.
+    """
+    positions = [list(p) for p in switch_account_positions]
+    # Use scaled offset from config
+    scaled_offset = settings.config.get("General", {}).get("account_switch_y_offset", 110)
+    positions[-1] = [positions[-1][0], positions[-1][1] + (k - 2) * scaled_offset]
+    click_and_await_base(window_controller, positions, ACCOUNT_SWITCH_TIMEOUT, label or f"switch to account {k}")
+    return positions[-1]
+
+def load_bases(window_controller, logger_instance=None, names=None):
+    """
+    Creates a ClashBase for each baseconfig_*.toml in utils/baseconfig.
+    :param names: Only these accounts, in this order (the order of the in-game switch menu).
+    """
+    log = logger_instance if logger_instance else logger
+    config_dir = os.path.join("utils", "baseconfig")
+    config_files = [
+        f for f in glob(os.path.join(config_dir, "baseconfig_*.toml"))
+        if not f.endswith("baseconfig_template.toml") 
+    ]
+    bases = [ClashBase(config_path, window_controller, log) for config_path in config_files]
+    if names is not None:
+        by_name = {base.name: base for base in bases}
+        missing = [name for name in names if name not in by_name]
+        if missing:
+            raise ValueError(f"No base config for account(s): {', '.join(missing)}")
+        bases = [by_name[name] for name in names]
+    return bases
+
+def run_account(base, ranked_mode=False, lower_trophy_count=False, fill_storage=True, logger_instance=None, tasks=None):
+    """
+    Runs one visit of an account that is already loaded: home base collection, upgrades and attacks, then the same
+    on the builder base.
+    :param tasks: Only run these scheduler tasks (see AccountScheduler); None runs everything.
+    :return: {task: outcome} for every task that ran, for AccountScheduler.record.
+    """
+    log = logger_instance if logger_instance else logger
+    tasks = set(TASKS) if tasks is None else set(tasks)
+    outcomes = {}
+
+    # Pick up config edits made since the last visit
+    ConfigWatcher.shared().poll()
+    base.refresh_config()
+
+    """ ------------------------ Home Base -------------------------- """
+
+    
+    base.homebase_actions.reset_select()
+    base.builderbase_actions.reset_select()
+    
+    
+    # determine if home base or builder base
+    if base.current_location() == 'Builder':
+        log.info("Current Location: Builder base")
+        base.builderbase_actions.switch_to_home_base() 
+    else:
+        log.info("Current Location: Home base")
+
+    # reset camera position
+    log.info("Resetting camera position...")
+    base.homebase_actions.reset_camera_position()
+
+    # Execute the resource collection task  
+    log.info("Executing resource collection...")
+    base.homebase_actions.execute_resource_collection()
+
+    # check if builder or research upgrade is available
+    attack = tasks & {"builders", "storage"}
+    if attack:
+        log.info("Checking for builder or research upgrade...")
+        builders_available = base.homebase_actions.check_builder_upgrade()
+        # Only the attack loop starts builder upgrades; busy unless it reports one
+        outcomes["builders"] = "busy"
+    if attack and (builders_available > 0 or base.homebase_actions.check_laboratory_upgrade() > 0 or fill_storage):
+        # check available heros
+        available_heros = 0
+        # if thl >= 7, check available heros
+        log.info("Checking available heros...")
+        if base.homebase_actions.thl >= 7:
+            available_heros = base.homebase_actions.check_heros()
+        # upgrade walls
+        log.info("Upgrading walls...")
+        base.homebase_actions.upgrade_walls()
+        # get max resources through attacking and builder upgrades
+        log.info("Starting attack loop...")
+        upgrades = base.homebase_actions.main_attack_loop(available_heros, ranked_mode, fill_storage)
+        if upgrades:
+            outcomes["builders"] = "started"
+        outcomes["storage"] = "filled"
+    
+    # if thl >= 3, start laboratory upgrade
+    if "lab" in tasks:
+        log.info("Checking for laboratory upgrade...")
+        if base.homebase_actions.thl >= 3:
+            outcomes["lab"] = "started" if base.homebase_actions.start_laboratory_upgrade() else "busy"
+        else:
+            outcomes["lab"] = "unavailable"
+        # if thl >= 10, start apprentices
+        log.info("Checking for apprentices upgrade...")
+        if base.homebase_actions.thl >= 9:
+            base.homebase_actions.start_apprentices()
+    # if thl >= 15, start pet upgrade
+    if "pets" in tasks:
+        log.info("Checking for pet upgrade...")
+        if base.homebase_actions.thl >= 14:
+            started = base.homebase_actions.start_pet_upgrade()
+            outcomes["pets"] = "started" if started else ("busy" if started is None else "idle")
+        else:
+            outcomes["pets"] = "unavailable"
+    
+    if not attack:
+        # The builder base is visited along with the home base attacks
+        return outcomes
+    
+
+
+    """ ------------------------ Builder Base -------------------------- """
+    # switch to builder base
+    log.info("Switching to builder base...")
+    base.homebase_actions.switch_builder_base()
+
+    # reset select and camera position
+    log.info("Resetting camera position...")
+    base.builderbase_actions.reset_select()
+    base.builderbase_actions.reset_camera_position()
+    # execute resource collection
+    log.info("Executing resource collection...")
+    base.builderbase_actions.execute_resource_collection()
+
+    # check available heros
+    available_heros = 1
+    # log.info("Checking available heros...")
+    available_heros = base.builderbase_actions.check_heros()
+
+    # lower trophy count
+    if lower_trophy_count:
+        log.info("Lowering trophy count...")
+        base.builderbase_actions.lower_trophy_count()
+
+    # check if builder or research upgrade is available
+    log.info("Checking for builder or research upgrade...")
+    if base.builderbase_actions.check_builder_upgrade() > 0 or base.builderbase_actions.check_laboratory_upgrade() or fill_storage:
+        # get max resources through attacking and builder upgrades
+        log.info("Starting attack loop...")
+        base.builderbase_actions.main_attack_loop(available_heros, fill_storage)
+    return outcomes
+
+def run_accounts(window_controller, bases, passes=None, logger_instance=None, **options):
+    """
+    Visits every account in switch-menu order, passes times (default: once per account), switching through the
+    in-game account menu. options are passed to run_account.
+    """
+    log = logger_instance if logger_instance else logger
+    passes = passes if passes is not None else len(bases)
+    for _ in range(passes):
+        # iterate through each base    
+        for idx, base in enumerate(bases):
+            if idx == 0:
+                log.info("Switching to first account...")
+                base.homebase_actions.reset_select()
+                base.homebase_actions.reset_select()
+                # wait for account to load
+                switch_to_account(window_controller, 1, "switch to first account")
+
+            run_account(base, logger_instance=log, **options)
+
+            """ ------------------------ Switch Accounts -------------------------- """
+            # switch account
+            if len(bases) > idx + 1:
+                log.info(f"Switching to account {idx + 2}")
+                account_position = switch_to_account(window_controller, idx + 2)
+                log.info(f"Switched to account {idx + 2} at position {account_position}")
+                 # Draw Circle
+                base.homebase_actions.annotate_coords_on_image([account_position])
+            # go back to main home base
+            else:
+                log.info("No more accounts to switch to")
+                # wait for account to load
+                switch_to_account(window_controller, 1, "switch back to first account")
+
+def run_scheduled(window_controller, bases, max_visits=None, logger_instance=None, **options):
+    """
+    Visits accounts in due-time order (AccountScheduler) instead of cycling through all of them, running only the
+    tasks that are due. Stops after max_visits visits (default: as many as run_accounts would make) or when nothing
+    is due within [Scheduler] max_wait seconds.
+    """
+    log = logger_instance if logger_instance else logger
+    scheduler_config = settings.config.get("Scheduler", {})
+    max_visits = max_visits if max_visits is not None else (scheduler_config.get("max_visits") or len(bases) ** 2)
+    max_wait = scheduler_config.get("max_wait", 1800)
+    scheduler = AccountScheduler([base.name for base in bases], log)
+    index_of = {base.name: index for index, base in enumerate(bases)}
+    for line in scheduler.describe():
+        log.info(f"[Scheduler] {line}")
+
+    current = None
+    for _ in range(max_visits):
+        name, due_time = scheduler.next_account()
+        if name is None:
+            break
+        wait = due_time - time.time()
+        if wait > max_wait:
+            log.info(f"[Scheduler] Next account ({name}) is not due for {wait / 60:.0f} minutes, stopping")
+            break
+        if wait > 0:
+            log.info(f"[Scheduler] Waiting {wait:.0f}s for {name}")
+            time.sleep(wait)
+
+        base = bases[index_of[name]]
+        due = scheduler.due_tasks(name)
+        if current != name:
+            base.homebase_actions.reset_select()
+            base.homebase_actions.reset_select()
+            switch_to_account(window_controller, index_of[name] + 1, f"switch to {name}")
+            current = name
+        log.info(f"[Scheduler] Visiting {name} for {', '.join(sorted(due))}")
+
+        outcomes = run_account(base, logger_instance=log, tasks=due, **options)
+        # Anything due that the visit could not act on is retried after the busy interval
+        for task in due - outcomes.keys():
+            outcomes[task] = "busy"
+        scheduler.record(name, outcomes)
+
 def main():
     """ ------------------------ Start Game -------------------------- """  
 
@@ -57,8 +304,7 @@ def main():
             wc = GameWindowController(window_title, logger)
             logger.debug(f"Window found ({wc.hwnd}). Assuming game is ready.")
             if check_for_update(wc):
-                wc.execute_clicks(update_button_position)
-                time.sleep(180)
+                click_and_await_base(wc, update_button_position, UPDATE_TIMEOUT, "update")
             return wc
         except Exception:
             pass # Not found, proceed to launch
@@ -72,13 +318,16 @@ def main():
         program_controller.start_program(COC_FILEPATH)
 
         logger.info("Waiting for Clash of Clans window to appear...")
-        while True:
+
+        def window_open():
             try:
-                GameWindowController(window_title, logger)
-                logger.info("Window detected!")
-                break
+                return GameWindowController(window_title, logger)
             except Exception:
-                time.sleep(1)
+                return None
+
+        if not wait_until(window_open, timeout=WINDOW_TIMEOUT, min_interval=1, label="game window"):
+            raise Exception(f"Clash of Clans window did not appear within {WINDOW_TIMEOUT}s")
+        logger.info("Window detected!")
         
         logger.info("Window found. Waiting 20 seconds for game initialization...")
         time.sleep(20)
@@ -86,173 +335,26 @@ def main():
         wc = GameWindowController(window_title, logger)
         
         if check_for_update(wc):
-             wc.execute_clicks(update_button_position)
-             logger.info("Update clicked. Waiting 180s...")
-             time.sleep(180)
+             logger.info(f"Clicking update. Waiting up to {UPDATE_TIMEOUT}s for the game to come back...")
+             click_and_await_base(wc, update_button_position, UPDATE_TIMEOUT, "update")
         return wc
     # load game
     window_controller = load_game()
     
     """ ------------------------ Automate Game -------------------------- """   
 
-    # Detect all config files in utils/baseconfig/config
-    config_dir = os.path.join("utils", "baseconfig")
-    config_files = [
-        f for f in glob(os.path.join(config_dir, "baseconfig_*.toml"))
-        if not f.endswith("baseconfig_template.toml") 
-    ]
-    
-    # Create a ClashBase instance for each config file, passing both actions
-    bases = [ClashBase(config_path, window_controller, logger) for config_path in config_files]
+    # Create a ClashBase instance for each config file in utils/baseconfig, passing both actions
+    bases = load_bases(window_controller)
     logger.info(f"Loaded {len(bases)} base configs:")
     for base in bases: 
         logger.info(f"- {base.name}") 
 
-    ranked_mode = False
-    lower_trophy_count = False
-    fill_storage = True
-
-    # iterate through each base twice
-    for i in range(len(bases)):
-        # iterate through each base    
-        for idx, base in enumerate(bases):
-            if idx == 0:
-                logger.info("Switching to first account...")
-                base.homebase_actions.reset_select()
-                base.homebase_actions.reset_select()
-                # copy switch_account_positions 
-                switch_account_positions_copy = switch_account_positions.copy()
-                # switch to first account
-                
-                # Use scaled offset from config
-                scaled_offset = settings.config.get("General", {}).get("account_switch_y_offset", 110)
-                
-                account_position = [ switch_account_positions_copy[-1][0],  switch_account_positions_copy[-1][1] - (scaled_offset) ]
-                switch_account_positions_copy.pop(-1) 
-                switch_account_positions_copy.append(account_position)
-                window_controller.execute_clicks(switch_account_positions_copy)
-                # wait for account to load
-                time.sleep(10)
-            
-            """ ------------------------ Home Base -------------------------- """
-
-            
-            base.homebase_actions.reset_select()
-            base.builderbase_actions.reset_select()
-            
-            
-            # determine if home base or builder base
-            if base.current_location() == 'Builder':
-                logger.info("Current Location: Builder base")
-                base.builderbase_actions.switch_to_home_base() 
-            else:
-                logger.info("Current Location: Home base")
-
-            # reset camera position
-            logger.info("Resetting camera position...")
-            base.homebase_actions.reset_camera_position()
-
-            # Execute the resource collection task  
-            logger.info("Executing resource collection...")
-            base.homebase_actions.execute_resource_collection()
-
-            # check if builder or research upgrade is available
-            logger.info("Checking for builder or research upgrade...")
-            if base.homebase_actions.check_builder_upgrade() > 0 or base.homebase_actions.check_laboratory_upgrade() > 0 or fill_storage:
-                # check available heros
-                available_heros = 0
-                # if thl >= 7, check available heros
-                logger.info("Checking available heros...")
-                if base.homebase_actions.thl >= 7:
-                    available_heros = base.homebase_actions.check_heros()
-                # upgrade walls
-                logger.info("Upgrading walls...")
-                base.homebase_actions.upgrade_walls()
-                # get max resources through attacking and builder upgrades
-                logger.info("Starting attack loop...")
-                base.homebase_actions.main_attack_loop(available_heros, ranked_mode, fill_storage)
-            
-            # if thl >= 3, start laboratory upgrade
-            logger.info("Checking for laboratory upgrade...")
-            if base.homebase_actions.thl >= 3:
-                base.homebase_actions.start_laboratory_upgrade()
-            # if thl >= 10, start apprentices
-            logger.info("Checking for apprentices upgrade...")
-            if base.homebase_actions.thl >= 9:
-                base.homebase_actions.start_apprentices()
-            # if thl >= 15, start pet upgrade
-            logger.info("Checking for pet upgrade...")
-            if base.homebase_actions.thl >= 14:
-                base.homebase_actions.start_pet_upgrade()
-            
-
-
-            """ ------------------------ Builder Base -------------------------- """
-            # switch to builder base
-            logger.info("Switching to builder base...")
-            base.homebase_actions.switch_builder_base()
-
-            # reset select and camera position
-            logger.info("Resetting camera position...")
-            base.builderbase_actions.reset_select()
-            base.builderbase_actions.reset_camera_position()
-            # execute resource collection
-            logger.info("Executing resource collection...")
-            base.builderbase_actions.execute_resource_collection()
-
-            # check available heros
-            available_heros = 1
-            # logger.info("Checking available heros...")
-            available_heros = base.builderbase_actions.check_heros()
-
-            # lower trophy count
-            if lower_trophy_count:
-                logger.info("Lowering trophy count...")
-                base.builderbase_actions.lower_trophy_count()
-
-            # check if builder or research upgrade is available
-            logger.info("Checking for builder or research upgrade...")
-            if base.builderbase_actions.check_builder_upgrade() > 0 or base.builderbase_actions.check_laboratory_upgrade() or fill_storage:
-                # get max resources through attacking and builder upgrades
-                logger.info("Starting attack loop...")
-                base.builderbase_actions.main_attack_loop(available_heros, fill_storage)
-
-
-
-
-            """ ------------------------ Switch Accounts -------------------------- """
-            # switch account
-            if len(bases) > idx + 1:
-                # copy switch_account_positions 
-                switch_account_positions_copy = switch_account_positions.copy()
-                logger.info(f"Switching to account {idx + 2}")
-                
-                # Use scaled offset from config
-                scaled_offset = settings.config.get("General", {}).get("account_switch_y_offset", 110)
-                
-                account_position = [ switch_account_positions_copy[-1][0],  switch_account_positions_copy[-1][1] + (idx * scaled_offset) ]
-                switch_account_positions_copy.pop(-1)
-                switch_account_positions_copy.append(account_position)
-                logger.info(f"Switching to account {idx + 2} at position {account_position}")
-                
-                 # Draw Circle
-                base.homebase_actions.annotate_coords_on_image([account_position])
-                window_controller.execute_clicks(switch_account_positions_copy)
-                # wait for account to load
-                time.sleep(20)
-            # go back to main home base
-            else:
-                logger.info("No more accounts to switch to")
-                
-                # Use scaled offset from config
-                scaled_offset = settings.config.get("General", {}).get("account_switch_y_offset", 110)
-                
-                account_position = [ switch_account_positions[-1][0],  switch_account_positions[-1][1] - (scaled_offset) ]
-                switch_account_positions.pop(-1) 
-                switch_account_positions.append(account_position)
-                window_controller.execute_clicks(switch_account_positions)
-                # wait for account to load
-                time.sleep(20)
+    if settings.config.get("Scheduler", {}).get("enabled", True):
+        # visit accounts when their builders, lab, pets or storages are due
+        run_scheduled(window_controller, bases, ranked_mode=False, lower_trophy_count=False, fill_storage=True)
+    else:
+        # iterate through each base once per base
+        run_accounts(window_controller, bases, ranked_mode=False, lower_trophy_count=False, fill_storage=True)
 
 
     """ ------------------------ Stop Game -------------------------- """    
@@ -0,0 +1,113 @@
+"""
+Runs several game instances at once: one worker thread per "Clash of Clans" window, each with its own
+GameWindowController and account queue. OCR and tile detection are throttled process-wide (see
+vision_utils OCR_SLOTS / DETECTION_SLOTS); tile layouts, army plans and telemetry are shared by all workers.
+The game instances must already be running, logged in, and use the same window size.
+"""
+
+import threading
+import time
+
+import win32gui
+
+from main import load_bases, run_accounts, run_scheduled
+from utils import settings
+from utils.game_window_controller import GameWindowController
+from utils.settings import logger
+
+WINDOW_TITLE = "Clash of Clans"
+instance_config = settings.config.get("MultiInstance", {})
+
+
+def discover_instances(logger_instance=None):
+    """
+    Returns a GameWindowController per game window, ordered left to right, then top to bottom on screen, so the
+    [MultiInstance] accounts list maps onto windows the same way every run.
+    """
+    log = logger_instance if logger_instance else logger
+    hwnds = GameWindowController.find_windows(WINDOW_TITLE)
+    hwnds.sort(key=lambda hwnd: win32gui.GetWindowRect(hwnd)[:2])
+    controllers = []
+    for index, hwnd in enumerate(hwnds):
+        instance_logger = log.getChild(f"instance{index + 1}")
+        controllers.append(GameWindowController(WINDOW_TITLE, instance_logger, hwnd=hwnd))
+    return controllers
+
+
+def assign_accounts(controllers, logger_instance=None):
+    """
+    Maps each controller to the account names it should cycle through, in that instance's switch-menu order.
+    :return: List of (controller, names); names None means every account (single instance only).
+    """
+    log = logger_instance if logger_instance else logger
+    accounts = instance_config.get("accounts", [])
+    if not accounts:
+        if len(controllers) > 1:
+            raise ValueError(f"{len(controllers)} game windows found; list each window's accounts in [MultiInstance] accounts")
+        return [(controllers[0], None)]
+
+    if len(accounts) < len(controllers):
+        log.warning(f"[Multi Instance] {len(controllers)} windows but only {len(accounts)} account lists, extra windows stay idle")
+    elif len(accounts) > len(controllers):
+        log.warning(f"[Multi Instance] Only {len(controllers)} windows for {len(accounts)} account lists, the rest are skipped")
+    return list(zip(controllers, accounts))
+
+
+def run_instance(window_controller, bases, passes, errors):
+    """Worker thread body: cycles the instance's accounts, recording (but not raising) a failure."""
+    log = window_controller.logger
+    try:
+        log.info(f"[Multi Instance] Window {window_controller.hwnd}: {', '.join(base.name for base in bases)}")
+        options = dict(ranked_mode=False, lower_trophy_count=False, fill_storage=True)
+        if settings.config.get("Scheduler", {}).get("enabled", True):
+            run_scheduled(window_controller, bases, logger_instance=log, **options)
+        else:
+            run_accounts(window_controller, bases, passes, log, **options)
+        log.info("[Multi Instance] Instance finished")
+    except Exception as e:
+        log.exception(f"[Multi Instance] Instance failed: {e}")
+        errors.append((window_controller.hwnd, e))
+
+
+def main():
+    controllers = discover_instances()
+    if not controllers:
+        logger.error("No Clash of Clans windows found. Start the game instances first.")
+        return
+    logger.info(f"Found {len(controllers)} game window(s)")
+
+    # Config coordinates are scaled once for the first window's size; every instance has to match it
+    expected_size = controllers[0].client_size()
+    usable = []
+    for wc in controllers:
+        size = wc.client_size()
+        if size != expected_size:
+            logger.error(f"[Multi Instance] Window {wc.hwnd} is {size[0]}x{size[1]}, expected {expected_size[0]}x{expected_size[1]}; skipping it")
+            continue
+        usable.append(wc)
+
+    # Bases are created up front on the main thread so the shared caches exist before the workers start
+    workers = []
+    errors = []
+    for wc, names in assign_accounts(usable):
+        bases = load_bases(wc, wc.logger, names)
+        if not bases:
+            continue
+        passes = instance_config.get("passes") or len(bases)
+        thread = threading.Thread(target=run_instance, args=(wc, bases, passes, errors), name=wc.logger.name, daemon=True)
+        workers.append(thread)
+
+    start = time.perf_counter()
+    stagger = instance_config.get("start_stagger", 5)
+    for thread in workers:
+        thread.start()
+        # Offsets the instances so their OCR-heavy phases do not all line up
+        time.sleep(stagger)
+    for thread in workers:
+        thread.join()
+
+    logger.info(f"[Multi Instance] {len(workers)} instance(s) finished in {(time.perf_counter() - start) / 60:.1f} minutes, {len(errors)} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Due-time scheduling of account visits.
+Every account tracks when each of its tasks next needs attention. A visit reports an outcome per task it ran
+("started" an upgrade, found it "busy", nothing left to do "idle", "filled" the storages, or "unavailable" at this
+town hall level), and the task becomes due again after the [Scheduler] interval for that outcome. Accounts wait in a
+priority queue ordered by their earliest due task, so a visit only happens when something is ready.
+"""
+
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+
+from utils.settings import config, logger
+
+TASKS = ("builders", "lab", "pets", "storage")
+
+DEFAULT_INTERVALS = {
+    "builders_started": 14400,
+    "builders_busy": 3600,
+    "lab_started": 14400,
+    "lab_busy": 3600,
+    "pets_started": 14400,
+    "pets_busy": 3600,
+    "pets_idle": 86400,
+    "storage_filled": 7200,
+    "storage_busy": 3600,
+    "unavailable": 86400,
+}
+
+
+class AccountScheduler:
+    """
+    Priority queue of accounts by due time, persisted to [Scheduler] state_path so a restart keeps the schedule.
+    Several schedulers (one per game instance) may share the file; each only writes its own accounts.
+    """
+    _file_lock = threading.Lock()
+
+    def __init__(self, names, logger_instance=None, path=None):
+        self.logger = logger_instance if logger_instance else logger
+        self.cfg = config.get("Scheduler", {})
+        self.path = path if path else self.cfg.get("state_path", os.path.join('data', 'schedule.json'))
+        self.names = list(names)
+        saved = self._load()
+        # Unknown accounts and tasks are due immediately
+        self.due = {name: {task: float(saved.get(name, {}).get(task, 0)) for task in TASKS} for name in self.names}
+        self.heap = []
+        self.counter = itertools.count()
+        for name in self.names:
+            self._push(name)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"[Scheduler] Could not read {self.path}, everything is due: {e}")
+            return {}
+
+    def save(self):
+        with self._file_lock:
+            state = self._load()
+            state.update({name: self.due[name] for name in self.names})
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(state, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                self.logger.warning(f"[Scheduler] Failed to write {self.path}: {e}")
+
+    def _push(self, name):
+        heapq.heappush(self.heap, (min(self.due[name].values()), next(self.counter), name))
+
+    def next_account(self):
+        """
+        Returns (name, due_time) of the account that needs attention first, without removing it.
+        Heap entries made stale by a later record() are dropped here.
+        """
+        while self.heap:
+            due_time, _, name = self.heap[0]
+            if due_time == min(self.due[name].values()):
+                return name, due_time
+            heapq.heappop(self.heap)
+        return None, None
+
+    def due_tasks(self, name, now=None):
+        now = now if now is not None else time.time()
+        return {task for task, due_time in self.due[name].items() if due_time <= now}
+
+    def interval(self, task, outcome):
+        key = "unavailable" if outcome == "unavailable" else f"{task}_{outcome}"
+        return self.cfg.get(key, DEFAULT_INTERVALS.get(key, DEFAULT_INTERVALS["unavailable"]))
+
+    def record(self, name, outcomes, now=None):
+        """Reschedules the tasks a visit ran from their outcomes ({task: outcome}) and persists the schedule."""
+        now = now if now is not None else time.time()
+        for task, outcome in outcomes.items():
+            delay = self.interval(task, outcome)
+            self.due[name][task] = now + delay
+            self.logger.debug(f"[Scheduler] {name}: {task} {outcome}, due again in {delay / 60:.0f} min")
+        self._push(name)
+        self.save()
+
+    def describe(self, now=None):
+        now = now if now is not None else time.time()
+        lines = []
+        for name in self.names:
+            soonest = min(self.due[name].values())
+            lines.append(f"{name}: {'due now' if soonest <= now else f'due in {(soonest - now) / 60:.0f} min'}")
+        return lines
@@ -0,0 +1,97 @@
+"""
+Persistent per-account facts (data/state/{account}.json) with a time-to-live each, so probes whose answer is
+still valid are skipped on the next run: pets known to be maxed, heroes known to be available, and so on.
+"""
+
+import json
+import os
+import threading
+import time
+
+from utils.settings import config, logger
+
+STATE_VERSION = 1
+
+# Seconds a fact stays valid; [AccountState.ttl] overrides these (by fact name before the first ':')
+DEFAULT_TTLS = {
+    "pet_maxed": 14 * 86400,
+    "heroes_available": 1800,
+    "builder_heroes_available": 1800,
+}
+
+
+class AccountState:
+    """
+    Versioned fact store of one account. Home and builder base actions of an account share it (see for_account).
+    A fact is returned by get() until its TTL runs out; invalidate() drops it when an action makes it wrong.
+    """
+    _accounts = {}
+    _accounts_lock = threading.Lock()
+
+    def __init__(self, account, logger_instance=None, path=None):
+        self.logger = logger_instance if logger_instance else logger
+        state_cfg = config.get("AccountState", {})
+        self.enabled = state_cfg.get("enabled", True)
+        self.ttls = dict(DEFAULT_TTLS, **state_cfg.get("ttl", {}))
+        directory = state_cfg.get("directory", os.path.join('data', 'state'))
+        self.path = path if path else os.path.join(directory, f"{account}.json")
+        self.lock = threading.Lock()
+        self.facts = self._load() if self.enabled else {}
+
+    @classmethod
+    def for_account(cls, account, logger_instance=None):
+        """Returns the process-wide state of account."""
+        with cls._accounts_lock:
+            if account not in cls._accounts:
+                cls._accounts[account] = cls(account, logger_instance)
+            return cls._accounts[account]
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"[Account State] Could not read {self.path}, starting empty: {e}")
+            return {}
+        if data.get("version") != STATE_VERSION:
+            self.logger.info(f"[Account State] {self.path} is from an older version, starting empty")
+            return {}
+        return data.get("facts", {})
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({"version": STATE_VERSION, "facts": self.facts}, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.warning(f"[Account State] Failed to write {self.path}: {e}")
+
+    def ttl(self, fact):
+        return self.ttls.get(fact.split(":", 1)[0], 0)
+
+    def get(self, fact, default=None):
+        """The cached value of fact, or default if it is unknown or expired."""
+        entry = self.facts.get(fact)
+        if entry is None or time.time() - entry["at"] > entry["ttl"]:
+            return default
+        return entry["value"]
+
+    def set(self, fact, value, ttl=None):
+        if not self.enabled:
+            return
+        ttl = ttl if ttl is not None else self.ttl(fact)
+        if ttl <= 0:
+            return
+        with self.lock:
+            self.facts[fact] = {"value": value, "at": time.time(), "ttl": ttl}
+            self._save()
+
+    def invalidate(self, *facts):
+        with self.lock:
+            removed = [fact for fact in facts if self.facts.pop(fact, None) is not None]
+            if removed:
+                self._save()
@@ -0,0 +1,222 @@
+import copy
+import threading
+
+import numpy as np
+
+from utils.coords import current_transform
+from utils.settings import logger
+
+# Taps at or below this row land on the army bar, as a fraction of the client height
+SELECT_Y_THRESHOLD = 0.85
+# Horizontal gaps between army bar tiles of the same category and between categories
+GAP_INTRA = 8
+GAP_INTER = 24
+# Pause between deploying heroes and activating their abilities
+HERO_ACTIVATION_WAIT = 3
+
+# Row kinds
+KIND_SELECT = 0
+KIND_DROP = 1
+KIND_ACTIVATE = 2
+KIND_WAIT = 3
+
+PHASE_NAMES = ("troops", "cc", "heroes", "spells")
+
+
+class ArmyPlan:
+    """
+    Flat, read-only deployment plan for one army.
+    rows is an (N, 4) float array of (x, y, delay, kind); wait rows use x = y = -1.
+    phases maps each phase name in PHASE_NAMES to its (start, stop) row range.
+    """
+
+    def __init__(self, rows, phases, tile_w):
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, 4)
+        rows.setflags(write=False)
+        self.rows = rows
+        self.phases = dict(phases)
+        self.tile_w = tile_w
+
+    def __len__(self):
+        return len(self.rows)
+
+    def phase_rows(self, first, last=None):
+        """Returns the rows from phase `first` through phase `last` (inclusive)."""
+        start = self.phases[first][0]
+        stop = self.phases[last if last else first][1]
+        return self.rows[start:stop]
+
+    def phase_of(self, index):
+        for name, (start, stop) in self.phases.items():
+            if start <= index < stop:
+                return name
+        return None
+
+    @property
+    def select_count(self):
+        """Number of army bar tiles the plan taps (hero ability activations excluded)."""
+        return int(np.count_nonzero(self.rows[:, 3] == KIND_SELECT))
+
+    def phase_select_counts(self):
+        kinds = self.rows[:, 3]
+        return {name: int(np.count_nonzero(kinds[start:stop] == KIND_SELECT)) for name, (start, stop) in self.phases.items()}
+
+    def select_span(self, first, last=None):
+        """Horizontal distance between the first and last tile tapped in the given phases."""
+        rows = self.phase_rows(first, last)
+        xs = rows[rows[:, 3] == KIND_SELECT, 0]
+        return int(xs.max() - xs.min()) if len(xs) else 0
+
+
+def _is_coord(obj):
+    return isinstance(obj, (list, tuple)) and len(obj) == 2 and all(isinstance(v, (int, float)) for v in obj)
+
+
+def _flatten(obj):
+    """Yields every [x, y] coordinate of a (possibly nested) phase list in click order."""
+    if _is_coord(obj):
+        yield obj
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            yield from _flatten(item)
+
+
+def _expand_heroes(hero_list, hero_count, select_y):
+    """
+    Repeats the first (select, drop) pair of the hero phase until it selects hero_count heroes.
+    hero_count of None keeps the legacy default of 4; 0 removes the hero phase.
+    :param select_y: Pixel row at or below which a tap selects an army bar tile.
+    """
+    target = hero_count if isinstance(hero_count, int) else 4
+    if target == 0:
+        return []
+    current = sum(1 for c in hero_list if _is_coord(c) and c[1] >= select_y)
+    if 0 < current < target and len(hero_list) >= 2:
+        template = hero_list[0:2]
+        for _ in range(target - current):
+            hero_list.extend(copy.deepcopy(template))
+    return hero_list
+
+
+def _special_placeholders(special):
+    """Builds the select/drop taps for event super troops: (count, clicks per troop, drop pos, select dummy, at_start)."""
+    count, clicks, drop_pos, select_dummy, _ = special
+    placeholders = []
+    for i in range(count):
+        n = clicks[i] if i < len(clicks) else 10
+        placeholders.append(list(select_dummy))
+        placeholders.extend([list(drop_pos)] * n)
+    return placeholders
+
+
+def compile_army_plan(positions, hero_count, special, anchor, tile_w, delay, first_phase=0, transform=None):
+    """
+    Compiles raw army positions into an ArmyPlan.
+    transform is the client size the positions are resolved for, the current one by default.
+    Army bar taps (y at or below SELECT_Y_THRESHOLD of the client height) are re-laid out from the anchor tile centre, one tile width plus
+    GAP_INTRA apart, with an extra GAP_INTER - GAP_INTRA between categories. Phases before first_phase are skipped.
+    """
+    phases_src = copy.deepcopy(positions)
+    # Positions are pixels of the current client size, so the threshold is resolved for the same size
+    select_y = (transform if transform else current_transform()).length(SELECT_Y_THRESHOLD, 1)
+
+    if special and special[0] > 0 and phases_src:
+        placeholders = _special_placeholders(special)
+        phases_src[0] = placeholders + phases_src[0] if special[4] else phases_src[0] + placeholders
+
+    if len(phases_src) > 2:
+        phases_src[2] = _expand_heroes(phases_src[2], hero_count, select_y)
+
+    start_x, start_y = anchor
+    curr_x = start_x
+    rows = []
+    phases = {}
+
+    def lay_out(coords):
+        nonlocal curr_x
+        laid = []
+        for x, y in coords:
+            if y >= select_y:
+                laid.append((int(curr_x), int(start_y), KIND_SELECT))
+                curr_x += tile_w + GAP_INTRA
+            else:
+                laid.append((x, y, KIND_DROP))
+        return laid
+
+    for p_idx, phase in enumerate(phases_src):
+        if p_idx < first_phase:
+            continue
+        name = PHASE_NAMES[min(p_idx, len(PHASE_NAMES) - 1)]
+        start = len(rows)
+        laid = lay_out(list(_flatten(phase)))
+
+        if name == "heroes":
+            # Deploy (select, drop) pairs, wait, then tap each hero again to activate its ability
+            pairs = laid[:len(laid) // 2 * 2]
+            rows.extend((x, y, delay, kind) for x, y, kind in pairs)
+            if pairs:
+                rows.append((-1, -1, HERO_ACTIVATION_WAIT, KIND_WAIT))
+                rows.extend((x, y, delay, KIND_ACTIVATE) for x, y, _ in pairs[0::2])
+        else:
+            rows.extend((x, y, delay, kind) for x, y, kind in laid)
+
+        if any(kind == KIND_SELECT for _, _, kind in laid):
+            curr_x += GAP_INTER - GAP_INTRA
+
+        prev_start = phases.get(name, (start, start))[0]
+        phases[name] = (prev_start, len(rows))
+
+    # Every phase name resolves, even when the army has no taps for it
+    end = len(rows)
+    for name in PHASE_NAMES:
+        if name not in phases:
+            later = [phases[n][0] for n in PHASE_NAMES[PHASE_NAMES.index(name) + 1:] if n in phases]
+            pos = later[0] if later else end
+            phases[name] = (pos, pos)
+
+    return ArmyPlan(rows, phases, tile_w)
+
+
+class ArmyPlanCache:
+    """
+    Caches compiled plans per (army, hero count, special troops, tile geometry, delay, first phase).
+    Entries remember the positions object they were compiled from, so a reloaded config never reuses a stale plan.
+    """
+    MAX_ENTRIES = 64
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self.plans = {}
+        # Game instance workers share one cache
+        self.lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    def get_plan(self, army_key, positions, hero_count, special, anchor, tile_w, delay, first_phase=0):
+        # Config positions are re-resolved in place on a window resize, so the client size is part of the key
+        # and the plan's army bar threshold is resolved for that same size
+        transform = current_transform()
+        key = (army_key, id(positions), transform.size, hero_count, special, tuple(int(v) for v in anchor), int(tile_w), delay, first_phase)
+        with self.lock:
+            entry = self.plans.get(key)
+        if entry is not None and entry[0] is positions:
+            return entry[1]
+
+        plan = compile_army_plan(positions, hero_count, special, anchor, tile_w, delay, first_phase, transform)
+        with self.lock:
+            if len(self.plans) >= self.MAX_ENTRIES:
+                self.plans.clear()
+            self.plans[key] = (positions, plan)
+        logger.debug(f"[Army Plan] Compiled '{army_key}' ({len(plan)} rows, {plan.select_count} tiles) from phase {first_phase}")
+        return plan
+
+    def clear(self):
+        with self.lock:
+            self.plans.clear()
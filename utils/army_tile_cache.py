@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+
+from utils.settings import logger
+
+
+class ArmyTileCache:
+    """
+    Persists detected army-bar tile layouts per account, army, scroll phase, resolution, available heroes and event
+    super troop count.
+    The tile geometry never changes for a given resolution and army composition, so a layout only needs
+    full contour detection again when the cheap border probes stop matching.
+    """
+    CACHE_PATH = os.path.join('data', 'cache', 'army_tile_layouts.json')
+    _shared = None
+
+    def __init__(self, logger_instance=None, path=None):
+        self.logger = logger_instance if logger_instance else logger
+        self.path = path if path else self.CACHE_PATH
+        self.layouts = self._load()
+        # Game instance workers share the cache and its file
+        self.lock = threading.RLock()
+
+    @classmethod
+    def shared(cls):
+        """Returns the process-wide cache so every account writes to the same file."""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    @staticmethod
+    def make_key(account, army_key, phase, width, height, hero_count=None, special_count=0):
+        # Available heroes and event super troops change how many tiles the bar holds and where they sit
+        return f"{account}|{army_key}|{phase}|{width}x{height}|h{hero_count}|s{special_count}"
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"[Tile Cache] Could not read {self.path}, starting empty: {e}")
+            return {}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with self.lock:
+                with open(tmp_path, 'w') as f:
+                    json.dump(self.layouts, f)
+                os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.warning(f"[Tile Cache] Failed to write {self.path}: {e}")
+
+    def get(self, key):
+        return self.layouts.get(key)
+
+    def put(self, key, tile_data):
+        """
+        Stores the result of detect_first_army_tile. Contours are dropped, only the rectangles are kept.
+        """
+        cx, cy, std_rect, candidates = tile_data
+        layout = {
+            'cx': int(cx),
+            'cy': int(cy),
+            'rect': [int(v) for v in std_rect],
+            'tiles': [
+                {k: int(c[k]) for k in ('x', 'y', 'w', 'h', 'global_y')}
+                for c in candidates
+            ],
+        }
+        with self.lock:
+            self.layouts[key] = layout
+            self._save()
+
+    def invalidate(self, key):
+        with self.lock:
+            if self.layouts.pop(key, None) is not None:
+                self._save()
+
+    def clear(self):
+        with self.lock:
+            self.layouts = {}
+            self._save()
+
+    @staticmethod
+    def as_tile_data(layout):
+        """Converts a cached layout back into the detect_first_army_tile return shape."""
+        return layout['cx'], layout['cy'], tuple(layout['rect']), [dict(t) for t in layout['tiles']]
@@ -0,0 +1,259 @@
+"""
+Attack loop state machine shared by the home and builder bases.
+
+    check_storage -> search -> deploy -> await_end -> return_home -> check_storage ...
+    check_storage (storages full) -> upgrade -> check_storage (builders were used) | fill phase | done
+
+The actions object provides the phases: check_max_resources, attack_search(army_key, ranked_mode) -> loot or None,
+army_placement(army_key, available_heros, delay), attack_await_end(army_key, loot) -> outcome,
+attack_return_home() and start_builder_upgrade().
+After every transition the loop state is written to data/checkpoints/{account}_{base}.json so a restarted bot
+resumes the cycle where it stopped instead of starting the account's attack loop over.
+"""
+
+import json
+import os
+import time
+
+from utils.config_watcher import ConfigWatcher
+from utils.settings import config, logger
+
+CHECKPOINT_VERSION = 1
+
+# States that only make sense on the battle screen. After a restart the caller has usually relaunched the game and
+# is back on the village, so these are resumed only if the live screen still shows the battle's Return Home button.
+BATTLE_STATES = ("search", "deploy", "await_end", "return_home")
+
+
+class AttackCheckpoint:
+    """JSON checkpoint of one account's attack loop, written atomically after every transition."""
+
+    def __init__(self, account, base, logger_instance=None):
+        self.logger = logger_instance if logger_instance else logger
+        loop_cfg = config.get("AttackLoop", {})
+        directory = loop_cfg.get("checkpoint_dir", os.path.join('data', 'checkpoints'))
+        self.path = os.path.join(directory, f"{account}_{base}.json")
+        self.max_age = loop_cfg.get("checkpoint_max_age", 1800)
+
+    def load(self):
+        """Returns the saved loop state, or None if there is none or it is too old to trust."""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"[Attack Loop] Could not read checkpoint {self.path}: {e}")
+            return None
+        if state.get("version") != CHECKPOINT_VERSION:
+            return None
+        age = time.time() - state.get("updated", 0)
+        if age > self.max_age:
+            self.logger.info(f"[Attack Loop] Ignoring checkpoint from {age / 60:.0f} minutes ago")
+            return None
+        return state
+
+    def save(self, state):
+        state = dict(state, version=CHECKPOINT_VERSION, updated=time.time())
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.warning(f"[Attack Loop] Failed to write checkpoint {self.path}: {e}")
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning(f"[Attack Loop] Failed to remove checkpoint {self.path}: {e}")
+
+
+class AttackLoop:
+    """
+    Runs attacks as an explicit state machine instead of recursive calls, recording each attack and each
+    fill-the-storages run to telemetry.
+    :param base: "home" or "builder"; used for the checkpoint name and telemetry.
+    :param refresh_heroes: Optional callable returning the available heroes after builders were used.
+    :param collect_after_attack: Run the base's resource collection after every attack (builder base).
+    """
+
+    def __init__(self, actions, base, army_key='main_attack', placement_delay=0.5, refresh_heroes=None,
+                 collect_after_attack=False, logger_instance=None):
+        self.actions = actions
+        self.base = base
+        self.army_key = army_key
+        self.placement_delay = placement_delay
+        self.refresh_heroes = refresh_heroes
+        self.collect_after_attack = collect_after_attack
+        self.logger = logger_instance if logger_instance else actions.logger
+        self.telemetry = getattr(actions, "telemetry", None)
+        self.handlers = {
+            "check_storage": self._check_storage,
+            "search": self._search,
+            "deploy": self._deploy,
+            "await_end": self._await_end,
+            "return_home": self._return_home,
+            "upgrade": self._upgrade,
+        }
+        self.state = None
+        self.timings = {}
+
+    def run(self, available_heros, fill_storage=False, ranked_mode=False):
+        """
+        Attacks until the storages are full (twice when fill_storage: before and after builder upgrades).
+        :return: The number of builder upgrades started.
+        """
+        checkpoint = AttackCheckpoint(self.actions.base_name, self.base, self.logger)
+        self.state = self._initial_state(checkpoint.load(), available_heros, fill_storage, ranked_mode)
+        self.timings = {}
+        loop_start = time.perf_counter()
+        loop_attacks = 0
+        name = self.state["state"]
+
+        try:
+            while name != "done":
+                self.state["state"] = name
+                checkpoint.save(self.state)
+                # Config edits are swapped in here; values the actions copied at construction only follow at the
+                # account's next visit (ClashBase.refresh_config)
+                ConfigWatcher.shared().poll()
+                entered = time.perf_counter()
+                next_name = self.handlers[name]()
+                self.timings[name] = time.perf_counter() - entered
+                self.logger.debug(f"[Attack Loop] {name} -> {next_name} ({self.timings[name]:.1f}s)")
+
+                if name == "return_home":
+                    loop_attacks += 1
+                if name == "check_storage" and next_name in ("upgrade", "done"):
+                    self._record_loop(loop_start, loop_attacks, True)
+                    loop_start = time.perf_counter()
+                    loop_attacks = 0
+                name = next_name
+        except BaseException:
+            # Keep the checkpoint for the next run
+            self._record_loop(loop_start, loop_attacks, False)
+            raise
+
+        checkpoint.clear()
+        return self.state["upgrades"]
+
+    def attack(self, army_key, available_heros, ranked_mode=False):
+        """Runs a single search -> deploy -> await_end -> return_home cycle without checkpoints."""
+        self.state = self._new_state(available_heros, False, ranked_mode)
+        self.state["army_key"] = army_key
+        self.timings = {}
+        name = "search"
+        while True:
+            ConfigWatcher.shared().poll()
+            entered = time.perf_counter()
+            next_name = self.handlers[name]()
+            self.timings[name] = time.perf_counter() - entered
+            if name == "return_home":
+                return
+            name = next_name
+
+    def _new_state(self, available_heros, fill_storage, ranked_mode):
+        return {
+            "account": self.actions.base_name,
+            "base": self.base,
+            "state": "check_storage",
+            "phase": "main",
+            "army_key": self.army_key,
+            "available_heros": available_heros,
+            "fill_storage": bool(fill_storage),
+            "ranked_mode": bool(ranked_mode),
+            "enemy_loot": None,
+            "outcome": None,
+            "attacks": 0,
+            "upgrades": 0,
+        }
+
+    def _initial_state(self, saved, available_heros, fill_storage, ranked_mode):
+        if saved and saved.get("account") == self.actions.base_name and saved.get("base") == self.base:
+            resumed = saved["state"]
+            if resumed in BATTLE_STATES:
+                resumed = self._battle_resume_state()
+            self.logger.info(f"[Attack Loop] Resuming {self.base} attack loop at '{resumed}' ({saved['phase']} phase, {saved['attacks']} attacks done)")
+            saved = dict(saved, state=resumed)
+            # Heroes were just checked by the caller; the saved list may be out of date
+            saved["available_heros"] = available_heros
+            # This run's request can only widen the saved one
+            saved["fill_storage"] = saved.get("fill_storage", False) or bool(fill_storage)
+            saved.setdefault("upgrades", 0)
+            return saved
+        return self._new_state(available_heros, fill_storage, ranked_mode)
+
+    def _battle_resume_state(self):
+        """Where a loop saved mid-battle picks up: the battle's end screen if it is still showing, else check_storage."""
+        if self.actions.check_return_home_visible():
+            return "return_home"
+        return "check_storage"
+
+    """ --------------------------- States --------------------------------- """
+
+    def _check_storage(self):
+        if self.actions.check_max_resources():
+            return "upgrade" if self.state["phase"] == "main" else "done"
+        return "search"
+
+    def _search(self):
+        self.timings = {"attack_start": time.perf_counter()}
+        loot = self.actions.attack_search(self.state["army_key"], self.state["ranked_mode"])
+        self.state["enemy_loot"] = list(loot) if loot else None
+        self.state["outcome"] = None
+        return "deploy"
+
+    def _deploy(self):
+        self.actions.army_placement(self.state["army_key"], self.state["available_heros"], delay=self.placement_delay)
+        return "await_end"
+
+    def _await_end(self):
+        self.state["outcome"] = self.actions.attack_await_end(self.state["army_key"], self.state["enemy_loot"])
+        return "return_home"
+
+    def _return_home(self):
+        self.actions.attack_return_home()
+        if self.collect_after_attack:
+            self.actions.execute_resource_collection()
+        self.state["attacks"] += 1
+        self._record_attack()
+        self.state["enemy_loot"] = None
+        return "check_storage"
+
+    def _upgrade(self):
+        if self.actions.start_builder_upgrade():
+            self.state["upgrades"] += 1
+            # Upgrades spent resources, fill the storages again
+            if self.refresh_heroes:
+                self.logger.info("Builders upgraded. Checking heros again...")
+                self.state["available_heros"] = self.refresh_heroes()
+            return "check_storage"
+        if self.state["fill_storage"] and self.state["phase"] == "main":
+            self.state["phase"] = "fill"
+            return "check_storage"
+        return "done"
+
+    """ --------------------------- Telemetry --------------------------------- """
+
+    def _record_attack(self):
+        if not self.telemetry or "attack_start" not in self.timings:
+            return
+        last_search = getattr(self.actions, "last_search", None)
+        search_seconds, bases_seen = last_search if last_search else (None, None)
+        gold, elixir, dark = self.state["enemy_loot"] if self.state["enemy_loot"] else (None, None, None)
+        self.telemetry.record(
+            "attacks", account=self.actions.base_name, base=self.base, army=self.state["army_key"],
+            search_seconds=search_seconds, bases_seen=bases_seen, placement_seconds=self.timings.get("deploy"),
+            battle_seconds=self.timings.get("await_end"), total_seconds=time.perf_counter() - self.timings["attack_start"],
+            outcome=self.state.get("outcome") or "timeout", gold=gold, elixir=elixir, dark=dark,
+        )
+
+    def _record_loop(self, loop_start, attacks, storage_filled):
+        if self.telemetry:
+            self.telemetry.record("attack_loops", account=self.actions.base_name, base=self.base, attacks=attacks,
+                                  seconds=time.perf_counter() - loop_start, storage_filled=int(storage_filled))
@@ -5,24 +5,42 @@ from datetime import datetime
 
 import cv2
 
+from utils.account_state import AccountState
+from utils.battle_monitor import BattleMonitor
+from utils.input_dispatcher import InputDispatcher
 from utils.object_detection import (
     annotate_coords_on_image,
     detect_reload_screen,
     detect_word_in_region,
 )
+from utils.telemetry import Telemetry
 from utils.vision_utils import VisionUtils
 
+# Screenshots younger than this (seconds) are never cleaned up
+SCREENSHOT_MIN_AGE = 10
 
 class BaseActions:
     _global_attack_count = 0
-    def __init__(self, window_controller, config, logger):
+    def __init__(self, window_controller, config, logger, base_name=None):
         self.window_controller = window_controller
         self.config = config
         self.logger = logger
+        # Account name used to key per-account caches
+        self.base_name = base_name or self.config.get("General", {}).get("name", "default")
         # To be overridden by subclasses if needed
         self.colors = self.config.get("Colors", {})
         # Coords to be set by subclasses
         self.coords = {} 
+        # Adaptive click sequences (waits for the frame to react instead of fixed sleeps)
+        self.dispatcher = InputDispatcher(window_controller, logger)
+        # Timeouts for click-and-await waits (act_and_await)
+        self.frame_wait = self.config.get("FrameWait", {})
+        # Cheap-probe battle end detection (OCR only confirms)
+        self.battle_monitor = BattleMonitor(self)
+        # Attack telemetry store (None when disabled)
+        self.telemetry = Telemetry.shared()
+        # Facts about this account that outlive the run (shared by the home and builder base actions)
+        self.account_state = AccountState.for_account(self.base_name, self.logger)
 
     def cleanup_screenshot_storage(self, base_name, limit=10):
         """
@@ -36,15 +54,27 @@ class BaseActions:
         search_pattern = os.path.join(dir_path, f'{base_name}_*.png')
         existing_files = glob.glob(search_pattern)
         
-        # Sort by modification time
-        existing_files.sort(key=os.path.getmtime)
+        # Sort by modification time; another worker may remove a file between the glob and the stat
+        dated = []
+        for path in existing_files:
+            try:
+                dated.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        dated.sort()
         
-        # If we have more than (limit - 1), delete the oldest ones
-        while len(existing_files) >= limit:
-            oldest_file = existing_files.pop(0)
+        # If we have more than (limit - 1), delete the oldest ones. Folders are shared between game instance
+        # workers, so a recent file may still be waiting to be read by the worker that captured it.
+        now = time.time()
+        while len(dated) >= limit:
+            mtime, oldest_file = dated.pop(0)
+            if now - mtime < SCREENSHOT_MIN_AGE:
+                break
             try:
                 os.remove(oldest_file)
                 self.logger.debug(f"Removed old screenshot: {oldest_file}")
+            except FileNotFoundError:
+                pass
             except OSError as e:
                 self.logger.warning(f"Error removing file {oldest_file}: {e}")
 
@@ -74,6 +104,41 @@ class BaseActions:
         self.window_controller.capture_minimized_window_screenshot(screenshot_path)
         annotate_coords_on_image(screenshot_path, coords, output_suffix='.png')
 
+    def return_home_signature(self, img_cv, region):
+        """
+        Cheap colour-only check for the Return Home button: the average colour of region is close to return_home_avg_rgb.
+        Works on any BGR image (in-memory frames included); OCR confirmation is left to check_return_home_visible.
+        """
+        try:
+            h, w, _ = img_cv.shape
+            x1, y1, x2, y2 = region
+            if x1 < 0 or y1 < 0 or x2 > w or y2 > h:
+                self.logger.warning(f"Return Home region {region} out of bounds for image {w}x{h}")
+                return False
+            roi = img_cv[y1:y2, x1:x2]
+            if roi.size == 0:
+                return False
+            # Calculate avg RGB (OpenCV is BGR)
+            avg_bgr = cv2.mean(roi)[:3]
+            avg_rgb = (avg_bgr[2], avg_bgr[1], avg_bgr[0]) # Convert to RGB
+            
+            self.logger.debug(f"Return Home Region Avg RGB: {avg_rgb}")
+
+            target_rgb = self.colors.get("return_home_avg_rgb", [255, 255, 255])
+            
+            # Tolerance (can be moved to config later)
+            tol = 30
+            if (abs(avg_rgb[0] - target_rgb[0]) < tol and 
+                abs(avg_rgb[1] - target_rgb[1]) < tol and 
+                abs(avg_rgb[2] - target_rgb[2]) < tol):
+                
+                self.logger.debug(f"Return Home Color Matched: {avg_rgb} ~ {target_rgb}")
+                return True
+            self.logger.debug(f"Return Home Color MISMATCH: {avg_rgb} vs Target {target_rgb}")
+        except Exception as e:
+             self.logger.error(f"Color detection failed: {e}")
+        return False
+
     def check_return_home_visible(self, region_key="return_home_region", default_region=[788, 888, 945, 974]):
         """
         Checks if 'Return Home' button is visible using OCR in the bottom area.
@@ -99,42 +164,10 @@ class BaseActions:
                 self.logger.error(f"Failed to save debug bbox: {e}")
 
         # --- Color Detection ---
-        color_match = False
-        try:
-            # Load image for color check
-            temp_img = cv2.imread(temp_path)
-            if temp_img is None:
-                self.logger.warning(f"Failed to load image for color check: {temp_path}")
-            else:
-                # Crop region from temp_img
-                # Check dimensions
-                h, w, _ = temp_img.shape
-            x1, y1, x2, y2 = region
-            if x1 < 0 or y1 < 0 or x2 > w or y2 > h:
-                self.logger.warning(f"Return Home region {region} out of bounds for image {w}x{h}")
-            else:
-                roi = temp_img[y1:y2, x1:x2]
-                if roi.size > 0:
-                    # Calculate avg RGB (OpenCV is BGR)
-                    avg_bgr = cv2.mean(roi)[:3]
-                    avg_rgb = (avg_bgr[2], avg_bgr[1], avg_bgr[0]) # Convert to RGB
-                    
-                    self.logger.debug(f"Return Home Region Avg RGB: {avg_rgb}")
-
-                    target_rgb = self.colors.get("return_home_avg_rgb", [255, 255, 255])
-                    
-                    # Tolerance (can be moved to config later)
-                    tol = 30
-                    if (abs(avg_rgb[0] - target_rgb[0]) < tol and 
-                        abs(avg_rgb[1] - target_rgb[1]) < tol and 
-                        abs(avg_rgb[2] - target_rgb[2]) < tol):
-                        
-                        self.logger.debug(f"Return Home Color Matched: {avg_rgb} ~ {target_rgb}")
-                        color_match = True
-                    else:
-                        self.logger.debug(f"Return Home Color MISMATCH: {avg_rgb} vs Target {target_rgb}")
-        except Exception as e:
-             self.logger.error(f"Color detection failed: {e}")
+        temp_img = cv2.imread(temp_path)
+        if temp_img is None:
+            self.logger.warning(f"Failed to load image for color check: {temp_path}")
+        color_match = temp_img is not None and self.return_home_signature(temp_img, region)
         
         if not color_match:
             self.logger.debug("Return Home: Color Check Failed. Skipping OCR.")
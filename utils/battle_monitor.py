@@ -0,0 +1,135 @@
+import time
+
+import numpy as np
+
+from utils.object_detection import read_loot_from_frame
+from utils.settings import config, logger
+from utils.wait import wait_until
+
+
+class BattleMonitor:
+    """
+    Waits for the end of a battle with cheap probes on in-memory frames instead of a screenshot plus OCR every 5s.
+
+    Each poll checks the Return Home button's colour signature; OCR (check_return_home_visible) only runs to
+    confirm a signature match. The poll interval shrinks as the battle is expected to end:
+    - slow_interval early in the battle,
+    - fast_interval within fast_window seconds of the expected end,
+    - fast_interval as soon as the battlefield goes quiet (idle_hold seconds with little change, e.g. every unit died).
+    The battle timer and star indicators are not read: the expected end comes from the configured battle durations.
+    """
+
+    def __init__(self, actions, logger_instance=None):
+        self.actions = actions
+        self.window_controller = actions.window_controller
+        self.logger = logger_instance if logger_instance else logger
+        monitor_cfg = config.get("BattleMonitor", {})
+        self.slow_interval = monitor_cfg.get("slow_interval", 3.0)
+        self.fast_interval = monitor_cfg.get("fast_interval", 0.5)
+        self.fast_window = monitor_cfg.get("fast_window", 25)
+        self.activity_threshold = monitor_cfg.get("activity_threshold", 2.0)
+        self.idle_hold = monitor_cfg.get("idle_hold", 4.0)
+
+    def _activity(self, prev, frame):
+        """Mean absolute change of a coarse (every 8th pixel) grid between two frames."""
+        if prev is None or prev.shape != frame.shape:
+            return float('inf')
+        return float(np.abs(frame[::8, ::8].astype(np.int16) - prev[::8, ::8].astype(np.int16)).mean())
+
+    def wait_for_end(self, max_duration, expected_duration=None, region_key="return_home_region", label="battle end",
+                     early_exit=None, early_exit_interval=3.0):
+        """
+        Polls (through wait_until) until the battle result screen is confirmed or max_duration seconds pass.
+        :param expected_duration: When the battle is expected to end (defaults to max_duration).
+        :param early_exit: Optional callable(frame) checked every early_exit_interval seconds (e.g. LootTracker).
+        :return: "return_home" if Return Home was confirmed, "early_exit" if early_exit fired, None on timeout.
+        """
+        region = self.actions.coords.get(region_key, [788, 888, 945, 974])
+        expected = expected_duration if expected_duration else max_duration
+        start = time.perf_counter()
+        watch = {"prev": None, "idle_since": None, "quiet": False, "ocr_checks": 0, "next_early_check": early_exit_interval}
+
+        def battle_over():
+            now = time.perf_counter()
+            frame = self.window_controller.capture_frame()
+            if frame is None:
+                # No in-memory capture available, fall back to the screenshot + OCR check
+                watch["ocr_checks"] += 1
+                return "return_home" if self.actions.check_return_home_visible(region_key) else False
+
+            if self.actions.return_home_signature(frame, region):
+                watch["ocr_checks"] += 1
+                self.logger.debug(f"[Battle Monitor] Result screen colours at {now - start:.1f}s, confirming with OCR...")
+                if self.actions.check_return_home_visible(region_key):
+                    return "return_home"
+
+            if early_exit is not None and now - start >= watch["next_early_check"]:
+                watch["next_early_check"] = now - start + early_exit_interval
+                if early_exit(frame):
+                    self.logger.debug(f"[Battle Monitor] Early exit at {now - start:.1f}s")
+                    return "early_exit"
+
+            if self._activity(watch["prev"], frame) < self.activity_threshold:
+                watch["idle_since"] = watch["idle_since"] if watch["idle_since"] is not None else now
+                watch["quiet"] = now - watch["idle_since"] >= self.idle_hold
+            else:
+                watch["idle_since"] = None
+                watch["quiet"] = False
+            watch["prev"] = frame
+            return False
+
+        def next_interval(elapsed):
+            near_end = expected - elapsed <= self.fast_window
+            return self.fast_interval if (near_end or watch["quiet"]) else self.slow_interval
+
+        result = wait_until(battle_over, timeout=max_duration, label=label, next_interval=next_interval,
+                            min_interval=self.slow_interval)
+        self.logger.debug(f"[Battle Monitor] {result.value or 'No result screen'} after {result.elapsed:.1f}s ({result.polls} polls, {watch['ocr_checks']} OCR checks)")
+        return result.value if result else None
+
+
+class LootTracker:
+    """
+    Follows the in-battle "available loot" counters (the same regions as scouting) to work out the loot gained so far:
+    gained = initial - current. Used as a BattleMonitor early_exit once a fraction of the base's gold + elixir,
+    or an absolute amount, has been collected.
+    Reads that are implausible for OCR (a counter above its starting value) are ignored, and the target has to be
+    met on confirm_reads consecutive reads.
+    """
+
+    def __init__(self, initial_loot, logger_instance=None):
+        self.logger = logger_instance if logger_instance else logger
+        exit_cfg = config.get("LootExit", {})
+        self.initial = tuple(int(v) for v in initial_loot)
+        self.min_battle_time = exit_cfg.get("min_battle_time", 20)
+        self.confirm_reads = exit_cfg.get("confirm_reads", 2)
+        self.start = time.perf_counter()
+        self.hits = 0
+        self.gained = (0, 0, 0)
+
+        available = self.initial[0] + self.initial[1]
+        absolute = exit_cfg.get("target_absolute", 0)
+        self.target = absolute if absolute > 0 else int(available * exit_cfg.get("target_fraction", 0.8))
+
+    @staticmethod
+    def enabled():
+        return config.get("LootExit", {}).get("enabled", False)
+
+    def __call__(self, frame):
+        if self.target <= 0 or time.perf_counter() - self.start < self.min_battle_time:
+            return False
+
+        current = read_loot_from_frame(frame)
+        if (current[0] == 0 and self.initial[0] > 0) and (current[1] == 0 and self.initial[1] > 0):
+            # Both counters unreadable (or fully looted, which Return Home will report anyway)
+            return False
+        if any(c > i * 1.05 + 10 for c, i in zip(current, self.initial)):
+            self.logger.debug(f"[Loot Exit] Ignoring implausible read {current} (started at {self.initial})")
+            return False
+
+        self.gained = tuple(max(0, i - c) for i, c in zip(self.initial, current))
+        collected = self.gained[0] + self.gained[1]
+        self.logger.debug(f"[Loot Exit] Gained gold {self.gained[0]}, elixir {self.gained[1]}, dark {self.gained[2]} | {collected}/{self.target}")
+
+        self.hits = self.hits + 1 if collected >= self.target else 0
+        return self.hits >= self.confirm_reads
@@ -5,7 +5,10 @@ from datetime import datetime
 
 import toml
 
+from utils.attack_loop import AttackLoop
 from utils.base_actions import BaseActions
+from utils.check_memo import memoized_check
+from utils.frame_predicates import region_changed, region_stable, sequence
 from utils.game_window_controller import GameWindowController
 from utils.object_detection import *
 from utils.object_detection import check_for_gold_warning
@@ -17,8 +20,8 @@ from utils.vision_utils import VisionUtils
 
 
 class BuilderBaseActions(BaseActions):
-    def __init__(self, window_controller: GameWindowController, config, logger_instance=None):
-        super().__init__(window_controller, config, logger_instance if logger_instance else logger)
+    def __init__(self, window_controller: GameWindowController, config, logger_instance=None, base_name=None):
+        super().__init__(window_controller, config, logger_instance if logger_instance else logger, base_name)
 
         # positions
         static_positions = self.config["BuilderBaseStaticClickPositions"]
@@ -75,8 +78,9 @@ class BuilderBaseActions(BaseActions):
         """
         Executes clicks for the reset select positions (read once in __init__).
         """
-        self.window_controller.execute_clicks(self.reset_select_positions)
-        time.sleep(1)
+        # Returning to the plain base view does not invalidate memoized checks
+        with self.window_controller.neutral_input():
+            self.dispatcher.dispatch_positions(self.reset_select_positions, final_delay=2)
 
     def reset_camera_position(self):
         """
@@ -100,7 +104,7 @@ class BuilderBaseActions(BaseActions):
         # reset camera position
         self.reset_camera_position()
         # drag window to see home base boat
-        self.window_controller.drag_in_window(*self.switch_base_drag)
+        self.window_controller.drag_in_window(*self.switch_base_drag, profile="switch_base")
         time.sleep(1)
         self.window_controller.execute_clicks(self.switch_base_click)
         time.sleep(1)
@@ -112,10 +116,12 @@ class BuilderBaseActions(BaseActions):
         # Read positions from the file (now from memory)
         positions = self.resource_positions
         # Execute clicks for each position
-        self.window_controller.execute_clicks(positions)
+        if positions:
+            self.dispatcher.dispatch_positions(positions)
         # claim defense reward
-        self.window_controller.execute_clicks(self.claim_defense_reward_positions)
+        self.dispatcher.dispatch_positions(self.claim_defense_reward_positions, settle=0.3)
     
+    @memoized_check
     def check_max_resources(self):
         """
         Captures a screenshot and detects if home base resources are maxed using color detection.
@@ -131,11 +137,17 @@ class BuilderBaseActions(BaseActions):
 
     """ --------------------------- Attack Functions --------------------------------- """
 
-    def check_heros(self):
+    def check_heros(self, use_cache=True):
         """
         Captures a screenshot and detects the number of available heroes using detect_heroes_available.
         Prints and returns the number of available heroes.
+        The count is cached in the account state until a builder upgrade (which may be a hero) is started.
         """
+        cached = self.account_state.get("builder_heroes_available") if use_cache else None
+        if cached is not None:
+            self.logger.info(f"[Builder Base Heros Status] Available heroes: {cached} (cached)")
+            return cached
+
         # select train army button
         self.window_controller.execute_clicks(self.train_army_button_position)
         time.sleep(1)
@@ -144,6 +156,7 @@ class BuilderBaseActions(BaseActions):
         self.window_controller.capture_minimized_window_screenshot(screenshot_path)
         available_heros = detect_heroes_available(screenshot_path)
         self.logger.info(f"[Builder Base Heros Status] Available heroes: {available_heros}")
+        self.account_state.set("builder_heroes_available", available_heros)
 
         # reset select
         self.reset_select()
@@ -172,9 +185,18 @@ class BuilderBaseActions(BaseActions):
 
     def start_attack(self, army_key=None, available_heros=0):
         """
-        Starts an attack using the specified army key from self.attack_armies.
+        Runs one attack (start, deploy, wait for the end, go home) using the specified army key from self.attack_armies.
         :param army_key: String key for the army type (e.g., 'e_drag_rage_goblin').
         """
+        if army_key is None:
+            army_key = next(iter(self.attack_armies), None)
+        AttackLoop(self, "builder").attack(army_key, available_heros)
+
+    def attack_search(self, army_key, ranked_mode=False):
+        """
+        Starts a builder base battle (the opponent is matched by the game, there is nothing to search).
+        :return: None, builder battles are not scouted.
+        """
         self.check_reload_needed()
         self.reset_select()
         
@@ -186,70 +208,51 @@ class BuilderBaseActions(BaseActions):
             
         # start attack
         self.annotate_coords_on_image(self.start_attack_positions)
-        self.window_controller.execute_clicks(self.start_attack_positions)
-        # let the game load defenders base
-        time.sleep(7)
+        # let the game load defenders base (the screen leaves the menu, then the battle scene settles)
+        self.window_controller.act_and_await(
+            lambda: self.window_controller.execute_clicks(self.start_attack_positions),
+            sequence(region_changed(), region_stable()),
+            self.frame_wait.get("attack_load_timeout", 7),
+            poll=self.frame_wait.get("poll_interval", 0.25),
+            label="load builder base battle",
+        )
         
         
         # Attack base
         self.logger.info("\n[Builder Base] Attacking base...")
-        # Attack Type
-        if army_key is None:
-            army_key = self.attack_armies.keys()[0]
-        army = self.attack_armies.get(army_key)
-        if not army:
-            raise ValueError(f"Army key '{army_key}' not found in attack_armies.")
-        
-        # Place the army
-        self.army_placement(army_key, available_heros, delay=0.5)
-        
-        
-        # delay for the attack to complete
-        if not army_key == 'auto_lose':
-            # Dynamic Wait for Battle End
-            max_duration = 100
-            
-            self.logger.info(f"Waiting for battle to end (Max {max_duration}s)...")
-            start_wait = time.time()
-            check_interval = 5
-            
-            while (time.time() - start_wait) < max_duration:
-                 if self.check_return_home_visible():
-                     self.logger.info("Return Home detected! Battle ended early.")
-                     break
-                 time.sleep(check_interval)
-            self.window_controller.scroll_wheel_down(20)
-        else:
+        return None
+
+    def attack_await_end(self, army_key, enemy_loot=None):
+        """
+        Waits for the battle to end.
+        :return: "return_home", "timeout" or "auto_lose".
+        """
+        if army_key == 'auto_lose':
             time.sleep(1)
+            return 'auto_lose'
+
+        # Dynamic Wait for Battle End
+        max_duration = 100
 
+        self.logger.info(f"Waiting for battle to end (Max {max_duration}s)...")
+        expected = config.get("BattleMonitor", {}).get("expected_builder_duration", max_duration)
+        outcome = self.battle_monitor.wait_for_end(max_duration, expected, label="builder battle end")
+        if outcome:
+            self.logger.info("Return Home detected! Battle ended early.")
+        self.window_controller.scroll_wheel_down(20)
+        return outcome or 'timeout'
+
+    def attack_return_home(self):
         # Go Home
-        self.window_controller.execute_clicks(self.go_home_positions)
-        time.sleep(2)
+        self.dispatcher.dispatch_positions(self.go_home_positions, settle=0.3, final_delay=3)
 
     def main_attack_loop(self, available_heros, fill_storage=False):
-        while True:
-            # check if resources are maxed
-            if self.check_max_resources():
-                break
-            # start attack
-            self.start_attack('main_attack', available_heros)
-            # resource collection
-            self.execute_resource_collection()
-        
-        # check for upgrades and if there are still builders available, start attack loop again to get full resources
-        if self.start_builder_upgrade():
-            self.main_attack_loop(available_heros)
-
-        # get max resources again
-        if fill_storage:
-            while True:
-                # check if resources are maxed
-                if self.check_max_resources():
-                    break
-                # start attack
-                self.start_attack('main_attack', available_heros)
-                # resource collection
-                self.execute_resource_collection()
+        """
+        Attacks (collecting resources after each battle) until the storages are full, spends builders, and attacks
+        again while upgrades were started. Resumes from the last checkpoint after a restart.
+        :return: The number of builder upgrades started.
+        """
+        return AttackLoop(self, "builder", collect_after_attack=True).run(available_heros, fill_storage)
 
     def lower_trophy_count(self):
         for i in range(20):
@@ -259,6 +262,7 @@ class BuilderBaseActions(BaseActions):
 
     """ --------------------------- Upgrade Functions --------------------------------- """
 
+    @memoized_check
     def check_builder_upgrade(self):
         screenshot_path = self.manage_screenshot_storage('builder_base_builder_upgrade_character')
         self.window_controller.capture_minimized_window_screenshot(screenshot_path)
@@ -308,6 +312,9 @@ class BuilderBaseActions(BaseActions):
                 self.window_controller.execute_clicks(new_cord)
                 self.annotate_coords_on_image([new_cord], name="builder_base_builder_selection_coords")
 
+            # the suggestion may be a hero, which is unavailable while upgrading
+            self.account_state.invalidate("builder_heroes_available")
+
             # get loc for info button
             results = self.check_builder_info_button()
             self.logger.debug(f"Info button results: {results}")
@@ -338,6 +345,7 @@ class BuilderBaseActions(BaseActions):
             self.logger.info("No builder upgrade available")
             return
         
+    @memoized_check
     def check_laboratory_upgrade(self):
         screenshot_path = self.manage_screenshot_storage('builder_base_laboratory_upgrade')
         self.window_controller.capture_minimized_window_screenshot(screenshot_path)
@@ -0,0 +1,40 @@
+"""
+Memoization of check_* results within one screen state.
+A result is reused while the window controller's input epoch is unchanged (no click, drag, scroll or other input
+that could change the screen has been sent since), the config has not been reloaded, and it is younger than
+[CheckMemo] max_age seconds, which covers changes the bot did not cause (an upgrade finishing, collectors filling).
+"""
+
+import functools
+import time
+
+from utils.settings import Settings, config
+
+
+def memoized_check(method):
+    """
+    Decorates a check method of an actions object (one with window_controller and logger). Results are stored per
+    actions object, method and arguments in self.check_memo.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        memo_cfg = config.get("CheckMemo", {})
+        epoch = getattr(self.window_controller, "input_epoch", None)
+        if not memo_cfg.get("enabled", True) or epoch is None:
+            return method(self, *args, **kwargs)
+
+        memo = self.__dict__.setdefault("check_memo", {})
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        entry = memo.get(key)
+        now = time.monotonic()
+        # A config reload (see ConfigWatcher) may change the regions and thresholds a check used
+        settings = Settings.current()
+        if entry is not None and entry[0] == epoch and entry[3] is settings and now - entry[1] <= memo_cfg.get("max_age", 60):
+            self.logger.debug(f"[Check Memo] {method.__name__} unchanged since the last input: {entry[2]}")
+            return entry[2]
+
+        value = method(self, *args, **kwargs)
+        # Checks may send input themselves; the result belongs to the epoch after them
+        memo[key] = (self.window_controller.input_epoch, time.monotonic(), value, settings)
+        return value
+    return wrapper
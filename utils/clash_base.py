@@ -1,11 +1,14 @@
-import copy
 import os
 from datetime import datetime
+from pathlib import Path
 
 import toml
 from screeninfo import get_monitors
 
 import utils.settings as settings
+from utils import config_cache
+from utils.config_watcher import ConfigWatcher
+from utils.layered_config import LayeredConfig
 
 from .builder_base_actions import BuilderBaseActions
 from .home_base_actions import HomeBaseActions
@@ -17,34 +20,38 @@ class ClashBase:
     def __init__(self, config_path, window_controller, logger):
         self.logger = logger
         self.logger.debug(f"ClashBase initialized with config_path: {config_path}")
+        self.config_path = config_path
         self.config = self.load_config(config_path)
         self.window_controller = window_controller
         self.name = self.config.get("General", {}).get("name") or os.path.basename(config_path).split(".")[0]
-        self.homebase_actions = HomeBaseActions(window_controller, self.config, self.logger) 
-        self.builderbase_actions = BuilderBaseActions(window_controller, self.config, self.logger)
-    
-    def _deep_merge(self, base, override):
-        # Recursively merge two dicts: values in override take precedence.
-        if not isinstance(base, dict) or not isinstance(override, dict):
-            return override if override is not None else base
-        merged = dict(base)
-        for key, override_value in override.items():
-            base_value = base.get(key)
-            if isinstance(base_value, dict) and isinstance(override_value, dict):
-                merged[key] = self._deep_merge(base_value, override_value)
-            else:
-                # For lists and scalars, override entirely
-                merged[key] = override_value
-        return merged
+        self.config_generation = ConfigWatcher.shared().generation
+        self.homebase_actions = HomeBaseActions(window_controller, self.config, self.logger, self.name)
+        self.builderbase_actions = BuilderBaseActions(window_controller, self.config, self.logger, self.name)
 
+    def refresh_config(self):
+        """
+        Recreates the actions after a config reload so values they copied at construction (thresholds, event
+        troop counts) pick up the new config. Only call this between visits, never during an attack loop.
+        :return: True if the actions were recreated.
+        """
+        generation = ConfigWatcher.shared().generation
+        if generation == self.config_generation:
+            return False
+        self.config_generation = generation
+        self.homebase_actions = HomeBaseActions(self.window_controller, self.config, self.logger, self.name)
+        self.builderbase_actions = BuilderBaseActions(self.window_controller, self.config, self.logger, self.name)
+        self.logger.info(f"[Config Reload] {self.name} is using the reloaded config")
+        return True
+    
     def load_config(self, path):
-        # Load a default template and deep-merge with the specific base config so
-        # static click positions only need to live in one place.
+        # Layer the specific base config over the defaults so static click positions only need to live in
+        # one place. The defaults are shared by every base, not copied.
         defaults = {}
         try:
-            # Use the already loaded and scaled config from settings as the base
+            # Use the already loaded and scaled config from settings as the base. The live view, so a
+            # reload (see ConfigWatcher) reaches every base.
             if settings.config:
-                 defaults = copy.deepcopy(settings.config)
+                 defaults = settings.config
             else:
                  self.logger.warning("Settings config is empty, loading from disk (unscaled)")
                  current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -58,7 +65,21 @@ class ClashBase:
             self.logger.error(f"Error loading defaults/static: {e}")
             defaults = {}
 
-        # 3. Load Specific Base Config
+        # 3. Load Specific Base Config, scaled to the same resolution the static config was loaded with
+        w, h = settings.Settings.current().resolution
+        cache_name = f"base_{os.path.splitext(os.path.basename(path))[0]}_{w}x{h}"
+        # Both this module (compile_base_config) and settings.py (the scaling rules) decide how the file compiles
+        cache_key = config_cache.content_hash(path, Path(__file__), Path(settings.__file__), (w, h))
+        specific = config_cache.load(cache_name, cache_key, self.logger)
+        if specific is None:
+            specific = self.compile_base_config(path, w, h)
+            config_cache.store(cache_name, cache_key, specific, self.logger)
+
+        if defaults:
+            return LayeredConfig(specific, defaults)
+        return specific
+        
+    def compile_base_config(self, path, w, h):
         with open(path, 'r') as f:
             specific = toml.load(f)
 
@@ -83,20 +104,17 @@ class ClashBase:
                      break
         
         if uses_percentages:
-             w, h = settings.get_target_resolution(self.logger)
              self.logger.debug(f"Detected percentage-based specific config. Scaling to {w}x{h}...")
              settings.scale_config(specific, w, h)
 
-        if defaults:
-            return self._deep_merge(defaults, specific)
         return specific
-        
+
     def current_location(self):
         self.logger.info("Determining current base location...")
         # timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         save_dir = os.path.join('data', 'screenshots', 'base_location_check')
         os.makedirs(save_dir, exist_ok=True)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
 
         screenshot_path = os.path.join(save_dir, f'base_location_{timestamp}.png')
         self.window_controller.capture_minimized_window_screenshot(screenshot_path)
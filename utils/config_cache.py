@@ -0,0 +1,66 @@
+"""
+Compiled config cache.
+Parsing the TOML files and scaling every coordinate section is repeated on each start although the result only
+depends on the file contents and the window resolution. The merged, scaled result is pickled to
+data/cache/config/{name}.pickle together with a hash of its inputs and reused while the hash still matches.
+"""
+
+import hashlib
+import os
+import pickle
+
+CACHE_DIR = os.path.join('data', 'cache', 'config')
+# Bump when the pickled layout changes
+CACHE_VERSION = 2
+
+
+def content_hash(*sources):
+    """
+    Hash of the given inputs: file paths are hashed by content (a missing file counts as empty), anything else
+    by its repr, so resolutions and flags can be part of the key.
+    """
+    digest = hashlib.sha1(str(CACHE_VERSION).encode())
+    for source in sources:
+        if isinstance(source, os.PathLike) or (isinstance(source, str) and os.path.isfile(source)):
+            try:
+                with open(source, 'rb') as f:
+                    digest.update(f.read())
+            except OSError:
+                pass
+        else:
+            digest.update(repr(source).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def cache_path(name):
+    return os.path.join(CACHE_DIR, f"{name}.pickle")
+
+
+def load(name, key, logger):
+    """Returns the value stored under name if it was compiled from inputs with the same hash, else None."""
+    path = cache_path(name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            entry = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"[Config Cache] Could not read {path}, recompiling: {e}")
+        return None
+    if not isinstance(entry, dict) or entry.get("key") != key:
+        logger.debug(f"[Config Cache] {name} is out of date")
+        return None
+    return entry["value"]
+
+
+def store(name, key, value, logger):
+    path = cache_path(name)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({"key": key, "value": value}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except (OSError, pickle.PicklingError) as e:
+        logger.warning(f"[Config Cache] Failed to write {path}: {e}")
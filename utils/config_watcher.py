@@ -0,0 +1,103 @@
+"""
+Hot reload of static_config.toml and config.toml.
+The bot polls between actions (attack loop transitions, account visits); when either file changed, it is reloaded,
+scaled to the current client size and swapped in as the config every module reads through utils.settings.config.
+Caches compiled from the old values are dropped. Values actions copied at construction are refreshed at the start
+of the account's next visit (ClashBase.refresh_config).
+"""
+
+import os
+import threading
+import time
+
+import toml
+
+from utils import coords, settings
+from utils.army_plan import ArmyPlanCache
+from utils.army_tile_cache import ArmyTileCache
+from utils.settings import config, logger
+
+WATCHED_PATHS = (settings.static_config_path, settings.config_path)
+# A change in these sections invalidates the army tile layouts found with the old values
+TILE_SECTIONS = ("TileDetection", "ObjectDetectionColors")
+
+
+class ConfigWatcher:
+    """
+    Polls the config files' modification times at most every [ConfigReload] poll_interval seconds.
+    generation counts the reloads so holders of config-derived state can tell theirs is out of date.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, logger_instance=None, paths=WATCHED_PATHS):
+        self.logger = logger_instance if logger_instance else logger
+        reload_cfg = config.get("ConfigReload", {})
+        self.enabled = reload_cfg.get("enabled", True)
+        self.interval = reload_cfg.get("poll_interval", 5)
+        self.paths = [str(path) for path in paths]
+        self.stamps = self._stamps()
+        self.last_poll = time.monotonic()
+        self.generation = 0
+        # Game instance workers poll the same watcher
+        self.lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        watcher = cls._shared
+        if watcher is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+                watcher = cls._shared
+        return watcher
+
+    def _stamps(self):
+        stamps = {}
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                stamps[path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                stamps[path] = None
+        return stamps
+
+    def poll(self):
+        """
+        Reloads the config if a watched file changed since the last poll.
+        :return: True if a new config was swapped in.
+        """
+        if not self.enabled or time.monotonic() - self.last_poll < self.interval:
+            return False
+        with self.lock:
+            if time.monotonic() - self.last_poll < self.interval:
+                return False
+            self.last_poll = time.monotonic()
+            stamps = self._stamps()
+            if stamps == self.stamps:
+                return False
+            changed = [os.path.basename(path) for path in self.paths if stamps[path] != self.stamps[path]]
+            # Remembered even if the reload fails, so a broken file is reported once rather than on every poll
+            self.stamps = stamps
+            return self.reload(changed)
+
+    def reload(self, changed=()):
+        # Validate before swapping: a file saved half-way must not replace a working config with an empty one
+        for path in self.paths:
+            if os.path.exists(path):
+                try:
+                    toml.load(path)
+                except (OSError, toml.TomlDecodeError) as e:
+                    self.logger.error(f"[Config Reload] {os.path.basename(path)} could not be read, keeping the current config: {e}")
+                    return False
+
+        previous = settings.Settings.current()
+        current = settings.Settings.load(resolution=coords.current_transform().size, check=False)
+        self.generation += 1
+
+        ArmyPlanCache.shared().clear()
+        if any(previous.get(section) != current.get(section) for section in TILE_SECTIONS):
+            ArmyTileCache.shared().clear()
+            self.logger.info("[Config Reload] Tile detection settings changed, cached army tile layouts dropped")
+        self.logger.info(f"[Config Reload] Reloaded {', '.join(changed) if changed else 'config'} (generation {self.generation})")
+        return True
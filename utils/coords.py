@@ -0,0 +1,131 @@
+"""
+Resolution-aware coordinates.
+static_config.toml stores positions and regions as fractions of the game window's client area. Coord keeps those
+normalized values and holds their pixel values for the current client size; when the window is resized (see
+GameWindowController.check_resize) every live Coord and ScaledSection is re-resolved in place, so positions
+already handed out to actions and detectors stay correct without a restart.
+All game instances share one client size (multi_instance.py requires equal window sizes).
+"""
+
+import functools
+import threading
+import weakref
+
+import numpy as np
+
+DEFAULT_SIZE = (1728, 1080)
+
+
+class ScreenTransform:
+    """Normalized -> pixel mapping for one client size. Get instances through transform_for()."""
+
+    def __init__(self, width, height):
+        self.size = (width, height)
+        self.scale = np.array([width, height], dtype=np.float64)
+
+    def resolve(self, normalized):
+        """Pixels of normalized [x, y, ...] values as an int array (x values scale with width, y with height)."""
+        return np.rint(normalized * np.resize(self.scale, len(normalized))).astype(np.int64)
+
+    def length(self, value, axis):
+        """Pixels of a single normalized length along axis 0 (x) or 1 (y)."""
+        return int(round(value * self.size[axis]))
+
+    def __repr__(self):
+        return f"ScreenTransform({self.size[0]}x{self.size[1]})"
+
+
+@functools.lru_cache(maxsize=8)
+def transform_for(width, height):
+    return ScreenTransform(width, height)
+
+
+_current = transform_for(*DEFAULT_SIZE)
+# id -> object; Coord is a list and ScaledSection a dict, neither is hashable for a WeakSet
+_live = weakref.WeakValueDictionary()
+_lock = threading.Lock()
+
+
+def current_transform():
+    return _current
+
+
+def set_client_size(width, height):
+    """
+    Makes (width, height) the size coordinates resolve to and re-resolves every live coordinate.
+    :return: True if the size changed.
+    """
+    global _current
+    transform = transform_for(width, height)
+    with _lock:
+        if transform is _current:
+            return False
+        _current = transform
+        live = list(_live.values())
+    for item in live:
+        item.resolve_in_place(transform)
+    return True
+
+
+def _track(item):
+    with _lock:
+        _live[id(item)] = item
+
+
+class Coord(list):
+    """
+    A position [x, y] (or any list of x, y pairs) that reads as pixels of the current client size. It is a plain
+    list to every consumer; `array` holds the same pixels as a numpy array for vectorised use.
+    """
+
+    def __init__(self, normalized, transform=None):
+        super().__init__()
+        self.normalized = np.asarray(normalized, dtype=np.float64)
+        self.transform = None
+        self.array = None
+        self.resolve_in_place(transform if transform else _current)
+        _track(self)
+
+    def resolve_in_place(self, transform):
+        if transform is self.transform:
+            return
+        array = transform.resolve(self.normalized)
+        self[:] = array.tolist()
+        self.array = array
+        self.transform = transform
+
+    def __reduce__(self):
+        # Pickled (config cache) and copied as normalized values, re-resolved for the size at load time
+        return (self.__class__, (self.normalized.tolist(),))
+
+
+class Region(Coord):
+    """A rectangle [x1, y1, x2, y2]."""
+
+
+class ScaledSection(dict):
+    """
+    A config section whose scalar lengths (step sizes such as builder_upgrade_step_y) follow the client size.
+    :param lengths: {key: (normalized value, axis)} for the keys to keep resolved.
+    """
+
+    def __init__(self, items, lengths, transform=None):
+        super().__init__(items)
+        self.lengths = dict(lengths)
+        self.transform = None
+        self.resolve_in_place(transform if transform else _current)
+        _track(self)
+
+    def resolve_in_place(self, transform):
+        if transform is self.transform:
+            return
+        for key, (value, axis) in self.lengths.items():
+            self[key] = transform.length(value, axis)
+        self.transform = transform
+
+    def with_items(self, items):
+        """A section with other items but the same live lengths."""
+        return ScaledSection(items, self.lengths, self.transform)
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self), self.lengths))
@@ -0,0 +1,193 @@
+import time
+
+import cv2
+import numpy as np
+
+from utils.army_plan import KIND_ACTIVATE, KIND_DROP, KIND_SELECT, KIND_WAIT, PHASE_NAMES
+from utils.settings import config, logger
+
+# Phases whose tiles are checked after their bursts. Re-tapping a hero tile would trigger its ability early.
+VERIFIED_PHASES = ("troops", "cc", "spells")
+
+
+class DeploymentEngine:
+    """
+    Streams ArmyPlan rows to the window.
+    In "standard" mode rows are streamed with their compiled delays. In "burst" mode each tile is selected, then
+    its drops are sent as a burst at the phase's rate (taps per second). After a tile's burst the counter area of the
+    tile is compared with the frame from before the burst; a tile that did not change lost its taps, so its burst is
+    repeated once at the compiled (standard) pace.
+    In both modes a run of hold_min_taps or more consecutive drops on the same point becomes a single press-and-hold
+    of hold_unit_time per unit (burst mode releases early once the tile empties).
+    """
+
+    def __init__(self, window_controller, logger_instance=None):
+        self.window_controller = window_controller
+        self.logger = logger_instance if logger_instance else logger
+        deploy_cfg = config.get("Deployment", {})
+        self.mode = deploy_cfg.get("mode", "standard")
+        self.rates = {
+            "troops": deploy_cfg.get("troop_rate", 20),
+            "cc": deploy_cfg.get("troop_rate", 20),
+            "heroes": deploy_cfg.get("hero_rate", 4),
+            "spells": deploy_cfg.get("spell_rate", 10),
+        }
+        self.select_settle = deploy_cfg.get("select_settle", 0.1)
+        self.verify = deploy_cfg.get("verify", True)
+        self.verify_settle = deploy_cfg.get("verify_settle", 0.15)
+        self.counter_change_threshold = deploy_cfg.get("counter_change_threshold", 6.0)
+        self.empty_saturation = deploy_cfg.get("empty_saturation", 40)
+        self.hold = deploy_cfg.get("hold", False)
+        self.hold_min_taps = deploy_cfg.get("hold_min_taps", 3)
+        self.hold_unit_time = deploy_cfg.get("hold_unit_time", 0.08)
+
+    def deploy(self, plan, first, last=None, tile_h=None):
+        """
+        Deploys the plan phases from `first` through `last`.
+        :param tile_h: Army bar tile height, used to locate the tile counters for verification.
+        """
+        if self.mode != "burst":
+            self._stream(plan.phase_rows(first, last))
+            return
+
+        # Deployment order is PHASE_NAMES, whatever order the plan's phases were recorded in
+        names = [name for name in PHASE_NAMES if name in plan.phases]
+        stop_name = last if last else first
+        for name in names[names.index(first):names.index(stop_name) + 1]:
+            rows = plan.phase_rows(name)
+            if len(rows):
+                self._deploy_phase(name, rows, plan.tile_w, tile_h)
+
+    @staticmethod
+    def _runs(rows):
+        """Splits rows into runs of consecutive drops on the same point; every other row is a run of its own."""
+        run = []
+        for row in rows:
+            if run and int(row[3]) == KIND_DROP and int(run[-1][3]) == KIND_DROP and row[0] == run[-1][0] and row[1] == run[-1][1]:
+                run.append(row)
+                continue
+            if run:
+                yield run
+            run = [row]
+        if run:
+            yield run
+
+    def _holdable(self, run):
+        return self.hold and len(run) >= self.hold_min_taps and int(run[0][3]) == KIND_DROP
+
+    def _stream(self, rows):
+        """Streams rows with their compiled delays, holding instead of tapping for same-point runs."""
+        for run in self._runs(rows):
+            if self._holdable(run):
+                self.window_controller.hold_at(run[0][0], run[0][1], len(run) * self.hold_unit_time)
+                time.sleep(run[-1][2])
+            else:
+                self.window_controller.stream_clicks(run)
+
+    def _groups(self, rows):
+        """Splits rows into (select_row, [drop rows]) groups; rows outside a group come back as (row, None)."""
+        group = None
+        for row in rows:
+            kind = int(row[3])
+            if kind == KIND_SELECT:
+                if group:
+                    yield group
+                group = (row, [])
+            elif kind == KIND_DROP and group:
+                group[1].append(row)
+            else:
+                if group:
+                    yield group
+                    group = None
+                yield (row, None)
+        if group:
+            yield group
+
+    def _deploy_phase(self, name, rows, tile_w, tile_h):
+        interval = 1.0 / max(1.0, float(self.rates.get(name, 10)))
+        verify = self.verify and tile_h and name in VERIFIED_PHASES
+        start = time.perf_counter()
+        retried = 0
+
+        for head, drops in self._groups(rows):
+            x, y, delay, kind = head[0], head[1], head[2], int(head[3])
+            if drops is None:
+                if kind == KIND_WAIT:
+                    time.sleep(delay)
+                else:
+                    self.window_controller.click_in_window(int(x), int(y))
+                    time.sleep(interval if kind == KIND_ACTIVATE else delay)
+                continue
+
+            self.window_controller.click_in_window(int(x), int(y))
+            time.sleep(self.select_settle)
+            # Baseline after selecting, so the selection highlight itself does not count as a change
+            region = self._counter_region(x, y, tile_w, tile_h) if verify and drops else None
+            before = self.window_controller.capture_frame() if region else None
+
+            for run in self._runs(drops):
+                if self._holdable(run):
+                    self._hold_run(run, region)
+                else:
+                    self.window_controller.burst_clicks([(row[0], row[1]) for row in run], interval)
+
+            if before is not None and not self._tile_spent(before, region):
+                # Taps were lost (select not registered, or the rate is too high for the game); repeat at compiled pace
+                retried += 1
+                self.logger.debug(f"[Deployment] Tile at ({int(x)}, {int(y)}) unchanged after burst, repeating at standard pace")
+                self._stream([head] + drops)
+
+        self.logger.debug(f"[Deployment] Phase '{name}': {len(rows)} rows in {time.perf_counter() - start:.2f}s ({retried} tiles repeated)")
+
+    def _hold_run(self, run, region):
+        x, y = run[0][0], run[0][1]
+        duration = len(run) * self.hold_unit_time
+        if region is None:
+            self.window_controller.hold_at(x, y, duration)
+            return
+        # Release as soon as the tile greys out instead of holding for the full estimate
+        self.window_controller.hold_until(x, y, self._tile_empty(region), duration)
+
+    def _tile_empty(self, region):
+        def predicate(frame, baseline):
+            roi = self._crop(frame, region)
+            return roi is not None and self._saturation(roi) < self.empty_saturation
+        return predicate
+
+    @staticmethod
+    def _crop(frame, region):
+        x1, y1, x2, y2 = region
+        h, w = frame.shape[:2]
+        x1, y1, x2, y2 = max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return frame[y1:y2, x1:x2]
+
+    @staticmethod
+    def _saturation(roi):
+        return float(cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)[:, :, 1].mean())
+
+    @staticmethod
+    def _counter_region(x, y, tile_w, tile_h):
+        """Top third of the tile, where the unit counter is drawn."""
+        half_w = int(tile_w) // 2
+        half_h = int(tile_h) // 2
+        return int(x) - half_w, int(y) - half_h, int(x) + half_w, int(y) - half_h + max(4, int(tile_h) // 3)
+
+    def _tile_spent(self, before, region):
+        """True if the tile's counter changed, or the tile greyed out, since `before`."""
+        time.sleep(self.verify_settle)
+        after = self.window_controller.capture_frame()
+        if after is None:
+            return True
+
+        roi_after = self._crop(after, region)
+        roi_before = self._crop(before, region)
+        if roi_after is None or roi_before is None or roi_after.shape != roi_before.shape:
+            return True
+
+        diff = float(np.abs(roi_after.astype(np.int16) - roi_before.astype(np.int16)).mean())
+        if diff >= self.counter_change_threshold:
+            return True
+        # An emptied tile is drawn in greyscale
+        return self._saturation(roi_after) < self.empty_saturation
@@ -0,0 +1,114 @@
+"""
+Predicates for GameWindowController.act_and_await.
+Each predicate is called as predicate(frame, baseline) where frame is the latest BGR capture and baseline
+the capture taken just before the action. Stateful predicates (region_stable, sequence) must be created
+fresh for every wait.
+"""
+
+import time
+
+import numpy as np
+
+from utils.object_detection import classify_base_location
+from utils.settings import config
+from utils.vision_utils import VisionUtils
+from utils.wait import all_of
+
+
+def _wait_config():
+    return config.get("FrameWait", {})
+
+
+def _crop(frame, region):
+    if region is None:
+        return frame
+    x1, y1, x2, y2 = region
+    h, w = frame.shape[:2]
+    return frame[max(0, y1):min(h, y2), max(0, x1):min(w, x2)]
+
+
+def _mean_diff(a, b):
+    # Every other pixel is plenty to tell a transition from compression noise
+    a = a[::2, ::2].astype(np.int16)
+    b = b[::2, ::2].astype(np.int16)
+    if a.shape != b.shape or a.size == 0:
+        return float('inf')
+    return float(np.abs(a - b).mean())
+
+
+def region_changed(region=None, threshold=None):
+    """True once region (x1, y1, x2, y2; None = whole frame) differs from the pre-action baseline."""
+    if threshold is None:
+        threshold = _wait_config().get("change_threshold", 8.0)
+
+    def predicate(frame, baseline):
+        if baseline is None:
+            return True
+        return _mean_diff(_crop(frame, region), _crop(baseline, region)) >= threshold
+    return predicate
+
+
+def region_stable(region=None, hold=None, threshold=None):
+    """True once region has stopped changing between polls for `hold` seconds (animations and loading finished)."""
+    cfg = _wait_config()
+    if hold is None:
+        hold = cfg.get("stable_hold", 1.0)
+    if threshold is None:
+        threshold = cfg.get("stable_threshold", 3.0)
+    state = {'prev': None, 'since': None}
+
+    def predicate(frame, baseline):
+        crop = _crop(frame, region)
+        now = time.perf_counter()
+        if state['prev'] is None or _mean_diff(crop, state['prev']) >= threshold:
+            state['since'] = now
+        state['prev'] = crop.copy()
+        return now - state['since'] >= hold
+    return predicate
+
+
+def pixel_matches(pos, targets_bgr, tolerance=20):
+    """True when the pixel at pos is within tolerance of any of the BGR targets."""
+    x, y = pos
+    if targets_bgr and isinstance(targets_bgr[0], (int, float)):
+        targets_bgr = [targets_bgr]
+
+    def predicate(frame, baseline):
+        h, w = frame.shape[:2]
+        if y >= h or x >= w:
+            return False
+        pixel = tuple(int(c) for c in frame[y, x])
+        return any(VisionUtils.is_color_close(pixel, target, tolerance) for target in targets_bgr)
+    return predicate
+
+
+def screen_is(*locations):
+    """True when the frame is classified as one of the locations ('Home', 'Builder') by the base determination pixel."""
+    def predicate(frame, baseline):
+        is_builder_base, is_home_base = classify_base_location(frame)
+        return ('Builder' in locations and is_builder_base) or ('Home' in locations and is_home_base)
+    return predicate
+
+
+def not_(condition):
+    def predicate(frame, baseline):
+        return not condition(frame, baseline)
+    return predicate
+
+
+def sequence(*conditions):
+    """True once the conditions have held one after another (e.g. the screen changed, then the home base appeared)."""
+    state = {'index': 0}
+
+    def predicate(frame, baseline):
+        while state['index'] < len(conditions) and conditions[state['index']](frame, baseline):
+            state['index'] += 1
+        return state['index'] >= len(conditions)
+    return predicate
+
+
+def base_loaded(*locations, hold=None):
+    """The screen left its pre-action state, then settled on one of the base locations."""
+    if not locations:
+        locations = ('Home', 'Builder')
+    return sequence(region_changed(), all_of(screen_is(*locations), region_stable(hold=hold)))
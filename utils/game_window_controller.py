@@ -1,3 +1,4 @@
+import contextlib
 import ctypes
 import os
 import sys
@@ -6,23 +7,40 @@ from ctypes import wintypes
 from datetime import datetime
 
 import cv2
+import numpy as np
 import win32con
 import win32gui
 import win32ui
 from PIL import Image, ImageGrab
 
+from utils import coords
+from utils.input_journal import InputJournal
 from utils.object_detection import gold_pass_trigger
-from utils.settings import logger
+from utils.settings import config, logger
+from utils.wait import wait_until
 
 # Setup Logging
 # logger = Logger(level="DEBUG").get_logger()
 
+# Drag settings used when a [DragProfiles] entry leaves a key out
+DEFAULT_DRAG_PROFILE = {"duration": 0.5, "easing": "linear", "rate": 120, "flick": False, "end_hold": 0.05}
+
+# Easing curves mapping drag progress (0..1) to path progress (0..1)
+EASINGS = {
+    "linear": lambda t: t,
+    "ease_in_out": lambda t: t * t * (3 - 2 * t),
+    "ease_out": lambda t: 1 - (1 - t) ** 3,
+}
+
 
 class GameWindowController:
-    def __init__(self, window_title, logger_instance=None):
+    def __init__(self, window_title, logger_instance=None, hwnd=None):
+        """
+        :param hwnd: Drive this top-level window instead of the first one whose title matches (see find_windows).
+        """
         self.logger = logger_instance if logger_instance else logger
         self.window_title = window_title
-        self.hwnd = self.find_window(window_title)
+        self.hwnd = hwnd if hwnd else self.find_window(window_title)
         self.child_hwnd = self.find_input_child(self.hwnd)
         
         if self.child_hwnd:
@@ -30,6 +48,13 @@ class GameWindowController:
         else:
             self.logger.warning("GameWindowController: WARNING - Input Child Window (CROSVM) not found. Background inputs may fail.")
             self.child_hwnd = self.hwnd # Fallback
+        # Optional record of every posted input message ([InputJournal])
+        self.journal = InputJournal.shared()
+        # Bumped by every input that may change the screen; memoized checks are only valid within one epoch
+        self.input_epoch = 0
+        self._neutral_depth = 0
+        # Client size seen by the last capture (see check_resize)
+        self.last_client_size = None
 
     def find_input_child(self, parent_hwnd):
         """
@@ -65,6 +90,41 @@ class GameWindowController:
             raise Exception(f"Window with title containing '{window_title}' not found.")
         return result[0]
 
+    @staticmethod
+    def find_windows(window_title):
+        """
+        Returns the handles of every visible window whose title contains window_title (case-insensitive),
+        one per running game instance.
+        """
+        def enum_windows_callback(hwnd, result):
+            if win32gui.IsWindowVisible(hwnd):
+                title = win32gui.GetWindowText(hwnd)
+                if window_title.lower() in title.lower():
+                    result.append(hwnd)
+        result = []
+        win32gui.EnumWindows(enum_windows_callback, result)
+        return result
+
+    def client_size(self):
+        """(width, height) of the input window's client area, the space click coordinates live in."""
+        left, top, right, bottom = win32gui.GetClientRect(self.child_hwnd if self.child_hwnd else self.hwnd)
+        return right - left, bottom - top
+
+    def check_resize(self):
+        """
+        Re-resolves every config coordinate when the client area changed size since the last capture.
+        :return: True if coordinates were re-resolved.
+        """
+        size = self.client_size()
+        if size == self.last_client_size:
+            return False
+        self.last_client_size = size
+        # Ignore the transient sizes of a minimized or half-created window
+        if size[0] <= 100 or size[1] <= 100 or not coords.set_client_size(*size):
+            return False
+        self.logger.warning(f"[Resize] Client area is now {size[0]}x{size[1]}, coordinates re-resolved")
+        return True
+
     def is_window_open(self, window_title):
         """
         Checks if a window with the given title is currently open.
@@ -88,15 +148,39 @@ class GameWindowController:
         :param poll_interval: Time between checks in seconds.
         :return: Window handle (hwnd) if found, else raises Exception.
         """
-        start_time = time.time()
-        while time.time() - start_time < timeout:
+        def find():
             try:
-                hwnd = self.find_window(window_title)
-                return hwnd
+                return self.find_window(window_title)
             except Exception:
-                time.sleep(poll_interval)
+                return None
+
+        result = wait_until(find, timeout=timeout, min_interval=poll_interval, label="window")
+        if result:
+            return result.value
         raise Exception(f"Window with title containing '{window_title}' not found after {timeout} seconds.")
 
+    def _post(self, hwnd, msg, wparam, lparam, journal_flags=0):
+        """
+        Posts a window message. Every input sent to the game goes through here so it can be journaled.
+        """
+        if self.journal is not None:
+            self.journal.record(hwnd, msg, wparam, lparam, flags=journal_flags)
+        if not self._neutral_depth:
+            self.input_epoch += 1
+        win32gui.PostMessage(hwnd, msg, wparam, lparam)
+
+    @contextlib.contextmanager
+    def neutral_input(self):
+        """
+        Inputs sent inside this block do not start a new input epoch (e.g. reset_select, which only returns
+        to the plain base view that checks are taken from).
+        """
+        self._neutral_depth += 1
+        try:
+            yield
+        finally:
+            self._neutral_depth -= 1
+
     def click_in_window(self, x, y):
         """
         Sends a mouse click event to a specific window at the given coordinates (x, y).
@@ -107,9 +191,9 @@ class GameWindowController:
         target_hwnd = self.child_hwnd if self.child_hwnd else self.hwnd
 
         # Send mouse down event
-        win32gui.PostMessage(target_hwnd, win32con.WM_LBUTTONDOWN, win32con.MK_LBUTTON, lparam)
+        self._post(target_hwnd, win32con.WM_LBUTTONDOWN, win32con.MK_LBUTTON, lparam)
         # Send mouse up event
-        win32gui.PostMessage(target_hwnd, win32con.WM_LBUTTONUP, 0, lparam)
+        self._post(target_hwnd, win32con.WM_LBUTTONUP, 0, lparam)
         # print(f"Clicked {target_hwnd} at position ({x}, {y})")
 
     def move_mouse_in_window(self, x, y):
@@ -118,7 +202,7 @@ class GameWindowController:
         """
         lparam = (y << 16) | x
         target_hwnd = self.child_hwnd if self.child_hwnd else self.hwnd
-        win32gui.PostMessage(target_hwnd, win32con.WM_MOUSEMOVE, 0, lparam)
+        self._post(target_hwnd, win32con.WM_MOUSEMOVE, 0, lparam)
         # print(f"Moved mouse in {target_hwnd} to ({x}, {y})")
 
     def read_positions(self, file_path):
@@ -186,13 +270,76 @@ class GameWindowController:
                 # check_gold_pass()
 
 
+    def stream_clicks(self, rows):
+        """
+        Streams pre-compiled click rows of (x, y, delay, ...) to the window.
+        Rows with a negative x are pure waits.
+        :param rows: Iterable of rows, e.g. a slice of an ArmyPlan.rows array.
+        """
+        for row in rows:
+            x, y, delay = row[0], row[1], row[2]
+            if x >= 0:
+                self.click_in_window(int(x), int(y))
+            if delay > 0:
+                time.sleep(delay)
+
+    def hold_at(self, x, y, duration):
+        """
+        Presses the left button at (x, y), keeps it down for duration seconds, then releases.
+        The game keeps deploying the selected unit while the point is held.
+        """
+        lparam = (int(y) << 16) | int(x)
+        target_hwnd = self.child_hwnd if self.child_hwnd else self.hwnd
+        self._post(target_hwnd, win32con.WM_LBUTTONDOWN, win32con.MK_LBUTTON, lparam)
+        try:
+            time.sleep(duration)
+        finally:
+            self._post(target_hwnd, win32con.WM_LBUTTONUP, 0, lparam)
+
+    def hold_until(self, x, y, predicate, timeout, poll=0.05):
+        """
+        Holds the left button at (x, y) until predicate(frame, baseline) is True or timeout elapses.
+        Predicates follow the utils.frame_predicates convention. Returns True if the predicate was met.
+        """
+        lparam = (int(y) << 16) | int(x)
+        target_hwnd = self.child_hwnd if self.child_hwnd else self.hwnd
+        baseline = self.capture_frame()
+        start = time.perf_counter()
+        met = False
+        self._post(target_hwnd, win32con.WM_LBUTTONDOWN, win32con.MK_LBUTTON, lparam)
+        try:
+            while True:
+                elapsed = time.perf_counter() - start
+                if elapsed >= timeout:
+                    break
+                time.sleep(min(poll, timeout - elapsed))
+                frame = self.capture_frame()
+                if frame is not None and predicate(frame, baseline):
+                    met = True
+                    break
+        finally:
+            self._post(target_hwnd, win32con.WM_LBUTTONUP, 0, lparam)
+        return met
+
+    def burst_clicks(self, points, interval):
+        """
+        Clicks points on a fixed schedule of one tap every `interval` seconds.
+        Sleeps target absolute times so per-tap overhead does not accumulate into drift.
+        """
+        start = time.perf_counter()
+        for i, (x, y) in enumerate(points):
+            wait = start + i * interval - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            self.click_in_window(int(x), int(y))
+
     def scroll_wheel_up(self, times=10):
         """
         Scrolls the mouse wheel up in the window a specified number of times.
         """
         target_hwnd = self.child_hwnd if self.child_hwnd else self.hwnd
         for _ in range(times):
-            win32gui.PostMessage(target_hwnd, win32con.WM_MOUSEWHEEL, 0x00780000, 0)
+            self._post(target_hwnd, win32con.WM_MOUSEWHEEL, 0x00780000, 0)
             time.sleep(0.05)
 
     def scroll_wheel_down(self, times=10):
@@ -201,7 +348,7 @@ class GameWindowController:
         """
         target_hwnd = self.child_hwnd if self.child_hwnd else self.hwnd
         for _ in range(times):
-            win32gui.PostMessage(target_hwnd, win32con.WM_MOUSEWHEEL, 0xff880000, 0)
+            self._post(target_hwnd, win32con.WM_MOUSEWHEEL, 0xff880000, 0)
             time.sleep(0.05)
 
     def capture_window_screenshot(self):
@@ -255,6 +402,57 @@ class GameWindowController:
 
         return img
 
+    def capture_frame(self):
+        """
+        Captures the window into a BGR numpy array without touching disk (PrintWindow flag 2).
+        Much cheaper than capture_minimized_window_screenshot for polling. Returns None if the capture fails.
+        """
+        self.check_resize()
+        target_hwnd = self.child_hwnd if self.child_hwnd else self.hwnd
+
+        left, top, right, bottom = win32gui.GetWindowRect(target_hwnd)
+        width = right - left
+        height = bottom - top
+        if width <= 0 or height <= 0:
+            return None
+
+        hwnd_dc = win32gui.GetWindowDC(target_hwnd)
+        mfc_dc = win32ui.CreateDCFromHandle(hwnd_dc)
+        save_dc = mfc_dc.CreateCompatibleDC()
+        bitmap = win32ui.CreateBitmap()
+        bitmap.CreateCompatibleBitmap(mfc_dc, width, height)
+        save_dc.SelectObject(bitmap)
+
+        frame = None
+        user32 = ctypes.windll.user32
+        if user32.PrintWindow(target_hwnd, save_dc.GetSafeHdc(), 2):
+            bmpstr = bitmap.GetBitmapBits(True)
+            # BGRX rows -> contiguous BGR array (OpenCV layout)
+            frame = np.ascontiguousarray(np.frombuffer(bmpstr, dtype=np.uint8).reshape(height, width, 4)[:, :, :3])
+        else:
+            self.logger.debug("capture_frame: PrintWindow failed.")
+
+        save_dc.DeleteDC()
+        mfc_dc.DeleteDC()
+        win32gui.ReleaseDC(target_hwnd, hwnd_dc)
+        win32gui.DeleteObject(bitmap.GetHandle())
+        return frame
+
+    def act_and_await(self, action, condition, timeout, poll=0.25, label="action"):
+        """
+        Runs action() and polls in-memory frames until condition(frame, baseline) is True or timeout elapses.
+        The baseline is captured before the action, so "changed" predicates compare against the pre-action screen.
+        Conditions come from utils.frame_predicates. Returns True if the condition was met.
+        """
+        baseline = self.capture_frame()
+        action()
+
+        result = wait_until(lambda frame: condition(frame, baseline), source=self.capture_frame,
+                            timeout=timeout, min_interval=poll, initial_delay=poll, label=label)
+        if not result:
+            self.logger.warning(f"[Await] {label}: condition not met within {timeout}s")
+        return result.met
+
     def capture_minimized_window_screenshot(self, output_file=None, read_back=True):
         """
         Captures a screenshot of the window even if it is minimized, using PrintWindow with flag 2.
@@ -280,6 +478,7 @@ class GameWindowController:
         if output_dir:
             os.makedirs(output_dir, exist_ok=True)
             
+        self.check_resize()
         target_hwnd = self.child_hwnd if self.child_hwnd else self.hwnd
         
         left, top, right, bottom = win32gui.GetWindowRect(target_hwnd)
@@ -329,33 +528,50 @@ class GameWindowController:
             self.logger.error(f"Could not convert screenshot to PNG: {e}")
             return None
 
-    def drag_in_window(self, x1, y1, x2, y2, delay=0.5, steps=200):
+    def drag_in_window(self, x1, y1, x2, y2, profile="default", duration=None, easing=None, rate=None, flick=None):
         """
-        Simulates a mouse click-and-drag from (x1, y1) to (x2, y2) in the window using multiple midpoints.
+        Simulates a mouse click-and-drag from (x1, y1) to (x2, y2) in the window.
+        The drag takes `duration` seconds along an easing curve, with one WM_MOUSEMOVE per 1/rate seconds.
+        Unset arguments come from the [DragProfiles] entry named by `profile` (falling back to "default").
+        A flick releases immediately at the end so the game keeps the scroll momentum; otherwise the
+        pointer rests for end_hold seconds before release so the list stops where the drag ended.
         Targets the Child Input Window (CROSVM) if available.
         """
+        profiles = config.get("DragProfiles", {})
+        drag = dict(DEFAULT_DRAG_PROFILE)
+        drag.update(profiles.get("default", {}))
+        drag.update(profiles.get(profile, {}))
+        duration = drag["duration"] if duration is None else duration
+        easing_fn = EASINGS.get(easing or drag["easing"], EASINGS["linear"])
+        rate = drag["rate"] if rate is None else rate
+        flick = drag["flick"] if flick is None else flick
+        end_hold = 0 if flick else drag["end_hold"]
+
+        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+        steps = max(2, int(duration * rate))
         lparam_start = (y1 << 16) | x1
         lparam_end = (y2 << 16) | x2
         target_hwnd = self.child_hwnd if self.child_hwnd else self.hwnd
 
         # Mouse down at start
-        win32gui.PostMessage(target_hwnd, win32con.WM_LBUTTONDOWN, win32con.MK_LBUTTON, lparam_start)
-        time.sleep(delay / (steps * 2))
-
-        # Gradually move mouse through midpoints
-        for i in range(1, steps):
-            mid_x = int(x1 + (x2 - x1) * i / steps)
-            mid_y = int(y1 + (y2 - y1) * i / steps)
-            lparam_mid = (mid_y << 16) | mid_x
-            win32gui.PostMessage(target_hwnd, win32con.WM_MOUSEMOVE, win32con.MK_LBUTTON, lparam_mid)
-            time.sleep(delay / steps)
-
-        # Mouse move to end
-        win32gui.PostMessage(target_hwnd, win32con.WM_MOUSEMOVE, win32con.MK_LBUTTON, lparam_end)
-        time.sleep(delay / (steps * 2))
+        self._post(target_hwnd, win32con.WM_LBUTTONDOWN, win32con.MK_LBUTTON, lparam_start)
+
+        # Move along the eased path on an absolute schedule (sleep overshoot does not stretch the drag)
+        start = time.perf_counter()
+        for i in range(1, steps + 1):
+            wait = start + duration * i / steps - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            t = easing_fn(i / steps)
+            mid_x = int(round(x1 + (x2 - x1) * t))
+            mid_y = int(round(y1 + (y2 - y1) * t))
+            self._post(target_hwnd, win32con.WM_MOUSEMOVE, win32con.MK_LBUTTON, (mid_y << 16) | mid_x)
+
+        if end_hold > 0:
+            time.sleep(end_hold)
         # Mouse up at end
-        win32gui.PostMessage(target_hwnd, win32con.WM_LBUTTONUP, None, lparam_end)
-        # print(f"Dragged from ({x1}, {y1}) to ({x2}, {y2}) in {target_hwnd}.")
+        self._post(target_hwnd, win32con.WM_LBUTTONUP, None, lparam_end)
+        self.logger.debug(f"[Drag] '{profile}' ({x1}, {y1}) -> ({x2}, {y2}): {steps} moves in {time.perf_counter() - start:.2f}s{' (flick)' if flick else ''}")
 
     def valid_coordinate_debug(self, coordinate, folder_name="temp_images", label="Check Click"):
         """
@@ -1,5 +1,5 @@
-import copy
 import glob
+import logging
 import os
 import shutil
 import sys
@@ -8,19 +8,38 @@ from datetime import datetime
 
 import toml
 
+from utils.army_plan import ArmyPlanCache
+from utils.attack_loop import AttackLoop
+from utils.army_tile_cache import ArmyTileCache
 from utils.base_actions import BaseActions
+from utils.battle_monitor import LootTracker
+from utils.check_memo import memoized_check
+from utils.deployment_engine import DeploymentEngine
+from utils.frame_predicates import (
+    base_loaded,
+    not_,
+    pixel_matches,
+    region_changed,
+    region_stable,
+    sequence,
+)
 from utils.game_window_controller import GameWindowController
+from utils.loot_scoring import LootPolicy
 from utils.object_detection import *
 from utils.settings import config, logger
-from utils.vision_utils import VisionUtils
+from utils.vision_utils import DETECTION_SLOTS, VisionUtils
+from utils.wait import all_of, any_of, frame_source, wait_until
 
 # Setup Logging
 
+# Pets the Pet House can hold at each town hall level (its max level unlocks one or more pets per level)
+PETS_BY_TOWN_HALL = {14: 4, 15: 8, 16: 10, 17: 11}
+
 
 
 class HomeBaseActions(BaseActions):
-    def __init__(self, window_controller: GameWindowController, config, logger_instance=None):
-        super().__init__(window_controller, config, logger_instance if logger_instance else logger)
+    def __init__(self, window_controller: GameWindowController, config, logger_instance=None, base_name=None):
+        super().__init__(window_controller, config, logger_instance if logger_instance else logger, base_name)
 
         # positions
         static_positions = self.config["HomeBaseStaticClickPositions"]
@@ -46,6 +65,9 @@ class HomeBaseActions(BaseActions):
         self.enemy_gold_threshold = general_config.get("ENEMY_GOLD_THRESHOLD", 300000)
         self.enemy_elixir_threshold = general_config.get("ENEMY_ELIXIR_THRESHOLD", 300000)
         self.enemy_dark_elixir_threshold = general_config.get("ENEMY_DARK_ELIXIR_THRESHOLD", 3000)
+        self.enemy_search = self.config.get("EnemySearch", {})
+        # (gold, elixir, dark) storage-full flags from the last check_max_resources
+        self.storage_maxed = None
         self.special_troop_drop = general_config.get("special_troop_drop", [[382, 298]])
         self.special_troop_counts = general_config.get("special_troop_counts", [10, 10])
 
@@ -57,6 +79,8 @@ class HomeBaseActions(BaseActions):
         self.start_attack_positions = static_positions["start_attack"]
         self.find_next_positions = static_positions["find_next"]
         self.go_home_positions = static_positions["go_home"]
+        self.end_battle_positions = static_positions["end_battle"]
+        self.end_battle_confirm_positions = static_positions.get("end_battle_confirm", [])
 
         # upgrade positions
         self.research_upgrade_positions = static_positions["research_upgrade"]
@@ -88,6 +112,14 @@ class HomeBaseActions(BaseActions):
         # super troop positions
         self.activate_super_troop_positions = static_positions["activate_super_troop"]
 
+        # army bar tile layouts and compiled deployment plans, shared across accounts
+        self.tile_cache = ArmyTileCache.shared()
+        self.plan_cache = ArmyPlanCache.shared()
+        self.deployer = DeploymentEngine(window_controller, self.logger)
+
+        # (search seconds, bases seen) of the last enemy search, for attack telemetry
+        self.last_search = None
+
         # Attack armies dict
         attacks_config = config.get("HomeBaseAttacks", {})
         self.attack_armies = {}
@@ -105,15 +137,16 @@ class HomeBaseActions(BaseActions):
         """
         Executes clicks for the reset select positions (read once in __init__).
         """
-        # Only execute the repeating 'clearing' clicks if we have more than one position
-        if len(self.reset_select_positions) > 1:
-            for _ in range(num_clicks):
-                self.window_controller.execute_clicks(self.reset_select_positions[:-1], delay=delay)
-        
-        # Execute the final reset click
-        if self.reset_select_positions:
-            self.window_controller.execute_clicks(self.reset_select_positions[-1], delay=delay)
-        time.sleep(1)
+        # Returning to the plain base view does not invalidate memoized checks
+        with self.window_controller.neutral_input():
+            # Only execute the repeating 'clearing' clicks if we have more than one position
+            if len(self.reset_select_positions) > 1:
+                for _ in range(num_clicks):
+                    self.dispatcher.dispatch_positions(self.reset_select_positions[:-1], delay=delay)
+
+            # Execute the final reset click (its delay absorbs the old trailing 1s sleep)
+            if self.reset_select_positions:
+                self.dispatcher.dispatch_positions(self.reset_select_positions[-1], delay=delay, final_delay=delay + 1)
 
     def return_home_refocus(self):
         """
@@ -150,18 +183,29 @@ class HomeBaseActions(BaseActions):
         """
         self.logger.info("Switching to builder base...")
         self.reset_select()
-        self.window_controller.execute_clicks(self.switch_builder_base_positions)
-        self.window_controller.execute_clicks(self.switch_builder_base_positions)
-        time.sleep(2)
+
+        def click_boat():
+            self.window_controller.execute_clicks(self.switch_builder_base_positions)
+            self.window_controller.execute_clicks(self.switch_builder_base_positions)
+
+        self.window_controller.act_and_await(
+            click_boat,
+            base_loaded('Builder'),
+            self.frame_wait.get("switch_base_timeout", 5),
+            poll=self.frame_wait.get("poll_interval", 0.25),
+            label="switch to builder base",
+        )
 
     """ --------------------------- Resource Functions --------------------------------- """
     def execute_resource_collection(self):
         # Read positions from the file (now from memory)
         positions = self.resource_positions
         # Execute clicks for each position
-        self.window_controller.execute_clicks(positions)
+        if positions:
+            self.dispatcher.dispatch_positions(positions)
         
     
+    @memoized_check
     def check_max_resources(self):
         """
         Captures a screenshot and detects if home base resources are maxed using color detection.
@@ -170,6 +214,7 @@ class HomeBaseActions(BaseActions):
         screenshot_path = self.manage_screenshot_storage('home_base_resource_stats')
         self.window_controller.capture_minimized_window_screenshot(screenshot_path)
         gold, elixir, dark_elixir = extract_home_resources(screenshot_path)
+        self.storage_maxed = (gold, elixir, dark_elixir)
         self.logger.info(f"[Base Resources] Gold maxed: {gold}, Elixir maxed: {elixir}, Dark Elixir maxed: {dark_elixir}")
         is_maxed = gold == 1 and elixir == 1 and dark_elixir == 1
         self.logger.info(f"[Base Resources] Both gold and elixirs maxed: {is_maxed}")
@@ -181,46 +226,29 @@ class HomeBaseActions(BaseActions):
         Target: Pixel (1669, 149) should NOT be (254, 254, 254).
         """
         self.logger.info("Waiting for base to load...")
-        start_time = time.time()
         
         # Avoid RGB (White/Clouds)
         avoid_rgb = self.colors.get("white_clouds_rgb", [254, 254, 254])
-        check_pos = self.hb_coords.get("check_base_load_pos", [1669, 149])
-        
-        while (time.time() - start_time) < timeout:
-            time.sleep(0.5)
-            screenshot_path = self.manage_screenshot_storage('base_load_check')
-            # Using capture_minimized_window_screenshot returns PIL Image, also saves file
-            img = self.window_controller.capture_minimized_window_screenshot(screenshot_path)
-            
-            # Annotate the check position
-            try:
-                # self.annotate_coords_on_image([check_pos]) # Avoid recursion or using heavy func here
-                annotate_coords_on_image(screenshot_path, [check_pos], output_suffix='.png')
-            except Exception as e:
-                self.logger.error(f"Failed to annotate base load check: {e}")
-            
-            if img:
-                try:
-                    r, g, b = img.getpixel(check_pos)
-                    
-                    # Euclidean distance to the "Avoid" color (White)
-                    dist = ((r - avoid_rgb[0])**2 + (g - avoid_rgb[1])**2 + (b - avoid_rgb[2])**2) ** 0.5
-                    
-                    # If distance is LARGE (> 10), then we are NOT white, so base is loaded
-                    if dist > 10:
-                        self.logger.debug(f"Base loaded! Pixel is NOT {avoid_rgb} | Found RGB: ({r},{g},{b}) | Diff from White: {dist:.2f}")
-                        time.sleep(1)
-                        return True
-                    
-                    # Still white/clouds
-                    self.logger.debug(f"Waiting for base: Found RGB ({r}, {g}, {b}) is close to {avoid_rgb} (Diff: {dist:.2f})")
-                        
-                except Exception as e:
-                    pass # Ignore out of bounds or read errors
-            
+        x, y = self.hb_coords.get("check_base_load_pos", [1669, 149])
+
+        def not_clouds(frame):
+            h, w = frame.shape[:2]
+            if y >= h or x >= w:
+                return False
+            b, g, r = (int(c) for c in frame[y, x])
+            # Euclidean distance to the "Avoid" color (White); if LARGE (> 10) we are NOT white, so the base is loaded
+            dist = ((r - avoid_rgb[0])**2 + (g - avoid_rgb[1])**2 + (b - avoid_rgb[2])**2) ** 0.5
+            self.logger.debug(f"Base load check: Found RGB ({r}, {g}, {b}) | Diff from {avoid_rgb}: {dist:.2f}")
+            return dist > 10
+
+        source = frame_source(self.window_controller, self.manage_screenshot_storage('base_load_check'))
+        result = wait_until(not_clouds, source, timeout=timeout, min_interval=0.25, backoff=1.5, max_interval=1.0,
+                            initial_delay=0.5, label="base load")
+        if result:
+            self.logger.debug(f"Base loaded after {result.elapsed:.2f}s")
             time.sleep(1)
-            
+            return True
+
         self.logger.warning("Warning: Timed out waiting for base load.")
         return False
 
@@ -228,11 +256,17 @@ class HomeBaseActions(BaseActions):
 
     """ --------------------------- Attack Functions --------------------------------- """
 
-    def check_heros(self):
+    def check_heros(self, use_cache=True):
         """
         Captures a screenshot and detects the number of available heroes using detect_heroes_available.
         Prints and returns the number of available heroes.
+        The count is cached in the account state until a builder upgrade (which may be a hero) is started.
         """
+        cached = self.account_state.get("heroes_available") if use_cache else None
+        if cached is not None:
+            self.logger.info(f"[Heros Status] Available heroes: {cached} (cached)")
+            return cached
+
         # select train army button
         self.window_controller.execute_clicks(self.train_army_button_position)
         time.sleep(1)
@@ -241,6 +275,7 @@ class HomeBaseActions(BaseActions):
         self.window_controller.capture_minimized_window_screenshot(screenshot_path)
         available_heros = detect_heroes_available(screenshot_path)
         self.logger.info(f"[Heros Status] Available heroes: {available_heros}")
+        self.account_state.set("heroes_available", available_heros)
 
         # reset select
         self.reset_select()
@@ -250,6 +285,8 @@ class HomeBaseActions(BaseActions):
     def army_placement(self, army_key=None, available_heros=None, delay=0.5):
         """
         Places the army in the correct position.
+        The army is compiled once per (army, heroes, special troops, tile geometry) into an ArmyPlan and the
+        plan rows are streamed to the window controller.
         :param army_key: String key for the army type (e.g., 'e_drag_rage_goblin').
         """
         # get army positions
@@ -259,217 +296,81 @@ class HomeBaseActions(BaseActions):
         if not army:
             raise ValueError(f"Army key '{army_key}' not found in attack_armies.")
 
-        # --- TROOP CALCULATION ---
-        total_select_count = 0
-        if army_key == 'main_attack':
-            try:
-                positions = army.get("positions", [])
-                if len(positions) >= 4:
-                    counts = []
-                    for i in range(4):
-                        sublist = positions[i]
-                        count = 0
-                        for coord in sublist:
-                            if isinstance(coord, (list, tuple)) and len(coord) == 2:
-                                if coord[1] >= 918: # Threshold for select region (0.85)
-                                    count += 1
-                        counts.append(count)
-                    
-                    num_heroes = available_heros if isinstance(available_heros, int) else 0
-                    special_count = self.special_troop_event if self.special_troop_event > 0 else 0
-                    total_select_count = counts[0] + counts[1] + (counts[2] * num_heroes) + counts[3] + special_count
-                    
-                    self.logger.info(f"[Calculation] Breakdown: {counts[0]} (Troops) + {counts[1]} (CC) + ({counts[2]} * {num_heroes} Heroes) + {counts[3]} (Spells) + {special_count} (Special)")
-                    self.logger.info(f"[Calculation] Total Troops/Clicks over 0.85: {total_select_count}")
-            except Exception as e:
-                self.logger.error(f"Error in troop calculation: {e}")
-
-        # Create a copy of army positions for potential adjustments
-        army_positions_copy = copy.deepcopy(army["positions"])
-        needs_scroll = total_select_count > 14
-        
         # --- PHASE 1: INITIAL DETECTION & TROOP DEPLOYMENT ---
         try:
             debug_screen_path = self.manage_screenshot_storage('army_placement_phase_1')
             self.window_controller.capture_minimized_window_screenshot(debug_screen_path)
-            
+
             # 1. Detect First Tile Anchor
-            first_tile_data = detect_first_army_tile(debug_screen_path)
+            num_super = int(self.special_troop_event) if self.special_troop_event else 0
+            first_tile_data = self._detect_army_tiles(debug_screen_path, army_key, 'phase_1', available_heros, num_super)
             if not first_tile_data:
                 self.logger.warning("First Tile NOT Detected in Phase 1.")
-                return 
+                return
 
             cx, cy, ft_rect, _ = first_tile_data
-            w, h = ft_rect[2], ft_rect[3]
-            self.logger.debug(f"Phase 1 Anchor: {cx}, {cy} | W={w}, H={h}")
+            w = ft_rect[2]
+            self.logger.debug(f"Phase 1 Anchor: {cx}, {cy} | W={w}, H={ft_rect[3]}")
 
-            # 2. Super Troop Injection
-            num_super = int(self.special_troop_event) if self.special_troop_event else 0
-            if num_super > 0 and len(army_positions_copy) > 0:
+            # 2. Super Troop placement (start or end of the troop phase)
+            is_special_start = False
+            if num_super > 0:
                 is_special_start = detect_super_troop_at_pixel(
                     debug_screen_path, cx, cy,
                     self.config["HomeBaseGeneral"].get("special_troop_event_rgb", []),
                     self.logger
                 )
-                
-                st_drop_pos = self.special_troop_drop[0]
-                placeholders = []
-                for i in range(num_super):
-                    clicks = self.special_troop_counts[i] if i < len(self.special_troop_counts) else 10
-                    select_dummy = self.hb_coords.get("special_troop_select_dummy", [0, 950]) 
-                    placeholders.append(select_dummy)
-                    for _ in range(clicks):
-                        placeholders.append(st_drop_pos)
-
-                if is_special_start:
-                    army_positions_copy[0] = placeholders + army_positions_copy[0]
-                else:
-                    army_positions_copy[0] = army_positions_copy[0] + placeholders
-
-            # 3. Hero Expansion
-            if len(army_positions_copy) > 2:
-                target_hero_count = available_heros if isinstance(available_heros, int) else 4
-                if target_hero_count == 0:
-                    army_positions_copy[2] = []
-                elif target_hero_count > 0:
-                    hero_list = army_positions_copy[2]
-                    existing_hero_selects = [c for c in hero_list if isinstance(c, list) and len(c)==2 and c[1] >= 918]
-                    current_count = len(existing_hero_selects)
-                    if current_count < target_hero_count and current_count > 0 and len(hero_list) >= 2:
-                        needed = target_hero_count - current_count
-                        template_unit = hero_list[0:2]
-                        for _ in range(needed):
-                            hero_list.extend(copy.deepcopy(template_unit))
-
-            # 4. Propagate Coordinates for PHASE 1
-            GAP_INTRA = 8
-            GAP_INTER = 24
-            
-            def propagate(phases, start_x, start_y):
-                curr_x = start_x
-                for p_idx, p_list in enumerate(phases):
-                    found_select = False
-                    def update_coords(obj):
-                        nonlocal curr_x, found_select
-                        if isinstance(obj, list) and len(obj) == 2 and all(isinstance(x, (int, float)) for x in obj):
-                            if obj[1] >= 918:
-                                new_c = [int(curr_x), int(start_y)]
-                                curr_x += (w + GAP_INTRA)
-                                found_select = True
-                                return new_c
-                            return [obj[0], obj[1]]
-                        elif isinstance(obj, list):
-                            return [update_coords(item) for item in obj]
-                        return obj
-                    phases[p_idx] = update_coords(p_list)
-                    if found_select:
-                        curr_x += (GAP_INTER - GAP_INTRA)
-                return phases
-
-            # We propagate everything initially to have a plan
-            army_positions_copy = propagate(army_positions_copy, cx, cy)
-            
+            special = self._special_troop_spec(num_super, is_special_start)
+
+            # 3. Compiled plan for the whole army from the first tile
+            plan = self.plan_cache.get_plan(army_key, army["positions"], available_heros, special, (cx, cy), w, delay)
+            counts = plan.phase_select_counts()
+            self.logger.info(f"[Calculation] Breakdown: {counts['troops']} (Troops incl. {num_super} Special) + {counts['cc']} (CC) + {counts['heroes']} (Heroes) + {counts['spells']} (Spells)")
+            self.logger.info(f"[Calculation] Total Troops/Clicks over 0.85: {plan.select_count}")
+            needs_scroll = plan.select_count > 14
+
             # --- EXECUTION PHASE 1 ---
             self.logger.info("Executing Phase 1 (Troops)...")
-            self.window_controller.execute_clicks(army_positions_copy[0], delay=delay)
+            self.deployer.deploy(plan, 'troops', tile_h=ft_rect[3])
 
             if not needs_scroll:
-                # Normal execution for CC, Heroes, Spells
                 self.logger.info("Executing Remaining Phases (Single Pass)...")
-                # CC
-                self.window_controller.execute_clicks(army_positions_copy[1], delay=delay)
-                # Heroes (Double Pass)
-                self._deploy_and_activate_heroes(army_positions_copy[2], delay)
-                # Spells
-                for spell_list in army_positions_copy[3:]:
-                    self.window_controller.execute_clicks(spell_list, delay=delay)
+                self.deployer.deploy(plan, 'cc', 'spells', tile_h=ft_rect[3])
             else:
                 # --- SCROLL MANEUVER ---
                 self.logger.info("[Scroll] Over 14 tiles detected. Scrolling bar...")
                 # Start: (0.9497, 0.9259) -> [1641, 1000] | End: (0.0347, 0.9259) -> [60, 1000]
                 scroll_start = [1641, 1000]
                 scroll_end = [60, 1000]
-                self.window_controller.drag_in_window(scroll_start[0], scroll_start[1], scroll_end[0], scroll_end[1])
+                self.window_controller.drag_in_window(scroll_start[0], scroll_start[1], scroll_end[0], scroll_end[1], profile="army_bar")
                 time.sleep(1.5)
 
                 # --- PHASE 2: RE-DETECTION & BACKWARDS ALIGNMENT ---
                 debug_screen_2 = self.manage_screenshot_storage('army_placement_phase_2')
                 self.window_controller.capture_minimized_window_screenshot(debug_screen_2)
-                
-                # Detect ALL tiles. valid_candidates[0] is leftmost, [-1] is rightmost.
-                tile_results = detect_first_army_tile(debug_screen_2)
+
+                # Detect ALL tiles. candidates[0] is leftmost, [-1] is rightmost.
+                tile_results = self._detect_army_tiles(debug_screen_2, army_key, 'phase_2', available_heros, num_super)
                 if not tile_results:
                     self.logger.warning("No tiles detected in Phase 2! Falling back to leftmost assumption.")
                     nx, ny = cx, cy # Bad fallback but avoids crash
                 else:
-                    cx2, cy2, _, candidates = tile_results
+                    _, cy2, _, candidates = tile_results
                     rightmost = candidates[-1]
-                    rx, ry = rightmost['x'] + rightmost['w']//2, cy2 # Use rightmost center
-                    
+                    rx, ry = rightmost['x'] + rightmost['w'] // 2, cy2 # Use rightmost center
                     self.logger.info(f"[Scroll] Phase 2 Rightmost Anchor: {rx}, {ry}")
-                    
+
                     # --- BACKWARDS OFFSET CALCULATION ---
-                    GAP_INTRA = 8
-                    GAP_INTER = 24
-                    
-                    def get_select_count(obj):
-                        cnt = 0
-                        if isinstance(obj, list) and len(obj) == 2 and all(isinstance(x, (int, float)) for x in obj):
-                            if obj[1] >= 918: return 1
-                        elif isinstance(obj, list):
-                            for item in obj: cnt += get_select_count(item)
-                        return cnt
-
-                    # Calculate tiles per phase for the remaining army
-                    p1_tiles = get_select_count(army_positions_copy[1])
-                    p2_tiles = get_select_count(army_positions_copy[2])
-                    p3_tiles = 0
-                    for sub in army_positions_copy[3:]:
-                        p3_tiles += get_select_count(sub)
-                    
-                    # Distance from center of first tile to center of last tile
-                    # Every tile adds (w + GAP_INTRA), except categories add (GAP_INTER - GAP_INTRA) extra
-                    total_tiles = p1_tiles + p2_tiles + p3_tiles
-                    if total_tiles <= 0:
-                        nx, ny = rx, ry
-                    else:
-                        total_width = (total_tiles - 1) * (w + GAP_INTRA)
-                        # Add INTER gap bonuses (16 pixels each)
-                        if p1_tiles > 0 and (p2_tiles > 0 or p3_tiles > 0):
-                            total_width += (GAP_INTER - GAP_INTRA)
-                        if p2_tiles > 0 and p3_tiles > 0:
-                            total_width += (GAP_INTER - GAP_INTRA)
-                        
-                        nx = rx - total_width
-                        ny = ry
-                    
-                    self.logger.info(f"[Scroll] Phase 2 Tiles: CC={p1_tiles}, Heroes={p2_tiles}, Spells={p3_tiles} | Total Width: {total_width}")
+                    # The remaining tiles end at the rightmost tile, so start one plan-span to the left of it
+                    total_width = plan.select_span('cc', 'spells')
+                    nx, ny = rx - total_width, ry
+                    self.logger.info(f"[Scroll] Phase 2 Tiles: CC={counts['cc']}, Heroes={counts['heroes']}, Spells={counts['spells']} | Total Width: {total_width}")
                     self.logger.info(f"[Scroll] Calculated Start-X for Phase 2: {nx} (Backwards from {rx})")
-                    
-                    # Re-propagate remaining phases (1, 2, 3+)
-                    original_remaining = copy.deepcopy(army["positions"][1:])
-                    # Re-expand heroes in the original copy
-                    if len(original_remaining) > 1 and num_heroes > 0:
-                        h_list = original_remaining[1]
-                        if len(h_list) >= 2:
-                            # Use same logic to find how many template blocks to add
-                            current_cfg_selects = get_select_count(h_list)
-                            needed = num_heroes - current_cfg_selects
-                            if needed > 0:
-                                template = h_list[0:2]
-                                for _ in range(needed):
-                                    h_list.extend(copy.deepcopy(template))
-
-                    army_positions_copy[1:] = propagate(original_remaining, nx, ny)
+
+                remaining = self.plan_cache.get_plan(army_key, army["positions"], available_heros, special, (nx, ny), w, delay, first_phase=1)
 
                 self.logger.info("Executing Remaining Phases (Post-Scroll)...")
-                # CC
-                self.window_controller.execute_clicks(army_positions_copy[1], delay=delay)
-                # Heroes
-                self._deploy_and_activate_heroes(army_positions_copy[2], delay)
-                # Spells
-                for spell_list in army_positions_copy[3:]:
-                    self.window_controller.execute_clicks(spell_list, delay=delay)
+                self.deployer.deploy(remaining, 'cc', 'spells', tile_h=ft_rect[3])
 
             self.logger.info("Attack finished")
 
@@ -478,22 +379,41 @@ class HomeBaseActions(BaseActions):
             import traceback
             self.logger.error(traceback.format_exc())
 
-    def _deploy_and_activate_heroes(self, heroes_pos, delay):
-        """Helper to handle hero deployment and ability activation."""
-        num_pairs = len(heroes_pos) // 2
-        if num_pairs > 0:
-            self.logger.info("Deploying Heroes...")
-            for i in range(num_pairs):
-                idx = i * 2
-                self.window_controller.execute_clicks([heroes_pos[idx]], delay=delay)
-                self.window_controller.execute_clicks([heroes_pos[idx+1]], delay=delay)
-            time.sleep(3)
-            self.logger.info("Activating Hero Abilities...")
-            for i in range(num_pairs):
-                self.window_controller.execute_clicks([heroes_pos[i * 2]], delay=delay)
-
-        
-        
+    def _special_troop_spec(self, num_super, at_start):
+        """Hashable description of the event super troop taps injected into the troop phase."""
+        if num_super <= 0:
+            return None
+        select_dummy = self.hb_coords.get("special_troop_select_dummy", [0, 950])
+        return (
+            num_super,
+            tuple(self.special_troop_counts),
+            tuple(self.special_troop_drop[0]),
+            tuple(select_dummy),
+            bool(at_start),
+        )
+
+    def _detect_army_tiles(self, screenshot_path, army_key, phase, hero_count=None, special_count=0):
+        """
+        Returns the army bar tile layout for the screenshot, reusing the cached layout for this account, army,
+        resolution, hero count and super troop count when border probes confirm it still lines up.
+        Falls back to full detection (and refreshes the cache) when validation fails.
+        """
+        img_cv = VisionUtils.load_image(screenshot_path)
+        h_img, w_img = img_cv.shape[:2]
+        key = ArmyTileCache.make_key(self.base_name, army_key, phase, w_img, h_img, hero_count, special_count)
+
+        cached = self.tile_cache.get(key)
+        if cached and validate_army_tile_layout(img_cv, cached['tiles']):
+            self.logger.debug(f"[Tile Cache] Reusing cached {phase} layout for '{self.base_name}' ({w_img}x{h_img})")
+            return ArmyTileCache.as_tile_data(cached)
+        if cached:
+            self.logger.info(f"[Tile Cache] Cached {phase} layout failed validation, re-detecting...")
+
+        with DETECTION_SLOTS:
+            tile_data = detect_army_tiles(screenshot_path, img_cv)
+        if tile_data:
+            self.tile_cache.put(key, tile_data)
+        return tile_data
 
     def get_enemy_base_resources(self):
         screenshot_path = self.manage_screenshot_storage('enemy_base_resource_stats')
@@ -502,135 +422,223 @@ class HomeBaseActions(BaseActions):
         return gold, elixir, dark_elixir
 
 
+    def loot_policy(self):
+        """Acceptance policy for the next search, weighted by which storages are still filling."""
+        thresholds = {'gold': self.enemy_gold_threshold, 'elixir': self.enemy_elixir_threshold, 'dark': self.enemy_dark_elixir_threshold}
+        return LootPolicy(thresholds, self.storage_maxed, self.logger)
+
+    def max_enemy_loot(self):
+        """
+        Most loot a scouted base can hold, from [EnemySearch.max_loot] for one town hall above this account's
+        (matchmaking may pair it with a higher town hall).
+        """
+        table = {int(level): values for level, values in self.enemy_search.get("max_loot", {}).items()}
+        levels = [level for level in table if level <= self.thl + 1]
+        if not levels:
+            # Unknown caps: never reject early
+            return {r: float("inf") for r in ('gold', 'elixir', 'dark')}
+        return dict(zip(('gold', 'elixir', 'dark'), table[max(levels)]))
+
+    def evaluate_enemy_base(self, policy, elapsed, baseline=None):
+        """
+        Reads the scouted base's loot counters one at a time, straight from in-memory frames.
+        Each counter is read as soon as its region is stable (and not covered by clouds). Counters are read most
+        discriminating first, and after every read the base is rejected if even the maximum loot of every unread
+        counter (max_enemy_loot) could not lift its score to the bar. Counters that do not score are only read for
+        accepted bases.
+        :param baseline: Frame from before "next" was tapped; the first counter must change from it (or clouds must
+                         show) before it counts as loaded, so the previous base is never re-read.
+        :return: (gold, elixir, dark_elixir, accepted). Unread counters are None; None if a counter never settled.
+        """
+        regions = dict(zip(('gold', 'elixir', 'dark'), enemy_loot_regions()))
+        order = self.enemy_search.get("read_order") or policy.relevant
+        bar = policy.bar(elapsed)
+        max_values = self.max_enemy_loot()
+
+        source = frame_source(self.window_controller, self.manage_screenshot_storage('enemy_base_resource_stats'))
+        clouds = pixel_matches(
+            self.hb_coords.get("check_base_load_pos", [1669, 149]),
+            list(reversed(self.colors.get("white_clouds_rgb", [254, 254, 254]))),
+            tolerance=10,
+        )
+        timeout = self.enemy_search.get("counter_timeout", 30)
+        hold = self.enemy_search.get("counter_stable_hold", 0.2)
+
+        values = {}
+        frame = None
+        for index, name in enumerate(order):
+            ready = all_of(not_(clouds), region_stable(regions[name], hold=hold))
+            if index == 0 and baseline is not None:
+                ready = sequence(any_of(region_changed(regions[name]), clouds), ready)
+            result = wait_until(lambda f: ready(f, baseline), source, timeout=timeout, min_interval=0.05,
+                                label=f"enemy {name} counter")
+            if not result:
+                self.logger.warning(f"[Enemy Search] {name} counter did not settle within {timeout}s")
+                return None
+            frame = result.frame
+            values[name] = read_loot_value(frame, regions[name])
+
+            if policy.upper_bound(values, max_values) < bar:
+                self.logger.info(f"[Enemy Search] Rejected after {name}: {values} (cannot reach bar {bar:.0f})")
+                return values.get('gold'), values.get('elixir'), values.get('dark'), False
+
+        for name in ('gold', 'elixir', 'dark'):
+            if name not in values:
+                values[name] = read_loot_value(frame if frame is not None else source(), regions[name])
+        score = policy.score(values)
+        accepted = score >= bar
+        self.logger.info(f"\nGold: {values['gold']}, Elixir: {values['elixir']}, Dark Elixir: {values['dark']} | Score {score:.0f} vs bar {bar:.0f}")
+        return values['gold'], values['elixir'], values['dark'], accepted
+
     def find_enemy_base(self):
         """
-        Loops through enemy bases until one is found that meets the gold and elixir thresholds.
+        Loops through enemy bases until one is found whose loot score clears the (time-decaying) acceptance bar.
         Returns the gold, elixir, and dark_elixir values of the found base.
         """
-        gold, elixir, dark_elixir = self.get_enemy_base_resources()
-        self.logger.info(f"\nGold: {gold}, Elixir: {elixir}, Dark Elixir: {dark_elixir}")
+        policy = self.loot_policy()
+        search_start = time.time()
+        self.logger.info(f"[Enemy Search] Scorer '{policy.scorer_name}' weights {policy.weights} | Starting bar {policy.start_bar:.0f}")
+        evaluation = self.evaluate_enemy_base(policy, 0)
+        bases_seen = 1
         
         # Initialize safeguard counter
         same_resource_counter = 0
-        last_resources = (gold, elixir, dark_elixir)
+        last_resources = evaluation[:3] if evaluation else None
 
-        time.sleep(2)
-        while gold + elixir < self.enemy_gold_threshold + self.enemy_elixir_threshold:
+        while evaluation is None or not evaluation[3]:
             # Find next base
+            baseline = self.window_controller.capture_frame()
             self.window_controller.execute_clicks(self.find_next_positions, delay=0)
             self.window_controller.execute_clicks(self.find_next_positions, delay=0)
-            
-            # reduced sleep
-            self.wait_for_base_load()
-            time.sleep(1) # Reduced from 5s to 1s
 
-            # Check resources of new base
-            gold, elixir, dark_elixir = self.get_enemy_base_resources()
-            self.logger.info(f"\nGold: {gold}, Elixir: {elixir}, Dark Elixir: {dark_elixir}")
+            # Check resources of new base as soon as its counters settle
+            evaluation = self.evaluate_enemy_base(policy, time.time() - search_start, baseline)
+            bases_seen += 1
 
             # Safeguard: Check for identical consecutive readings
-            current_resources = (gold, elixir, dark_elixir)
+            current_resources = evaluation[:3] if evaluation else None
             if current_resources == last_resources:
                 same_resource_counter += 1
                 if same_resource_counter >= 20:
                     self.logger.warning("Safeguard triggered: 20 consecutive identical resource readings. Restarting detection.")
+                    self._record_search(time.time() - search_start, bases_seen, current_resources, False)
                     return None
             else:
                 same_resource_counter = 0
                 last_resources = current_resources
         
-        return gold, elixir, dark_elixir
+        search_seconds = time.time() - search_start
+        self.logger.info(f"[Enemy Search] Accepted after {search_seconds:.0f}s ({bases_seen} bases)")
+        self._record_search(search_seconds, bases_seen, evaluation[:3], True)
+        return evaluation[:3]
+
+    def _record_search(self, search_seconds, bases_seen, loot, accepted):
+        self.last_search = (search_seconds, bases_seen)
+        if self.telemetry:
+            gold, elixir, dark = loot if loot else (None, None, None)
+            self.telemetry.record("searches", account=self.base_name, bases_seen=bases_seen, search_seconds=search_seconds,
+                                  gold=gold, elixir=elixir, dark=dark, accepted=int(accepted))
 
 
     def start_attack(self, army_key=None, available_heros=0, ranked_mode=False):
         """
-        Starts an attack using the specified army key from self.attack_armies.
+        Runs one attack (search, deploy, wait for the end, go home) using the specified army key from self.attack_armies.
         :param army_key: String key for the army type (e.g., 'e_drag_rage_goblin').
         """
-        self.check_reload_needed()
-        self.reset_select()
-        # if ranked mode, increment ranked game count
-        if ranked_mode and self.ranked_game_count < 10:
-            self.ranked_game_count += 1
-            # start attack
-            self.window_controller.execute_clicks(self.start_attack_positions[0])
-            offset = self.hb_coords.get("ranked_mode_offset", [300, 0])
-            ranked_mode_position = [self.start_attack_positions[1][0] + offset[0] , self.start_attack_positions[1][1] + offset[1] ]
-            self.logger.debug(f"Ranked mode position: {ranked_mode_position}")
-            self.window_controller.execute_clicks(ranked_mode_position)
-        else:
-            # start attack
-            self.window_controller.execute_clicks(self.start_attack_positions)
-        # let the game load defenders base
-        # let the game load defenders base
-        self.wait_for_base_load()
-        
-        # if not auto_lose, find enemy base
-        if not army_key == 'auto_lose':
-            # Find a suitable enemy base
-            result = self.find_enemy_base()
-            if result is None:
-                self.logger.warning("Restarting attack process from start_attack due to safeguard.")
-                return self.start_attack(army_key, available_heros, ranked_mode)
-        # Attack base
-        self.logger.info("\n[Home Base] Attacking base...")
-        # Attack Type
         if army_key is None:
-            army_key = self.attack_armies.keys()[0]
-        army = self.attack_armies.get(army_key)
-        if not army:
-            raise ValueError(f"Army key '{army_key}' not found in attack_armies.")
-        
-        # Place the army
-        self.army_placement(army_key, available_heros, delay=0.25)
-        
-        # delay for the attack to complete
-        if not army_key == 'auto_lose':
-            # Dynamic Wait for Battle End
-            max_duration = 170
-            
-            self.logger.info(f"Waiting for battle to end (Max {max_duration}s)...")
-            start_wait = time.time()
-            check_interval = 5
-            
-            while (time.time() - start_wait) < max_duration:
-                 if self.check_return_home_visible():
-                     self.logger.info("Return Home detected! Battle ended early.")
-                     break
-                 time.sleep(check_interval)
-            self.window_controller.scroll_wheel_down(20)
-        else:
+            army_key = next(iter(self.attack_armies), None)
+        AttackLoop(self, "home", placement_delay=0.25).attack(army_key, available_heros, ranked_mode)
+
+    def attack_search(self, army_key, ranked_mode=False):
+        """
+        Opens the attack screen and, unless army_key is 'auto_lose', searches for a base worth attacking.
+        Starts over from the attack button when the identical-readings safeguard trips.
+        :return: (gold, elixir, dark_elixir) of the accepted base, None for 'auto_lose'.
+        """
+        self.last_search = None
+        while True:
+            self.check_reload_needed()
+            self.reset_select()
+            # if ranked mode, increment ranked game count
+            if ranked_mode and self.ranked_game_count < 10:
+                self.ranked_game_count += 1
+                # start attack
+                self.window_controller.execute_clicks(self.start_attack_positions[0])
+                offset = self.hb_coords.get("ranked_mode_offset", [300, 0])
+                ranked_mode_position = [self.start_attack_positions[1][0] + offset[0] , self.start_attack_positions[1][1] + offset[1] ]
+                self.logger.debug(f"Ranked mode position: {ranked_mode_position}")
+                self.window_controller.execute_clicks(ranked_mode_position)
+            else:
+                # start attack
+                self.dispatcher.dispatch_positions(self.start_attack_positions, settle=0.3)
+            # let the game load defenders base
+            self.wait_for_base_load()
+
+            # if not auto_lose, find enemy base
+            enemy_loot = None
+            if not army_key == 'auto_lose':
+                # Find a suitable enemy base
+                enemy_loot = self.find_enemy_base()
+                if enemy_loot is None:
+                    self.logger.warning("Restarting attack process from start_attack due to safeguard.")
+                    continue
+            # Attack base
+            self.logger.info("\n[Home Base] Attacking base...")
+            return enemy_loot
+
+    def attack_await_end(self, army_key, enemy_loot=None):
+        """
+        Waits for the battle to end, leaving early through end_battle once the loot target is collected.
+        :return: "return_home", "early_exit", "timeout" or "auto_lose".
+        """
+        if army_key == 'auto_lose':
             time.sleep(1)
+            return 'auto_lose'
+
+        # Dynamic Wait for Battle End
+        max_duration = 170
+
+        self.logger.info(f"Waiting for battle to end (Max {max_duration}s)...")
+        expected = config.get("BattleMonitor", {}).get("expected_home_duration", max_duration)
+        loot_tracker = LootTracker(enemy_loot, self.logger) if enemy_loot and LootTracker.enabled() else None
+        if loot_tracker:
+            self.logger.info(f"[Loot Exit] Leaving once {loot_tracker.target} gold + elixir is collected")
+        outcome = self.battle_monitor.wait_for_end(
+            max_duration, expected, label="home battle end",
+            early_exit=loot_tracker, early_exit_interval=config.get("LootExit", {}).get("check_interval", 3.0),
+        )
+        if outcome == "early_exit":
+            self.logger.info(f"[Loot Exit] Target reached (gained {loot_tracker.gained}). Ending battle.")
+            self.end_battle()
+        elif outcome:
+            self.logger.info("Return Home detected! Battle ended early.")
+        self.window_controller.scroll_wheel_down(20)
+        return outcome or 'timeout'
 
+    def attack_return_home(self):
         # Go Home
-        self.window_controller.execute_clicks(self.go_home_positions)
-        time.sleep(2)
+        self.dispatcher.dispatch_positions(self.go_home_positions, settle=0.3, final_delay=3)
         self.return_home_refocus()
         self.reset_select(delay=0.2, num_clicks=10)
 
+    def end_battle(self):
+        """
+        Surrenders the running battle (end battle, then confirm) and waits for the results screen.
+        """
+        self.dispatcher.dispatch_positions(self.end_battle_positions, settle=0.3)
+        self.dispatcher.dispatch_positions(self.end_battle_confirm_positions, settle=0.3)
+        if not self.battle_monitor.wait_for_end(10, label="end battle results"):
+            self.logger.warning("[Loot Exit] Results screen not confirmed after ending the battle.")
+
     def main_attack_loop(self, available_heros, ranked_mode, fill_storage=False):
-        while True:
-            # check if resources are maxed
-            if self.check_max_resources():
-                break
-            # start attack
-            self.start_attack('main_attack', available_heros, ranked_mode)
-        
-        # check for upgrades and if there are still builders available, start attack loop again to get full resources
-        if self.start_builder_upgrade():
-            self.logger.info("Builders upgraded. Checking heros again...")
-            available_heros = self.check_heros()
-            self.main_attack_loop(available_heros, ranked_mode)
-        
-        # get max resources again
-        if fill_storage:
-            while True:
-                # check if resources are maxed
-                if self.check_max_resources():
-                    break
-                # start attack
-                self.start_attack('main_attack', available_heros, ranked_mode)
-        
+        """
+        Attacks until the storages are full, spends builders, and attacks again while upgrades were started.
+        With fill_storage the storages are filled once more at the end. Resumes from the last checkpoint after a restart.
+        :return: The number of builder upgrades started.
+        """
+        loop = AttackLoop(self, "home", placement_delay=0.25, refresh_heroes=self.check_heros)
+        return loop.run(available_heros, fill_storage, ranked_mode)
+
     def lower_trophy_count(self):
         for _ in range(10):
             self.start_attack('auto_lose')
@@ -667,7 +675,7 @@ class HomeBaseActions(BaseActions):
             for _ in range(6):
                 # drag page down
                 drag_coords = self.hb_coords.get("wall_scroll_drag_coords", [889, 578, 885, 234])
-                self.window_controller.drag_in_window(*drag_coords)
+                self.window_controller.drag_in_window(*drag_coords, profile="wall_scroll")
                 time.sleep(.75)
                 # timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
                 screenshot_path = self.manage_screenshot_storage('wall_upgrade_test')
@@ -720,7 +728,7 @@ class HomeBaseActions(BaseActions):
                     max_wall_msg_color = detect_is_red(max_wall_path, max_wall_region)
                     
                     # Debug Annotation
-                    if self.logger.isEnabledFor(10):
+                    if self.logger.isEnabledFor(logging.DEBUG):
                         try:
                             # Load image
                             debug_img = cv2.imread(screenshot_path)
@@ -793,6 +801,7 @@ class HomeBaseActions(BaseActions):
             
             
         
+    @memoized_check
     def check_goblin_builder(self):
         # timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         screenshot_path = self.manage_screenshot_storage('goblin_builder')
@@ -800,6 +809,7 @@ class HomeBaseActions(BaseActions):
         is_goblin = is_goblin_builder_in_region(screenshot_path)
         return is_goblin
 
+    @memoized_check
     def check_goblin_researcher(self):
         # timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         screenshot_path = self.manage_screenshot_storage('goblin_researcher')
@@ -807,6 +817,7 @@ class HomeBaseActions(BaseActions):
         is_goblin = is_goblin_researcher_in_region(screenshot_path)
         return is_goblin
 
+    @memoized_check
     def check_builder_upgrade(self):
         # check if goblin builder is in region
         is_goblin = self.check_goblin_builder()
@@ -855,6 +866,9 @@ class HomeBaseActions(BaseActions):
                 new_cord = [self.build_upgrade_positions[1][0], self.build_upgrade_positions[1][1] + (step_y * i)]
                 self.window_controller.execute_clicks(new_cord)
 
+            # the suggestion may be a hero, which is unavailable while upgrading
+            self.account_state.invalidate("heroes_available")
+
             # get loc for upgrade button
             results = self.check_builder_upgrade_button()
             self.logger.debug(f"Upgrade button results: {results}")
@@ -887,6 +901,7 @@ class HomeBaseActions(BaseActions):
             self.logger.info("No builder upgrade available")
             return False
         
+    @memoized_check
     def check_laboratory_upgrade(self):
         # check if goblin researcher is in region
         is_goblin = self.check_goblin_researcher()
@@ -925,6 +940,7 @@ class HomeBaseActions(BaseActions):
             self.window_controller.execute_clicks(self.research_upgrade_positions[2])
             # reset select
             self.reset_select()
+            return True
         else:
             self.logger.info("No laboratory upgrade available")
             return False
@@ -952,7 +968,22 @@ class HomeBaseActions(BaseActions):
         pet_upgrade_in_progress = is_pet_upgrade_in_progress_from_image(screenshot_path)
         return pet_upgrade_in_progress
 
+    def pet_maxed_fact(self, pet_index):
+        # Max pet levels rise with the town hall, so maxed pets are only remembered per town hall level
+        return f"pet_maxed:{self.thl}:{pet_index}"
+
+    def unlocked_pet_count(self):
+        """The pets the Pet House can have unlocked at this town hall level, capped by the slots the pet menu probes."""
+        levels = [level for level in PETS_BY_TOWN_HALL if level <= self.thl]
+        unlocked = PETS_BY_TOWN_HALL[max(levels)] if levels else 0
+        return min(unlocked, 2 * len(self.pet_positions))
+
     def start_pet_upgrade(self):
+        pet_count = self.unlocked_pet_count()
+        if all(self.account_state.get(self.pet_maxed_fact(i)) for i in range(1, pet_count + 1)):
+            self.logger.info("[Pet] All pets are known to be maxed, skipping.")
+            return False
+
         self.reset_select()
         time.sleep(1)
         
@@ -1007,11 +1038,17 @@ class HomeBaseActions(BaseActions):
             # Loop through up to 4 pets
             for i, pos in enumerate(self.pet_positions):
                 self.logger.debug(f"current pet pos: {pos}")
+                current_pet_index = (page_idx * 4) + i + 1
+                if current_pet_index > pet_count:
+                    # Slots past the town hall's pets are locked
+                    break
+                if self.account_state.get(self.pet_maxed_fact(current_pet_index)):
+                    self.logger.debug(f"[Pet] Pet {current_pet_index} known to be maxed, skipping probe.")
+                    continue
+
                 if i == 2:
                     time.sleep(20)
                 
-                current_pet_index = (page_idx * 4) + i + 1
-                
                 # click specific pet to upgrade 
                 self.window_controller.execute_clicks(pos)
                 time.sleep(1)
@@ -1020,6 +1057,7 @@ class HomeBaseActions(BaseActions):
                 self.logger.debug(f"[Pet] Pet {current_pet_index} max level: {is_maxed}")
                 time.sleep(6)
                 if is_maxed:
+                    self.account_state.set(self.pet_maxed_fact(current_pet_index), True)
                     continue
                 pet_upgrade_available =  self.check_pet_upgrade()
                 self.logger.info(f"[Pet] Pet {current_pet_index} upgrade available: {pet_upgrade_available}")
@@ -1037,10 +1075,10 @@ class HomeBaseActions(BaseActions):
             
             # If we are here, we finished the loop for this page without returning.
             # Perform Drag if this is the first page
-            if page_idx == 0:
+            if page_idx == 0 and pet_count > len(self.pet_positions):
                  self.logger.info("[Pet] No upgrade found on Page 1. Dragging to Page 2.")
                  if self.pet_drag_coords:
-                     self.window_controller.drag_in_window(*self.pet_drag_coords)
+                     self.window_controller.drag_in_window(*self.pet_drag_coords, profile="pet_page")
                      time.sleep(1)
             
         self.logger.info("[Pet] No pet upgrade available after checking all pets.")
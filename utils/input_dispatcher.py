@@ -0,0 +1,130 @@
+import time
+
+import numpy as np
+
+from utils.settings import config, logger
+
+
+class ClickStep:
+    """
+    One click of a dispatched sequence.
+    :param delay: Longest wait after the click (the old fixed delay).
+    :param settle: Shortest wait after the click, even if the frame changes immediately.
+    :param watch_region: (x1, y1, x2, y2) expected to change after the click. None watches a box around the click.
+    :param expect_change: If False the step simply waits `delay`.
+    """
+
+    def __init__(self, x, y, delay=1.0, settle=None, watch_region=None, expect_change=True):
+        self.x = int(x)
+        self.y = int(y)
+        self.delay = delay
+        self.settle = settle
+        self.watch_region = watch_region
+        self.expect_change = expect_change
+
+
+class InputDispatcher:
+    """
+    Sends click sequences and, between steps, waits only until the expected frame change is observed
+    or the step's delay elapses. Each frame captured while waiting becomes the baseline for the next step,
+    so a sequence costs one capture up front plus the polls it actually needs.
+    """
+
+    def __init__(self, window_controller, logger_instance=None):
+        self.window_controller = window_controller
+        self.logger = logger_instance if logger_instance else logger
+        dispatch_cfg = config.get("InputDispatch", {})
+        self.enabled = dispatch_cfg.get("enabled", True)
+        self.watch_radius = dispatch_cfg.get("watch_radius", 0.05)
+        self.change_threshold = dispatch_cfg.get("change_threshold", 8.0)
+        self.poll_interval = dispatch_cfg.get("poll_interval", 0.05)
+        self.default_settle = dispatch_cfg.get("settle", 0.05)
+        self.last_latencies = []
+
+    @staticmethod
+    def steps_from_positions(positions, delay=1.0, settle=None, expect_change=True):
+        """Builds ClickSteps from [x, y] or [[x, y], ...] positions (same shapes execute_clicks accepts)."""
+        if len(positions) == 2 and isinstance(positions[0], (int, float)):
+            positions = [positions]
+        return [ClickStep(x, y, delay, settle, expect_change=expect_change) for x, y in positions]
+
+    def dispatch_positions(self, positions, delay=1.0, settle=None, expect_change=True, final_delay=None):
+        """
+        Dispatches clicks at positions with adaptive waits.
+        :param final_delay: Optional longer delay for the last click (replaces a trailing fixed sleep).
+        """
+        if len(positions) == 0:
+            self.logger.warning("No positions to dispatch clicks for")
+            return []
+        steps = self.steps_from_positions(positions, delay, settle, expect_change)
+        if final_delay is not None:
+            steps[-1].delay = final_delay
+        return self.dispatch(steps)
+
+    def _watch_box(self, step, frame):
+        h, w = frame.shape[:2]
+        if step.watch_region is not None:
+            x1, y1, x2, y2 = step.watch_region
+        else:
+            r = max(8, int(w * self.watch_radius))
+            x1, y1, x2, y2 = step.x - r, step.y - r, step.x + r, step.y + r
+        return max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+
+    def _changed(self, baseline, frame, box):
+        x1, y1, x2, y2 = box
+        if x2 <= x1 or y2 <= y1:
+            return False
+        before = baseline[y1:y2:2, x1:x2:2].astype(np.int16)
+        after = frame[y1:y2:2, x1:x2:2].astype(np.int16)
+        if before.shape != after.shape:
+            return True
+        return float(np.abs(after - before).mean()) >= self.change_threshold
+
+    def dispatch(self, steps):
+        """
+        Executes the steps and returns the measured latency per step as
+        [{'pos': (x, y), 'latency': seconds, 'changed': bool}, ...].
+        """
+        results = []
+        if not self.enabled:
+            for step in steps:
+                start = time.perf_counter()
+                self.window_controller.click_in_window(step.x, step.y)
+                time.sleep(step.delay)
+                results.append({'pos': (step.x, step.y), 'latency': time.perf_counter() - start, 'changed': False})
+            self.last_latencies = results
+            return results
+
+        baseline = self.window_controller.capture_frame() if any(s.expect_change for s in steps) else None
+        for step in steps:
+            start = time.perf_counter()
+            self.window_controller.click_in_window(step.x, step.y)
+
+            changed = False
+            if not step.expect_change or baseline is None:
+                time.sleep(step.delay)
+            else:
+                settle = self.default_settle if step.settle is None else step.settle
+                time.sleep(min(settle, step.delay))
+                box = self._watch_box(step, baseline)
+                frame = baseline
+                while True:
+                    frame = self.window_controller.capture_frame()
+                    if frame is None:
+                        time.sleep(max(0.0, step.delay - (time.perf_counter() - start)))
+                        break
+                    if self._changed(baseline, frame, box):
+                        changed = True
+                        break
+                    if time.perf_counter() - start >= step.delay:
+                        break
+                    time.sleep(self.poll_interval)
+                baseline = frame if frame is not None else baseline
+
+            results.append({'pos': (step.x, step.y), 'latency': time.perf_counter() - start, 'changed': changed})
+
+        total = sum(r['latency'] for r in results)
+        budget = sum(s.delay for s in steps)
+        self.logger.debug(f"[Dispatch] {len(results)} steps in {total:.2f}s (fixed delays {budget:.2f}s): {[round(r['latency'], 2) for r in results]}")
+        self.last_latencies = results
+        return results
@@ -0,0 +1,163 @@
+"""
+Append-only binary journal of every input message posted to the game.
+
+File layout: a 32 byte header followed by fixed 32 byte records, so a journal can be opened with
+numpy.memmap(path, dtype=RECORD_DTYPE, offset=HEADER_SIZE) while it is still being written.
+Call sites are stored once in a text sidecar (<journal>.sites), one "file:line function" per line;
+a record's `site` field is the line index.
+"""
+
+import atexit
+import os
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from utils.settings import config, logger
+
+MAGIC = b'CAIJ'
+VERSION = 1
+# magic, version, record size, wall clock at open, monotonic clock at open, padding
+HEADER_FORMAT = '<4sHHdd8x'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+RECORD_FORMAT = '<dQIIhhHH'
+RECORD_DTYPE = np.dtype([
+    ('t', '<f8'),       # time.monotonic() when the message was posted
+    ('hwnd', '<u8'),    # target window handle
+    ('msg', '<u4'),     # window message (WM_LBUTTONDOWN, WM_MOUSEMOVE, WM_MOUSEWHEEL, ...)
+    ('wparam', '<u4'),
+    ('x', '<i2'),       # client coordinates unpacked from lparam
+    ('y', '<i2'),
+    ('site', '<u2'),    # line index in the .sites sidecar
+    ('flags', '<u2'),   # 1 = replayed event
+])
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+assert RECORD_SIZE == RECORD_DTYPE.itemsize and HEADER_SIZE == 32
+
+FLAG_REPLAY = 1
+
+# Frames from these modules are input plumbing, not call sites
+_PLUMBING_FILES = ('game_window_controller.py', 'input_journal.py')
+
+
+class InputJournal:
+    """
+    Writes journal records through a buffered append-only file. Records are flushed every flush_every events
+    and on exit, so analysis of a live journal may lag by up to one buffer.
+    """
+    _shared = None
+
+    def __init__(self, path, flush_every=256):
+        self.path = path
+        self.flush_every = flush_every
+        self.sites = {}
+        self.pending = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, RECORD_SIZE, time.time(), time.monotonic()))
+        self.sites_file = open(path + '.sites', 'a+')
+        self.sites_file.seek(0)
+        for index, line in enumerate(self.sites_file.read().splitlines()):
+            self.sites[line] = index
+        atexit.register(self.close)
+
+    @classmethod
+    def shared(cls):
+        """Returns the session journal, or None when [InputJournal] is disabled."""
+        journal_cfg = config.get("InputJournal", {})
+        if not journal_cfg.get("enabled", False):
+            return None
+        if cls._shared is None:
+            directory = journal_cfg.get("directory", os.path.join('data', 'journal'))
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            path = os.path.join(directory, f'input_{timestamp}.bin')
+            cls._shared = cls(path, journal_cfg.get("flush_every", 256))
+            logger.info(f"[Input Journal] Recording input events to {path}")
+        return cls._shared
+
+    def _site_index(self, site):
+        index = self.sites.get(site)
+        if index is None:
+            index = len(self.sites)
+            self.sites[site] = index
+            self.sites_file.write(site + '\n')
+            self.sites_file.flush()
+        return index
+
+    @staticmethod
+    def call_site():
+        """First frame outside the input plumbing, as 'file:line function'."""
+        frame = sys._getframe(2)
+        while frame is not None and os.path.basename(frame.f_code.co_filename) in _PLUMBING_FILES:
+            frame = frame.f_back
+        if frame is None:
+            return 'unknown'
+        return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+    def record(self, hwnd, msg, wparam, lparam, site=None, flags=0):
+        x = lparam & 0xFFFF
+        y = (lparam >> 16) & 0xFFFF
+        with self.lock:
+            if self.file.closed:
+                return
+            index = self._site_index(site if site else self.call_site())
+            self.file.write(struct.pack(
+                RECORD_FORMAT, time.monotonic(), int(hwnd), int(msg), int(wparam or 0) & 0xFFFFFFFF,
+                x - 0x10000 if x >= 0x8000 else x, y - 0x10000 if y >= 0x8000 else y, index & 0xFFFF, flags,
+            ))
+            self.pending += 1
+            if self.pending >= self.flush_every:
+                self.file.flush()
+                self.pending = 0
+
+    def flush(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.flush()
+                self.pending = 0
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+            if not self.sites_file.closed:
+                self.sites_file.close()
+
+
+def read_header(path):
+    """Returns {'version', 'record_size', 'wall_start', 'mono_start'} for a journal file."""
+    with open(path, 'rb') as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise ValueError(f"{path} is too short to be an input journal")
+    magic, version, record_size, wall_start, mono_start = struct.unpack(HEADER_FORMAT, raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not an input journal")
+    if record_size != RECORD_SIZE:
+        raise ValueError(f"{path} has {record_size} byte records, expected {RECORD_SIZE}")
+    return {'version': version, 'record_size': record_size, 'wall_start': wall_start, 'mono_start': mono_start}
+
+
+def load_journal(path):
+    """Memory-maps the journal records (a partially written trailing record is ignored)."""
+    read_header(path)
+    count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_SIZE
+    if count <= 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+
+def load_sites(path):
+    sites_path = path + '.sites'
+    if not os.path.exists(sites_path):
+        return []
+    with open(sites_path, 'r') as f:
+        return f.read().splitlines()
@@ -0,0 +1,76 @@
+"""
+Read-only layered config views.
+A base's config is its own overrides on top of the shared, scaled static config. Instead of deep-copying the
+static config for every account and merging the overrides into the copy, LayeredConfig looks keys up through
+the layers, so each base holds only what its own file defines.
+"""
+
+from collections.abc import Mapping
+
+
+class LayeredConfig(Mapping):
+    """
+    Mapping over config layers, the first layer taking precedence (like collections.ChainMap). A key whose value
+    is a mapping in consecutive layers resolves to a nested LayeredConfig over those mappings, so overrides merge
+    per key at every depth; lists and scalars from a higher layer replace the lower value entirely.
+    Values are the layers' own objects and must not be modified.
+    """
+
+    def __init__(self, *layers):
+        self.layers = [layer for layer in layers if layer is not None]
+        # Nested views are kept so repeated lookups return the same object: {key: (layer ids, view)}
+        self.children = {}
+
+    def __getitem__(self, key):
+        found = [layer[key] for layer in self.layers if key in layer]
+        if not found:
+            raise KeyError(key)
+        if not isinstance(found[0], Mapping):
+            return found[0]
+
+        mappings = []
+        for value in found:
+            # A list or scalar in a lower layer is shadowed, along with everything below it
+            if not isinstance(value, Mapping):
+                break
+            mappings.append(value)
+        if len(mappings) == 1:
+            return mappings[0]
+        # A layer may be a live view (settings.config) whose sections are replaced by a reload
+        identity = tuple(id(mapping) for mapping in mappings)
+        cached = self.children.get(key)
+        if cached is not None and cached[0] == identity:
+            return cached[1]
+        child = LayeredConfig(*mappings)
+        self.children[key] = (identity, child)
+        return child
+
+    def __contains__(self, key):
+        return any(key in layer for layer in self.layers)
+
+    def __iter__(self):
+        # Lower layer keys first, the order a deep merge into the lower layer produces
+        seen = set()
+        for layer in reversed(self.layers):
+            for key in layer:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        return len(set().union(*self.layers)) if self.layers else 0
+
+    def to_dict(self):
+        """The merged config as plain, independent dicts."""
+        return {key: value.to_dict() if isinstance(value, LayeredConfig) else _copy_value(value) for key, value in self.items()}
+
+    def __repr__(self):
+        return f"LayeredConfig({len(self.layers)} layers, {len(self)} keys)"
+
+
+def _copy_value(value):
+    if isinstance(value, Mapping):
+        return {key: _copy_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_value(item) for item in value]
+    return value
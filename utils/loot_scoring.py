@@ -0,0 +1,91 @@
+"""
+Scoring of scouted enemy bases and the acceptance policy used by HomeBaseActions.find_enemy_base.
+Loot is passed around as {'gold': int, 'elixir': int, 'dark': int}; missing keys count as 0.
+"""
+
+from utils.settings import config, logger
+
+RESOURCES = ("gold", "elixir", "dark")
+
+_SCORERS = {}
+
+
+def register_scorer(name):
+    """Registers a scorer(loot, weights) -> float under name, selectable with [LootScoring] scorer."""
+    def decorator(fn):
+        _SCORERS[name] = fn
+        return fn
+    return decorator
+
+
+@register_scorer("weighted")
+def weighted_score(loot, weights):
+    """Sum of each resource times its weight (dark elixir is worth far more per unit than gold or elixir)."""
+    return float(sum(weights.get(r, 0) * (loot.get(r) or 0) for r in RESOURCES))
+
+
+@register_scorer("legacy")
+def legacy_score(loot, weights):
+    """Plain gold + elixir, the original acceptance rule."""
+    return float((loot.get("gold") or 0) + (loot.get("elixir") or 0))
+
+
+class LootPolicy:
+    """
+    Decides whether a scouted base is worth attacking.
+    Weights come from [LootScoring], multiplied by per-resource need multipliers (upgrade targets) and zeroed for
+    resources whose storage is already full. The acceptance bar starts at the score of the configured thresholds and
+    halves every half_life seconds of searching (never below min_fraction of the start), trading a rare jackpot base
+    for more loot per minute. A base whose read counters cannot reach the bar even if every unread counter holds
+    its maximum is rejected before the rest are read (upper_bound).
+    """
+
+    def __init__(self, thresholds, storage_maxed=None, logger_instance=None):
+        self.logger = logger_instance if logger_instance else logger
+        scoring_cfg = config.get("LootScoring", {})
+        name = scoring_cfg.get("scorer", "weighted")
+        if name not in _SCORERS:
+            self.logger.warning(f"[Loot Scoring] Unknown scorer '{name}', using 'weighted'")
+            name = "weighted"
+        self.scorer_name = name
+        self.scorer = _SCORERS[name]
+
+        base_weights = scoring_cfg.get("weights", {})
+        needs = scoring_cfg.get("need_multipliers", {})
+        if name == "legacy":
+            self.weights = {"gold": 1.0, "elixir": 1.0, "dark": 0.0}
+        else:
+            defaults = {"gold": 1.0, "elixir": 1.0, "dark": 75.0}
+            self.weights = {r: float(base_weights.get(r, defaults[r])) * float(needs.get(r, 1.0)) for r in RESOURCES}
+            for r, maxed in zip(RESOURCES, storage_maxed or ()):
+                if maxed:
+                    self.weights[r] = 0.0
+
+        self.thresholds = dict(thresholds)
+        self.start_bar = self.scorer(self.thresholds, self.weights)
+        self.half_life = scoring_cfg.get("half_life", 120)
+        self.min_fraction = scoring_cfg.get("min_fraction", 0.5)
+
+    @property
+    def relevant(self):
+        """Resources that contribute to the score, most discriminating (largest weighted threshold) first."""
+        used = [r for r in RESOURCES if self.weights.get(r, 0) > 0]
+        return sorted(used, key=lambda r: self.weights[r] * self.thresholds.get(r, 0), reverse=True)
+
+    def score(self, loot):
+        return self.scorer(loot, self.weights)
+
+    def decay(self, elapsed):
+        """Fraction of the starting bar still required after elapsed seconds of searching."""
+        if not self.half_life or self.half_life <= 0:
+            return 1.0
+        return max(self.min_fraction, 0.5 ** (elapsed / self.half_life))
+
+    def bar(self, elapsed):
+        """Acceptance bar after elapsed seconds of searching."""
+        return self.start_bar * self.decay(elapsed)
+
+    def upper_bound(self, values, max_values):
+        """Best possible score given the counters read so far and the maximum of every unread one."""
+        loot = {r: values[r] if values.get(r) is not None else max_values.get(r, 0) for r in RESOURCES}
+        return self.score(loot)
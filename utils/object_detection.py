@@ -4,7 +4,6 @@ import re
 
 import cv2
 import numpy as np
-import pytesseract
 
 # Setup Logging
 from utils.settings import config, logger
@@ -37,6 +36,21 @@ def determine_base_location(image_path):
         logger.error(f"Failed to load image for base determination: {image_path}")
         return False, False
 
+    is_builder_base, is_home_base = classify_base_location(img_cv)
+    x, y = config["ObjectDetectionCoordinates"]["base_determination_check_pos"]
+
+    annotated_img = img_cv.copy()
+    color = (0, 255, 0) if is_builder_base or is_home_base else (0, 0, 255)
+    cv2.rectangle(annotated_img, (x-1, y-1), (x+1, y+1), color, 1)
+    
+    VisionUtils.save_annotated_image(annotated_img, image_path, f"_point_{x}_{y}_annotated.png")
+    return is_builder_base, is_home_base
+
+def classify_base_location(img_cv):
+    """
+    Classifies an already-loaded frame as builder base and/or home base from the base determination pixel.
+    Returns (is_builder_base, is_home_base).
+    """
     h, w, _ = img_cv.shape
     # Check pixel at 1669, 149. Ensure image is large enough.
     x, y = config["ObjectDetectionCoordinates"]["base_determination_check_pos"]
@@ -79,11 +93,6 @@ def determine_base_location(image_path):
     else:
         logger.debug(f"Did not match any base target. (Builder Targets (RGB): {[c[::-1] for c in builder_base_bgr_list]}, Home Targets (RGB): {[c[::-1] for c in home_base_bgr_list]})")
 
-    annotated_img = img_cv.copy()
-    color = (0, 255, 0) if is_builder_base or is_home_base else (0, 0, 255)
-    cv2.rectangle(annotated_img, (x-1, y-1), (x+1, y+1), color, 1)
-    
-    VisionUtils.save_annotated_image(annotated_img, image_path, f"_point_{x}_{y}_annotated.png")
     return is_builder_base, is_home_base
 
 def annotate_coords_on_image(image_path, coords, box_size=10, color=(0, 255, 255), output_suffix='_coords_annotated.png'):
@@ -125,27 +134,33 @@ def detect_reload_screen(image_path):
 
 """ ----------------------------- Home Base Functions ----------------------------- """
 
-def extract_resources_from_image(image_path):
-    img_cv = VisionUtils.load_image(image_path)
-    annotated_img = img_cv.copy()
-    
-    regions = [
+def enemy_loot_regions():
+    return [
         config["ObjectDetectionCoordinates"]["resource_collection_regions_gold"],
         config["ObjectDetectionCoordinates"]["resource_collection_regions_elixir"],
         config["ObjectDetectionCoordinates"]["resource_collection_regions_dark"]
     ]
+
+def read_loot_value(img_cv, region):
+    """OCRs one loot counter of an already-loaded image. Unreadable counters read as 0."""
+    text = VisionUtils.extract_text_from_region(img_cv, region)
+    numbers = VisionUtils.extract_numbers(text)
+    return int(''.join(numbers)) if numbers else 0
+
+def read_loot_from_frame(img_cv):
+    """(gold, elixir, dark_elixir) loot counters of an in-memory frame (scouting or in-battle available loot)."""
+    return tuple(read_loot_value(img_cv, region) for region in enemy_loot_regions())
+
+def extract_resources_from_image(image_path):
+    img_cv = VisionUtils.load_image(image_path)
+    annotated_img = img_cv.copy()
     
-    results = []
-    for (x1, y1, x2, y2) in regions:
+    for (x1, y1, x2, y2) in enemy_loot_regions():
         VisionUtils.draw_region(annotated_img, (x1, y1, x2, y2), (0, 0, 255))
-        text = VisionUtils.extract_text_from_region(img_cv, (x1, y1, x2, y2))
-        numbers = VisionUtils.extract_numbers(text)
-        
-        combined_val = int(''.join(numbers)) if numbers else 0
-        results.append(combined_val)
+    results = read_loot_from_frame(img_cv)
 
     VisionUtils.save_annotated_image(annotated_img, image_path, "_annotated.png")
-    return tuple(results)
+    return results
 
 def extract_builders_available_from_image(image_path):
     img_cv = VisionUtils.load_image(image_path)
@@ -472,7 +487,7 @@ def detect_word_in_region(image_path, target_word, x1, y1, x2, y2, text_color='w
         gray = cv2.cvtColor(upscaled, cv2.COLOR_BGR2GRAY)
         gray = cv2.bilateralFilter(gray, 7, 50, 50)
 
-    data = pytesseract.image_to_data(gray, config='--oem 3 --psm 6', output_type=pytesseract.Output.DICT)
+    data = VisionUtils.ocr_data(gray, config='--oem 3 --psm 6')
     
     found = []
     annotated_img = img_cv.copy()
@@ -786,7 +801,7 @@ def detect_play_store_update_screen(image_path):
     up = cv2.resize(img_cv, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
     gray = cv2.cvtColor(up, cv2.COLOR_BGR2GRAY)
     
-    data = pytesseract.image_to_data(gray, config='--oem 3 --psm 6', output_type=pytesseract.Output.DICT)
+    data = VisionUtils.ocr_data(gray, config='--oem 3 --psm 6')
     words = [w.lower() for w in data.get('text', [])]
     
     has_update_avail = 'update available' in ' '.join(words)
@@ -825,13 +840,15 @@ def check_for_gold_warning(image_path):
     
     return is_gold
 
-def detect_first_army_tile(image_path):
+def detect_first_army_tile(image_path, img_cv=None):
     """
     Detects the FIRST (leftmost) army tile in the bottom section using Black Outline detection.
     Returns the (center_x, center_y, std_rect) of the tile.
+    Pass img_cv to reuse an already loaded screenshot.
     """
     try:
-        img_cv = VisionUtils.load_image(image_path)
+        if img_cv is None:
+            img_cv = VisionUtils.load_image(image_path)
         if img_cv is None:
             return None
 
@@ -861,7 +878,8 @@ def detect_first_army_tile(image_path):
         cv2.line(edges, (0, edges.shape[0]-1), (edges.shape[1], edges.shape[0]-1), 255, 3) # Bottom seal
 
         # Debug: Save edges
-        cv2.imwrite(image_path.replace('.png', '_debug_canny_edges.png'), edges)
+        if logger.isEnabledFor(10):
+            cv2.imwrite(image_path.replace('.png', '_debug_canny_edges.png'), edges)
         
         # --- 2. Contour Extraction ---
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -925,7 +943,8 @@ def detect_first_army_tile(image_path):
                     'index': i,
                     'cnt': cnt,
                     'x': x, 'y': y, 'w': rw, 'h': rh,
-                    'roi_y': y
+                    'roi_y': y,
+                    'global_y': global_y_check
                 })
                 # VISUALIZATION
                 cv2.rectangle(annotated_img, (x, y), (x + rw, y + rh), (0, 255, 0), 2)
@@ -983,7 +1002,7 @@ def detect_first_army_tile(image_path):
             cv2.rectangle(annotated_img, (lx, ly), (lx + lw, ly + lh), (255, 0, 255), 3)
             cv2.putText(annotated_img, f"WIN {lw}x{lh}", (lx, ly - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 255), 2)
             
-            if True: # change this to a config flag if desired
+            if logger.isEnabledFor(10):
                 debug_path = image_path.replace('.png', '_detected_first_tile.png')
                 cv2.imwrite(debug_path, annotated_img)
             
@@ -991,15 +1010,211 @@ def detect_first_army_tile(image_path):
             
         else:
             logger.warning("[Object Detection] No valid army tile candidates found after edge detection.")
-            debug_path = image_path.replace('.png', '_detected_first_tile.png')
-            cv2.imwrite(debug_path, annotated_img)
-            logger.info(f"[Object Detection] Saved rejected contours debug image to: {debug_path}")
+            if logger.isEnabledFor(10):
+                debug_path = image_path.replace('.png', '_detected_first_tile.png')
+                cv2.imwrite(debug_path, annotated_img)
+                logger.debug(f"[Object Detection] Saved rejected contours debug image to: {debug_path}")
             return None
 
     except Exception as e:
         logger.error(f"Error in detect_first_army_tile: {e}")
         return None
 
+def detect_army_tiles_projection(image_path, img_cv=None):
+    """
+    Detects EVERY army tile in the bottom bar from row and column projections of the dark tile outlines.
+    One dark-pixel mask is built for the bar strip; its row profile gives the tile band and its column
+    profile (inside the band) gives the vertical borders, which are paired into tile rectangles.
+    Returns (center_x, center_y, std_rect, tiles) like detect_first_army_tile, with tiles sorted left to right.
+    """
+    try:
+        if img_cv is None:
+            img_cv = VisionUtils.load_image(image_path)
+        if img_cv is None:
+            return None
+
+        h_img, w_img = img_cv.shape[:2]
+
+        # --- ROI SELECTION (same conventions as detect_first_army_tile) ---
+        if h_img < 400:
+            roi_top = 0
+            simulated_h = 1080.0 * (w_img / 1728.0)
+        else:
+            roi_top = int(h_img * 0.75)
+            simulated_h = h_img
+        roi = img_cv[roi_top:h_img, 0:w_img]
+
+        tile_cfg = config["TileDetection"]
+        target_w = int(w_img * tile_cfg["target_w"])
+        target_h = int(simulated_h * tile_cfg["target_h"])
+        min_w = int(int(w_img * tile_cfg["min_w"]) * 0.8)
+        max_w = int(w_img * tile_cfg["max_w"])
+        min_h = int(int(simulated_h * tile_cfg["min_h"]) * 0.70)
+        min_y_pos = int(simulated_h * tile_cfg["min_y_pos"])
+        dark_threshold = tile_cfg.get("projection_dark_threshold", 60)
+        row_fraction = tile_cfg.get("projection_row_fraction", 0.5)
+        col_fraction = tile_cfg.get("projection_col_fraction", 0.6)
+
+        # --- 1. Dark mask and row projection ---
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        dark = gray < dark_threshold
+        row_profile = dark.mean(axis=1)
+
+        # Only rows at or below the expected bar position can hold tile borders
+        first_row = 0 if h_img < 400 else max(0, (min_y_pos - 50) - roi_top)
+        row_profile[:first_row] = 0
+        if row_profile.max() <= 0:
+            logger.warning("[Projection Tiles] No dark outline rows found in the army bar strip.")
+            return None
+        border_rows = np.flatnonzero(row_profile >= row_profile.max() * row_fraction)
+        band_top, band_bottom = int(border_rows[0]), int(border_rows[-1])
+        if band_bottom - band_top + 1 < min_h:
+            # Only one horizontal border was found; assume a full tile below it
+            band_bottom = min(roi.shape[0] - 1, band_top + target_h - 1)
+
+        # --- 2. Column projection inside the band ---
+        col_profile = dark[band_top:band_bottom + 1].mean(axis=0)
+        is_edge = col_profile >= col_fraction
+        # The first tile usually rests against the left screen boundary, whose border is not drawn
+        if not is_edge[:max(1, min_w // 4)].any():
+            is_edge[0] = True
+        changes = np.flatnonzero(np.diff(np.concatenate(([0], is_edge.astype(np.int8), [0]))))
+        runs = list(zip(changes[0::2], changes[1::2] - 1))
+
+        # --- 3. Pair vertical edges into tiles ---
+        def pair_from(i):
+            for j in range(i + 1, len(runs)):
+                width = runs[j][1] - runs[i][0] + 1
+                if width > max_w:
+                    return None
+                if width >= min_w:
+                    return j
+            return None
+
+        tiles = []
+        i = 0
+        while i < len(runs):
+            j = pair_from(i)
+            if j is None:
+                i += 1
+                continue
+            x = int(runs[i][0])
+            w = int(runs[j][1] - runs[i][0] + 1)
+            h = int(band_bottom - band_top + 1)
+            tiles.append({
+                'x': x, 'y': band_top, 'w': w, 'h': h,
+                'roi_y': band_top,
+                'global_y': roi_top + band_top
+            })
+            # Prefer the next edge as the following tile's left border, otherwise share this one
+            i = j + 1 if pair_from(j + 1) is not None or j + 1 >= len(runs) else j
+
+        if not tiles:
+            logger.warning("[Projection Tiles] No tile candidates found from edge projections.")
+            return None
+
+        leftmost = tiles[0]
+        global_h = target_h if leftmost['h'] < (target_h * 0.9) else leftmost['h']
+        cx = leftmost['x'] + leftmost['w'] // 2
+        cy = leftmost['global_y'] + global_h // 2
+        std_rect = (cx - (target_w // 2), cy - (target_h // 2), target_w, target_h)
+        logger.info(f"[Projection Tiles] {len(tiles)} tiles detected. Leftmost center: ({cx}, {cy})")
+
+        if logger.isEnabledFor(10):
+            annotated_img = roi.copy()
+            for t in tiles:
+                cv2.rectangle(annotated_img, (t['x'], t['y']), (t['x'] + t['w'], t['y'] + t['h']), (0, 255, 0), 2)
+            cv2.imwrite(image_path.replace('.png', '_projection_tiles.png'), annotated_img)
+
+        return (cx, cy, std_rect, tiles)
+
+    except Exception as e:
+        logger.error(f"Error in detect_army_tiles_projection: {e}")
+        return None
+
+def detect_army_tiles(image_path, img_cv=None):
+    """
+    Runs the army tile detector selected by [TileDetection] method ("contour" or "projection").
+    """
+    method = config["TileDetection"].get("method", "contour")
+    if method == "projection":
+        return detect_army_tiles_projection(image_path, img_cv)
+    return detect_first_army_tile(image_path, img_cv)
+
+def validate_army_tile_layout(img_cv, tiles, max_tiles=3):
+    """
+    Cheaply re-validates a cached army-bar layout by probing the dark outline on the left, right and top border
+    of the tiles placement relies on: the first few (the phase 1 anchor) and the last one (the phase 2 anchor).
+    Each probe compares the darkest pixel around the border against a pixel inside the tile.
+    Returns True when enough probes still see a border where the cached layout expects one and no tile starts one
+    pitch after the last cached tile (a bar shifted by a whole tile would otherwise still match). That last check
+    only runs when a whole tile fits there: the detectors drop the tile clipped at the frame edge, so an army that
+    overflows the screen always has a border one pitch after its last detected tile.
+    """
+    if img_cv is None or not tiles:
+        return False
+
+    tile_cfg = config["TileDetection"]
+    min_contrast = tile_cfg.get("probe_min_contrast", 35)
+    pass_ratio = tile_cfg.get("probe_pass_ratio", 0.75)
+    h_img, w_img = img_cv.shape[:2]
+
+    def gray_at(x, y):
+        b, g, r = img_cv[y, x][:3]
+        return 0.114 * b + 0.587 * g + 0.299 * r
+
+    def border_contrast(edge_points, inside_point):
+        ix, iy = inside_point
+        if not (0 <= ix < w_img and 0 <= iy < h_img):
+            return None
+        values = [gray_at(x, y) for x, y in edge_points if 0 <= x < w_img and 0 <= y < h_img]
+        if not values:
+            return None
+        return gray_at(ix, iy) - min(values)
+
+    probes = 0
+    passed = 0
+    probed = tiles[:max_tiles] + (tiles[-1:] if len(tiles) > max_tiles else [])
+    for tile in probed:
+        x, y, w, h = tile['x'], tile['global_y'], tile['w'], tile['h']
+        inset_x = max(4, w // 8)
+        inset_y = max(4, h // 8)
+        mid_x = x + w // 2
+        mid_y = y + h // 2
+        checks = [
+            # Left border
+            ([(x + dx, mid_y) for dx in (-1, 0, 1, 2)], (x + inset_x, mid_y)),
+            # Right border
+            ([(x + w + dx, mid_y) for dx in (-2, -1, 0, 1)], (x + w - inset_x, mid_y)),
+            # Top border
+            ([(mid_x, y + dy) for dy in (-1, 0, 1, 2)], (mid_x, y + inset_y)),
+        ]
+        for edge_points, inside_point in checks:
+            contrast = border_contrast(edge_points, inside_point)
+            if contrast is None:
+                continue
+            probes += 1
+            if contrast >= min_contrast:
+                passed += 1
+
+    if probes == 0:
+        return False
+    ok = passed / probes >= pass_ratio
+
+    # Nothing may start where the next tile after the cached last one would be, if a whole one fits there
+    last = tiles[-1]
+    pitch = last['x'] - tiles[-2]['x'] if len(tiles) > 1 else last['w'] + max(4, last['w'] // 8)
+    next_x = last['x'] + pitch
+    extra = None
+    if next_x + last['w'] <= w_img:
+        extra = border_contrast([(next_x + dx, last['global_y'] + last['h'] // 2) for dx in (-1, 0, 1, 2)],
+                                (next_x + max(4, last['w'] // 8), last['global_y'] + last['h'] // 2))
+    if ok and extra is not None and extra >= min_contrast:
+        logger.debug("[Tile Validation] A tile border follows the cached last tile -> stale")
+        ok = False
+    logger.debug(f"[Tile Validation] {passed}/{probes} border probes passed (min contrast {min_contrast}) -> {'valid' if ok else 'stale'}")
+    return ok
+
 
 
 def gold_pass_trigger(image_path):
@@ -1081,11 +1296,11 @@ def detect_pet_button_with_mask(image_path, logger_instance=None):
     
     # OCR on the mask (black background, white text)
     ocr_config = '--oem 3 --psm 6'
-    raw_text_masked = pytesseract.image_to_string(mask, config=ocr_config).strip()
+    raw_text_masked = VisionUtils.ocr_string(mask, config=ocr_config).strip()
     log.info(f"[Pet OCR] Masked Pass - Raw detect: '{raw_text_masked}'")
     
     # Use image_to_data with SAME config to get bounding boxes
-    data = pytesseract.image_to_data(mask, output_type=pytesseract.Output.DICT, config=ocr_config)
+    data = VisionUtils.ocr_data(mask, config=ocr_config)
     
     found_coords = None
     all_found_texts = [w.strip() for w in data['text'] if w.strip()]
@@ -1110,10 +1325,10 @@ def detect_pet_button_with_mask(image_path, logger_instance=None):
     # FALLBACK 2: Try Grayscale ROI if still nothing
     if not found_coords:
         log.debug("[Pet OCR] Attempting Grayscale Fallback...")
-        raw_text_gray = pytesseract.image_to_string(gray_roi, config=ocr_config).strip()
+        raw_text_gray = VisionUtils.ocr_string(gray_roi, config=ocr_config).strip()
         log.info(f"[Pet OCR] Gray Fallback - Raw detect: '{raw_text_gray}'")
         
-        data_gray = pytesseract.image_to_data(gray_roi, output_type=pytesseract.Output.DICT, config=ocr_config)
+        data_gray = VisionUtils.ocr_data(gray_roi, config=ocr_config)
         all_gray_texts = [w.strip() for w in data_gray['text'] if w.strip()]
         log.info(f"[Pet OCR] Gray Fallback - Words: {all_gray_texts}")
         
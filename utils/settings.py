@@ -1,7 +1,9 @@
+import copy
 import ctypes
 import re
+import threading
+from collections.abc import Mapping
 from pathlib import Path
-from typing import Dict, Tuple
 
 import toml
 
@@ -10,12 +12,13 @@ try:
 except ImportError:
     win32gui = None
 
+from utils import config_cache, coords
 from utils.logger import Logger
 
 # Setup Logging
 logger = Logger().get_logger()
 
-config = dict  # autocomplete
+_MISSING = object()
 
 COORD_SECTIONS = [
     "HomeBaseStaticClickPositions",
@@ -28,7 +31,7 @@ COORD_SECTIONS = [
 ]
 
 SPECIFIC_CONVERSIONS = {
-    "HomeBaseGeneral": ["special_troop_drop"]
+    "HomeBaseGeneral": ["special_troop_drop"],
 }
 
 SCALAR_Y_KEYS = [
@@ -122,6 +125,10 @@ def scale_value_recursive(val, w, h, is_y_scalar=False, is_x_scalar=False):
         return val # Should usually be inside list for coords, but if lone scalar, leave as is unless scalar flag set
     
     if isinstance(val, list):
+        if val and len(val) % 2 == 0 and all(isinstance(item, (int, float)) for item in val):
+            # [x, y] / [x1, y1, x2, y2]: kept normalized so a window resize can re-resolve it
+            transform = coords.transform_for(w, h)
+            return coords.Region(val, transform) if len(val) == 4 else coords.Coord(val, transform)
         new_list = []
         for i, item in enumerate(val):
             if isinstance(item, list):
@@ -333,13 +340,11 @@ def crawl_and_check(obj: dict, path: list, checks: dict = {}, name=""):
     return obj
 
 
-def check_vars(path, checks):
-    global config
-    crawl_and_check(config, path, checks)
-
-
-def check_toml(template_file, config_file) -> Tuple[bool, Dict]:
-    global config, check_vars
+def check_toml(template_file, config_file):
+    """
+    Loads config_file and prompts for every value of template_file that is missing or invalid, then writes the
+    completed config back. Returns the config, or False when it could not be read or written.
+    """
     config = None
 
     # attempt to load template file
@@ -364,6 +369,7 @@ def check_toml(template_file, config_file) -> Tuple[bool, Dict]:
             try:
                 with open(config_file, "w") as f:
                     f.write("")
+                config = {}
             except:
                 logger.error(
                     f"Failed to overwrite {config_file}. Giving up.\nSuggestion: check {config_file} permissions for the user."
@@ -384,70 +390,223 @@ def check_toml(template_file, config_file) -> Tuple[bool, Dict]:
 
     logger.debug("Checking TOML configuration...")
 
-    crawl(template, check_vars)
+    crawl(template, lambda path, checks: crawl_and_check(config, path, checks))
     with open(config_file, "w") as f:
         toml.dump(config, f)
     return config
 
 
 directory = Path(__file__).resolve().parent.parent
-check_toml(directory / "config.template.toml", directory / "config.toml")
-
-# Load static config
+config_template_path = directory / "config.template.toml"
+config_path = directory / "config.toml"
 # test_static_config_path = directory / "utils" / "baseconfig" / "test_static_config.toml"
 static_config_path = directory / "utils" / "baseconfig" / "static_config.toml"
 
 
+def scale_section(section_name, section_data, w, h):
+    """
+    Scales one config section from percentage values to pixels, in place, and returns it. Coordinates become
+    coords.Coord/Region lists; a section with step sizes is returned as a coords.ScaledSection. Sections that hold
+    no coordinates are left untouched.
+    """
+    # Heuristic: if section name ends with "Attacks" or contains coordinates, scale it.
+    # Checking against known sections from baseconfig and static_config
+    if section_name.endswith("Attacks") or section_name.endswith("Positions") or section_name in COORD_SECTIONS or section_name in ["HomeBaseAttacks", "BuilderBaseAttacks", "HomeBaseDynamicClickPositions", "BuilderBaseDynamicClickPositions"]:
+         if isinstance(section_data, dict):
+             lengths = {}
+             for key, value in section_data.items():
+                 is_y = (key in SCALAR_Y_KEYS)
+                 is_x = (key in SCALAR_X_KEYS)
+                 if (is_y or is_x) and isinstance(value, (int, float)):
+                     lengths[key] = (value, 1 if is_y else 0)
+                     continue
+                 section_data[key] = scale_value_recursive(value, w, h, is_y_scalar=is_y, is_x_scalar=is_x)
+             if lengths:
+                 # Step sizes are resolved by the section itself so they follow the client size too
+                 return coords.ScaledSection(section_data, lengths, coords.transform_for(w, h))
+    elif section_name in SPECIFIC_CONVERSIONS:
+        for key in SPECIFIC_CONVERSIONS[section_name]:
+             if key in section_data:
+                  section_data[key] = scale_value_recursive(section_data[key], w, h)
+    return section_data
+
+
 def scale_config(conf, w, h):
     """
     Recursively scales a configuration dictionary from percentage values to pixels.
     Mutates the dictionary in-place.
     """
     for section_name, section_data in conf.items():
-        # Heuristic: if section name ends with "Attacks" or contains coordinates, scale it.
-        # Checking against known sections from baseconfig and static_config
-        if section_name.endswith("Attacks") or section_name.endswith("Positions") or section_name in COORD_SECTIONS or section_name in ["HomeBaseAttacks", "BuilderBaseAttacks", "HomeBaseDynamicClickPositions", "BuilderBaseDynamicClickPositions"]:
-             if isinstance(section_data, dict):
-                 for key, value in section_data.items():
-                     is_y = (key in SCALAR_Y_KEYS)
-                     is_x = (key in SCALAR_X_KEYS)
-                     conf[section_name][key] = scale_value_recursive(value, w, h, is_y_scalar=is_y, is_x_scalar=is_x)
-        elif section_name in SPECIFIC_CONVERSIONS:
-            for key in SPECIFIC_CONVERSIONS[section_name]:
-                 if key in section_data:
-                      conf[section_name][key] = scale_value_recursive(section_data[key], w, h)
-
-# Decision logic: static_config.toml is now percentage-based
-if static_config_path.exists():
-    try:
-        static_conf = toml.load(static_config_path)
-        logger.debug(f"Loaded config from {static_config_path}")
-        
+        conf[section_name] = scale_section(section_name, section_data, w, h)
+
+
+class Settings(Mapping):
+    """
+    The user config (config.toml) merged with the static config (static_config.toml) scaled to one resolution.
+    Creating or importing it does no work: the files are read by load(), and each section is scaled and merged
+    the first time it is looked up. Values from static_config.toml take precedence, as they always have.
+    The compiled result is cached per resolution (see config_cache), so unchanged files are not parsed again.
+    """
+    _current = None
+    _load_lock = threading.RLock()
+
+    def __init__(self, user_conf, static_conf, resolution, sections=None):
+        self.user_conf = user_conf
+        self.static_conf = static_conf
+        self.resolution = resolution
+        self.sections = dict(sections) if sections else {}
+        self.lock = threading.Lock()
+        # Same order a deep_merge of the two files produces
+        self.names = list(user_conf) + [name for name in static_conf if name not in user_conf]
+
+    @classmethod
+    def load(cls, resolution=None, check=True):
+        """
+        Reads the config files and makes the result the config every module sees through utils.settings.config.
+        :param resolution: (width, height) to scale coordinates to; the game window's client size when None.
+        :param check: Validate config.toml against config.template.toml, prompting for missing values. Pass False
+                      in worker processes and tools that must not block on input().
+        """
+        with cls._load_lock:
+            return cls._load(resolution, check)
+
+    @staticmethod
+    def _cache_key(resolution):
+        # settings.py itself is an input: a change to the scaling rules must invalidate compiled configs
+        return config_cache.content_hash(config_template_path, config_path, static_config_path, Path(__file__), resolution)
+
+    @classmethod
+    def _load(cls, resolution, check):
         # Determine actual resolution
-        w, h = get_target_resolution(logger)
-        
-        # Scale values using helper
-        scale_config(static_conf, w, h)
-        
-        deep_merge(config, static_conf)
-        logger.debug(f"Deep merged static config to {w}x{h}")
-        
-    except Exception as e:
-        logger.error(f"Error loading/scaling static config: {e}")
-else:
-    logger.error(f"static_config.toml not found at {static_config_path}")
+        w, h = resolution if resolution else get_target_resolution(logger)
+        coords.set_client_size(w, h)
+        cache_name = f"settings_{w}x{h}"
+
+        # Only validated configs are cached, so a hit needs no check_toml pass
+        compiled = config_cache.load(cache_name, cls._cache_key((w, h)), logger)
+        if compiled is not None:
+            logger.debug(f"[Config Cache] Loaded compiled config for {w}x{h}")
+            settings = cls(compiled, {}, (w, h), sections=compiled)
+        else:
+            settings = cls._compile((w, h), check)
+            if check:
+                config_cache.store(cache_name, cls._cache_key((w, h)), settings.as_dict(), logger)
+
+        settings.apply_log_level()
+        cls._current = settings
+        return settings
+
+    @classmethod
+    def _compile(cls, resolution, check):
+        if check:
+            user_conf = check_toml(config_template_path, config_path) or {}
+        else:
+            try:
+                user_conf = toml.load(config_path)
+            except (OSError, toml.TomlDecodeError) as e:
+                logger.warning(f"Could not read {config_path}: {e}")
+                user_conf = {}
+
+        static_conf = {}
+        if static_config_path.exists():
+            try:
+                static_conf = toml.load(static_config_path)
+                logger.debug(f"Loaded config from {static_config_path}")
+            except Exception as e:
+                logger.error(f"Error loading static config: {e}")
+        else:
+            logger.error(f"static_config.toml not found at {static_config_path}")
+
+        logger.debug(f"Static config will be scaled to {resolution[0]}x{resolution[1]}")
+        return cls(user_conf, static_conf, resolution)
+
+    @classmethod
+    def current(cls):
+        """The loaded settings, loading them with the defaults on first use."""
+        settings = cls._current
+        if settings is None:
+            with cls._load_lock:
+                if cls._current is None:
+                    cls.load()
+                settings = cls._current
+        return settings
+
+    def _build_section(self, name):
+        static_section = self.static_conf.get(name)
+        if static_section is None:
+            return self.user_conf[name]
+        static_section = scale_section(name, copy.deepcopy(static_section), *self.resolution)
+        user_section = self.user_conf.get(name)
+        if isinstance(user_section, dict) and isinstance(static_section, dict):
+            merged = deep_merge(copy.deepcopy(user_section), static_section)
+            if isinstance(static_section, coords.ScaledSection):
+                return static_section.with_items(merged)
+            return merged
+        return static_section
+
+    def __getitem__(self, name):
+        section = self.sections.get(name, _MISSING)
+        if section is _MISSING:
+            if name not in self.user_conf and name not in self.static_conf:
+                raise KeyError(name)
+            with self.lock:
+                if name not in self.sections:
+                    self.sections[name] = self._build_section(name)
+                section = self.sections[name]
+        return section
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.user_conf or name in self.static_conf
+
+    def as_dict(self):
+        """Every section, scaled and merged, as a plain dict."""
+        return {name: self[name] for name in self.names}
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self.as_dict(), memo)
+
+    def apply_log_level(self):
+        # Update Logger Level from final config
+        general = self.get("General")
+        if not general or not general.get("LogLevel"):
+            return
+        new_level = general["LogLevel"].upper()
+        try:
+            # Re-setting the level on the global logger
+            logger.setLevel(new_level)
+            for handler in logger.handlers:
+                handler.setLevel(new_level)
+            logger.debug(f"Logger level set to {new_level} from config.")
+        except Exception as e:
+            logger.error(f"Failed to set log level to {new_level}: {e}")
+
+
+class _ConfigView(Mapping):
+    """Read-only view of Settings.current(), so `from utils.settings import config` never triggers a load."""
+
+    def __getitem__(self, name):
+        return Settings.current()[name]
+
+    def __iter__(self):
+        return iter(Settings.current())
+
+    def __len__(self):
+        return len(Settings.current())
+
+    def __contains__(self, name):
+        return name in Settings.current()
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(Settings.current(), memo)
+
+    def __repr__(self):
+        return f"<config {'not loaded' if Settings._current is None else Settings._current.resolution}>"
 
-# Update Logger Level from final config
-if config.get("General") and config["General"].get("LogLevel"):
-    new_level = config["General"]["LogLevel"].upper()
-    try:
-        # Re-setting the level on the global logger
-        logger.setLevel(new_level)
-        for handler in logger.handlers:
-            handler.setLevel(new_level)
-            
-        # We don't need to re-import Logger here as it's not used, just logger.setLevel
-        logger.debug(f"Logger level set to {new_level} from config.")
-    except Exception as e:
-        logger.error(f"Failed to set log level to {new_level}: {e}")
 
+config = _ConfigView()
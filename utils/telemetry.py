@@ -0,0 +1,177 @@
+"""
+Local attack telemetry. Rows are queued by the bot thread and inserted in batches by a background writer, so
+recording never waits on disk. The report queries at the bottom back input_tools/telemetry_report.py.
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from utils.settings import config, logger
+
+SCHEMA = {
+    "searches": [
+        ("ts", "REAL"), ("account", "TEXT"), ("bases_seen", "INTEGER"), ("search_seconds", "REAL"),
+        ("gold", "INTEGER"), ("elixir", "INTEGER"), ("dark", "INTEGER"), ("accepted", "INTEGER"),
+    ],
+    "attacks": [
+        ("ts", "REAL"), ("account", "TEXT"), ("base", "TEXT"), ("army", "TEXT"), ("search_seconds", "REAL"),
+        ("bases_seen", "INTEGER"), ("placement_seconds", "REAL"), ("battle_seconds", "REAL"),
+        ("total_seconds", "REAL"), ("outcome", "TEXT"), ("gold", "INTEGER"), ("elixir", "INTEGER"), ("dark", "INTEGER"),
+    ],
+    "attack_loops": [
+        ("ts", "REAL"), ("account", "TEXT"), ("base", "TEXT"), ("attacks", "INTEGER"), ("seconds", "REAL"),
+        ("storage_filled", "INTEGER"),
+    ],
+}
+
+
+class Telemetry:
+    """
+    Process-wide telemetry writer (see shared()). record() never blocks; rows are flushed every batch_size rows or
+    flush_interval seconds, and on exit.
+    """
+    _shared = None
+
+    def __init__(self, path, batch_size=50, flush_interval=5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._writer, name="telemetry-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def shared(cls):
+        """Returns the process-wide store, or None when [Telemetry] is disabled."""
+        telemetry_cfg = config.get("Telemetry", {})
+        if not telemetry_cfg.get("enabled", True):
+            return None
+        if cls._shared is None:
+            cls._shared = cls(
+                telemetry_cfg.get("path", os.path.join('data', 'telemetry.sqlite')),
+                telemetry_cfg.get("batch_size", 50),
+                telemetry_cfg.get("flush_interval", 5.0),
+            )
+        return cls._shared
+
+    def record(self, table, **fields):
+        if table not in SCHEMA:
+            raise ValueError(f"Unknown telemetry table '{table}'")
+        fields.setdefault("ts", time.time())
+        self.queue.put((table, fields))
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout=10)
+
+    def _writer(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = connect(self.path)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"[Telemetry] Could not open {self.path}, telemetry disabled: {e}")
+            return
+
+        pending = []
+        last_flush = time.monotonic()
+        stop = False
+        while not stop:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+                if item is None:
+                    stop = True
+                else:
+                    pending.append(item)
+            except queue.Empty:
+                pass
+
+            if pending and (stop or len(pending) >= self.batch_size or time.monotonic() - last_flush >= self.flush_interval):
+                self._flush(conn, pending)
+                pending = []
+                last_flush = time.monotonic()
+        conn.close()
+
+    def _flush(self, conn, rows):
+        by_table = {}
+        for table, fields in rows:
+            by_table.setdefault(table, []).append(fields)
+        try:
+            with conn:
+                for table, items in by_table.items():
+                    columns = [name for name, _ in SCHEMA[table]]
+                    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+                    conn.executemany(sql, [tuple(item.get(c) for c in columns) for item in items])
+        except sqlite3.Error as e:
+            logger.warning(f"[Telemetry] Dropped {len(rows)} rows: {e}")
+
+
+def connect(path):
+    """Opens (and if needed creates) the telemetry database."""
+    conn = sqlite3.connect(path)
+    for table, columns in SCHEMA.items():
+        cols = ", ".join(f"{name} {kind}" for name, kind in columns)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, {cols})")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_account_ts ON {table} (account, ts)")
+    conn.commit()
+    return conn
+
+
+""" --------------------------- Report Queries --------------------------------- """
+
+def loot_per_hour(conn, since):
+    """Offered loot per hour of attack time (search + placement + battle) per account."""
+    return conn.execute("""
+        SELECT account, COUNT(*) AS attacks,
+               SUM(gold) * 3600.0 / SUM(total_seconds) AS gold_per_hour,
+               SUM(elixir) * 3600.0 / SUM(total_seconds) AS elixir_per_hour,
+               SUM(dark) * 3600.0 / SUM(total_seconds) AS dark_per_hour
+        FROM attacks
+        WHERE ts >= ? AND base = 'home' AND outcome != 'auto_lose' AND total_seconds > 0
+        GROUP BY account ORDER BY account
+    """, (since,)).fetchall()
+
+
+def searches_per_attack(conn, since):
+    return conn.execute("""
+        SELECT account, AVG(bases_seen) AS bases_per_attack, AVG(search_seconds) AS search_seconds,
+               MAX(bases_seen) AS worst
+        FROM attacks
+        WHERE ts >= ? AND bases_seen IS NOT NULL
+        GROUP BY account ORDER BY account
+    """, (since,)).fetchall()
+
+
+def time_breakdown(conn, since):
+    """Mean seconds per attack spent searching, placing, in battle, and in everything else (menus, going home)."""
+    return conn.execute("""
+        SELECT account, base,
+               AVG(COALESCE(search_seconds, 0)) AS search,
+               AVG(COALESCE(placement_seconds, 0)) AS placement,
+               AVG(COALESCE(battle_seconds, 0)) AS battle,
+               AVG(total_seconds - COALESCE(search_seconds, 0) - COALESCE(placement_seconds, 0) - COALESCE(battle_seconds, 0)) AS other
+        FROM attacks
+        WHERE ts >= ?
+        GROUP BY account, base ORDER BY account, base
+    """, (since,)).fetchall()
+
+
+def outcomes(conn, since):
+    return conn.execute("""
+        SELECT account, outcome, COUNT(*) FROM attacks WHERE ts >= ? GROUP BY account, outcome ORDER BY account, outcome
+    """, (since,)).fetchall()
+
+
+def storage_fill(conn, since):
+    """Attack loops per account, how long they took and how often they ended with full storages."""
+    return conn.execute("""
+        SELECT account, base, COUNT(*) AS loops, AVG(attacks) AS attacks, AVG(seconds) AS seconds,
+               SUM(storage_filled) AS filled
+        FROM attack_loops WHERE ts >= ?
+        GROUP BY account, base ORDER BY account, base
+    """, (since,)).fetchall()
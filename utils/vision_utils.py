@@ -1,12 +1,42 @@
 import os
 import re
+import threading
 
 import cv2
 import numpy as np
 import pytesseract
 from PIL import Image
 
-from utils.settings import logger
+from utils.settings import config, logger
+
+
+class _Slots:
+    """A BoundedSemaphore sized from [MultiInstance] on first use, so importing this module reads no config."""
+
+    def __init__(self, key, default):
+        self.key = key
+        self.default = default
+        self.semaphore = None
+        self.lock = threading.Lock()
+
+    def _get(self):
+        if self.semaphore is None:
+            with self.lock:
+                if self.semaphore is None:
+                    self.semaphore = threading.BoundedSemaphore(max(1, config.get("MultiInstance", {}).get(self.key, self.default)))
+        return self.semaphore
+
+    def __enter__(self):
+        return self._get().__enter__()
+
+    def __exit__(self, *exc_info):
+        return self._get().__exit__(*exc_info)
+
+
+# Process-wide limits shared by every game instance worker (see multi_instance.py): Tesseract runs one
+# subprocess per call and contour detection saturates a core, so concurrent workers queue for a slot.
+OCR_SLOTS = _Slots("ocr_workers", 2)
+DETECTION_SLOTS = _Slots("detection_workers", 4)
 
 
 class VisionUtils:
@@ -63,7 +93,19 @@ class VisionUtils:
         """Extracts text from a region using Tesseract."""
         x1, y1, x2, y2 = region
         region_img = image[y1:y2, x1:x2]
-        return pytesseract.image_to_string(region_img, config=config)
+        return VisionUtils.ocr_string(region_img, config=config)
+
+    @staticmethod
+    def ocr_string(image, config='--psm 6'):
+        """pytesseract.image_to_string, holding one of the shared OCR slots."""
+        with OCR_SLOTS:
+            return pytesseract.image_to_string(image, config=config)
+
+    @staticmethod
+    def ocr_data(image, config='--psm 6'):
+        """pytesseract.image_to_data as a dict, holding one of the shared OCR slots."""
+        with OCR_SLOTS:
+            return pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
 
     @staticmethod
     def correct_ocr_text_to_numbers(text):
@@ -0,0 +1,138 @@
+"""
+One polling engine for every "wait until the game is ready" loop.
+wait_until observes a source (a frame, a screenshot, or nothing), tests a predicate against it and backs off
+between polls. Every wait is appended to a CSV (label, outcome, elapsed, timeout, polls) so timeouts can be tuned
+from real timings.
+"""
+
+import csv
+import os
+import time
+from datetime import datetime
+
+import cv2
+
+from utils.settings import config, logger
+
+
+class WaitResult:
+    """
+    Outcome of wait_until. Truthy when the predicate was met.
+    frame is the observation the predicate matched (None for source-less waits), value is what the predicate returned.
+    """
+
+    def __init__(self, met, frame, value, elapsed, polls):
+        self.met = met
+        self.frame = frame
+        self.value = value
+        self.elapsed = elapsed
+        self.polls = polls
+
+    def __bool__(self):
+        return self.met
+
+    def __repr__(self):
+        return f"WaitResult(met={self.met}, elapsed={self.elapsed:.2f}s, polls={self.polls})"
+
+
+def any_of(*predicates):
+    """True when any predicate holds on the observation (short-circuits)."""
+    def predicate(*args):
+        for p in predicates:
+            value = p(*args)
+            if value:
+                return value
+        return False
+    return predicate
+
+
+def all_of(*predicates):
+    """True when every predicate holds on the same observation. All are evaluated so stateful predicates keep tracking."""
+    def predicate(*args):
+        values = [p(*args) for p in predicates]
+        return values[-1] if values and all(values) else False
+    return predicate
+
+
+def frame_source(window_controller, fallback_path=None):
+    """
+    Cheapest available frame source: an in-memory PrintWindow capture, falling back to a screenshot on disk
+    (loaded back as BGR) when the in-memory capture fails.
+    """
+    def source():
+        frame = window_controller.capture_frame()
+        if frame is None and fallback_path:
+            window_controller.capture_minimized_window_screenshot(fallback_path, read_back=False)
+            frame = cv2.imread(fallback_path) if os.path.exists(fallback_path) else None
+        return frame
+    return source
+
+
+def record_wait(label, met, elapsed, timeout, polls):
+    """Appends one wait's timing to the [Wait] CSV. Also used by waits that run their own polling loop."""
+    wait_cfg = config.get("Wait", {})
+    if not wait_cfg.get("record", True):
+        return
+    path = wait_cfg.get("record_path", os.path.join('data', 'waits', 'wait_timings.csv'))
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        new_file = not os.path.exists(path)
+        with open(path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(['timestamp', 'label', 'met', 'elapsed', 'timeout', 'polls'])
+            writer.writerow([datetime.now().isoformat(timespec='seconds'), label, int(met), f"{elapsed:.3f}", timeout, polls])
+    except OSError as e:
+        logger.debug(f"[Wait] Could not record timing for '{label}': {e}")
+
+
+def wait_until(predicate, source=None, timeout=30, min_interval=0.25, backoff=1.0, max_interval=None, initial_delay=0, label="wait",
+               next_interval=None):
+    """
+    Polls until predicate is truthy or timeout seconds pass.
+    :param predicate: Called with the source's observation, or with no arguments when source is None.
+    :param source: Callable returning an observation (see frame_source). Polls where it returns None are skipped.
+    :param min_interval: First gap between polls; multiplied by backoff after every poll, capped at max_interval.
+    :param initial_delay: Time to wait before the first poll.
+    :param next_interval: Optional callable(elapsed) -> gap before the next poll, replacing min_interval/backoff for
+                          waits whose pace depends on what they have seen.
+    :return: WaitResult.
+    """
+    start = time.perf_counter()
+    deadline = start + timeout
+    interval = min_interval
+    max_interval = max_interval if max_interval is not None else max(min_interval, timeout)
+    polls = 0
+
+    if initial_delay > 0:
+        time.sleep(min(initial_delay, timeout))
+
+    while True:
+        frame = None
+        value = False
+        if source is None:
+            value = predicate()
+        else:
+            frame = source()
+            if frame is not None:
+                value = predicate(frame)
+        polls += 1
+
+        if value:
+            elapsed = time.perf_counter() - start
+            logger.debug(f"[Wait] {label}: met after {elapsed:.2f}s ({polls} polls)")
+            record_wait(label, True, elapsed, timeout, polls)
+            return WaitResult(True, frame, value, elapsed, polls)
+
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        if next_interval is not None:
+            interval = next_interval(time.perf_counter() - start)
+        time.sleep(max(0.0, min(interval, remaining)))
+        interval = min(interval * backoff, max_interval)
+
+    elapsed = time.perf_counter() - start
+    logger.debug(f"[Wait] {label}: timed out after {elapsed:.2f}s ({polls} polls)")
+    record_wait(label, False, elapsed, timeout, polls)
+    return WaitResult(False, None, None, elapsed, polls)